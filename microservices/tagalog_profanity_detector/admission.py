@@ -0,0 +1,124 @@
+import os
+import math
+import time
+import threading
+from collections import OrderedDict
+
+# Admission settings
+BATCH_MAX_QUEUE = int(os.environ.get('BATCH_MAX_QUEUE', '256'))
+# Bulk jobs queue separately, so they can't crowd out interactive requests
+BATCH_MAX_QUEUE_BULK = int(os.environ.get('BATCH_MAX_QUEUE_BULK', '4096'))
+# Per-client rate limit in texts per second; 0 disables it
+CLIENT_RATE_LIMIT = float(os.environ.get('CLIENT_RATE_LIMIT', '0'))
+CLIENT_BURST = float(os.environ.get('CLIENT_BURST', '0')) or max(CLIENT_RATE_LIMIT * 2, 1.0)
+CLIENT_MAX_TRACKED = int(os.environ.get('CLIENT_MAX_TRACKED', '10000'))
+# Comma-separated API keys that get their own rate-limit bucket; anyone
+# else is limited by address, so made-up keys can't mint fresh buckets
+CLIENT_API_KEYS = frozenset(k.strip() for k in os.environ.get('CLIENT_API_KEYS', '').split(',') if k.strip())
+
+
+class Overloaded(Exception):
+    """Raised when a request is refused; callers should retry after `retry_after` seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self):
+        """Value for the Retry-After header (whole seconds, at least 1)."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class RequestTooLarge(ValueError):
+    """Raised when a request has more texts than a model queue can ever hold; retrying won't help."""
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def take(self, cost=1.0):
+        """Take `cost` tokens. Returns 0 on success, else seconds until they'd be available."""
+        # A request bigger than the bucket is allowed once the bucket is full
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+def rate_limit_key(api_key, address, known_keys=CLIENT_API_KEYS):
+    """Client id for rate limiting: the API key if it is a known one, else the address."""
+    if api_key and api_key in known_keys:
+        return f"key:{api_key}"
+    return f"ip:{address}" if address else None
+
+
+class ClientRateLimiter:
+    """
+    One token bucket per client id, so a single caller can't fill the
+    model queues on its own. A bucket idle long enough to have refilled is
+    dropped, since a fresh one behaves the same; least recently seen clients
+    are also forgotten once more than `max_clients` are tracked.
+    """
+
+    def __init__(self, rate=CLIENT_RATE_LIMIT, burst=CLIENT_BURST, max_clients=CLIENT_MAX_TRACKED):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def check(self, client_id, cost=1):
+        """Charge `cost` texts to the client, raising Overloaded if it is over its limit."""
+        if not self.enabled or client_id is None:
+            return
+
+        with self._lock:
+            self._evict_idle()
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[client_id] = bucket
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client_id)
+            wait = bucket.take(cost)
+
+        if wait > 0:
+            self.rejected += 1
+            raise Overloaded("Rate limit exceeded for this client", wait)
+
+    def _evict_idle(self):
+        # Buckets are kept in last-seen order, so idle ones are at the front
+        idle_after = self.burst / self.rate
+        now = time.monotonic()
+        while self._buckets:
+            bucket = next(iter(self._buckets.values()))
+            if now - bucket.updated_at < idle_after:
+                break
+            self._buckets.popitem(last=False)
+
+    def snapshot(self):
+        return {
+            "enabled": self.enabled,
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tracked_clients": len(self._buckets),
+            "rejected": self.rejected
+        }
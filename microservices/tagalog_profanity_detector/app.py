@@ -1,5 +1,5 @@
-from fastapi import FastAPI, HTTPException, status, Request, Query
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, status, Request, Response, Query, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field
 from transformers import (
     AutoModelForSequenceClassification,
     AutoTokenizer,
@@ -12,18 +12,47 @@ import os
 import sys
 import time
 import logging
+import gc
+import hmac
 from enum import Enum
-from typing import Optional
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
+import asyncio
+from typing import Optional, List, Dict
+
+from log_pipeline import setup_logging, RequestLogger
+from batching import BatchingEngine, Priority, deadline_after
+from batch_controller import BatchController, BATCH_SIZE_LIMIT, BATCH_WAIT_LIMIT_MS
+from cpu_budget import model_executors, budgeted_executor, EVALUATION_CPU_SHARE, MODEL_LOADER_CPU_SHARE
+from admission import Overloaded, RequestTooLarge, ClientRateLimiter, rate_limit_key, BATCH_MAX_QUEUE, BATCH_MAX_QUEUE_BULK
+from warmup import warmup_model, WARMUP_ENABLED
+from artifacts import (
+    find_bundle, verify_bundle, weights_version, ARTIFACTS_DIR, BUNDLE_LOAD_KWARGS,
+    MODEL_SOURCES, EXPLICIT_SOURCES, BASE_BERT_MODEL
+)
+from graph_backend import build_graph_backend, GRAPH_ATOL
+from early_exit import EarlyExitClassifier, early_exit_enabled, heads_path
+from padding_free import PaddingFreeRunner, padding_free_enabled, PADDING_FREE_ATOL
+from dedup import normalize, NearDuplicateIndex, DEDUP_ENABLED
+from prediction_cache import PredictionCache, create_store
+from ensemble import ENSEMBLE_WEIGHTS_SPEC, parse_weights, combine, EnsembleStats
+from model_store import ModelStore, MODEL_STORE_POLL_SECONDS, MODEL_STORE_WATCH
+from precision import dtype_for, low_precision_ok, logit_atol, LOW_MEMORY_LOADING
+from memory import PeakRSSMonitor, rss_mb, tensors_mb
+from streaming import ScanSession, StreamingStats
+from documents import (
+    extract_text, segment, group_segments, score_in_chunks, DOCUMENT_MAX_CHARS, DOCUMENT_MAX_SEGMENTS
 )
+
+# Configure logging; records are written by a background listener thread
+setup_logging()
 logger = logging.getLogger("tagalog-profanity-detector")
+request_log = RequestLogger(logging.getLogger("tagalog-profanity-detector.requests"))
+
+# The gRPC front-end is optional; it needs grpcio and the generated stubs
+try:
+    from grpc_service import serve_grpc, GRPC_PORT
+except ImportError as e:
+    serve_grpc = None
+    logger.warning(f"gRPC interface disabled: {str(e)}")
 
 app = FastAPI(
     title="Tagalog Profanity Detector API",
@@ -35,52 +64,299 @@ app = FastAPI(
 class ModelType(str, Enum):
     ROBERTA = "roberta"
     BERT = "bert"
+    STUDENT = "student"
+    # BERT and RoBERTa run side by side, see ENSEMBLE_WEIGHTS
+    ENSEMBLE = "ensemble"
 
-# Model paths
-MODEL_PATHS = {
-    ModelType.ROBERTA: "jcblaise/roberta-tagalog-large",
-    ModelType.BERT: "./models/google-bert-multilingual-tagalog-profanity"
-}
+# Models that are loaded and run on their own
+MEMBER_MODELS = [ModelType.ROBERTA, ModelType.BERT, ModelType.STUDENT]
+
+# Model paths, shared with the offline tools (see artifacts.MODEL_SOURCES)
+MODEL_PATHS = {ModelType(name): path for name, path in MODEL_SOURCES.items()}
+EXPLICIT_MODEL_PATHS = {ModelType(name) for name in EXPLICIT_SOURCES}
 
-# Check if trained BERT model exists, otherwise use the base model
-if not os.path.exists(MODEL_PATHS[ModelType.BERT]):
-    MODEL_PATHS[ModelType.BERT] = "google-bert/bert-base-multilingual-uncased"
-    logger.warning(f"Trained BERT model not found, using base model: {MODEL_PATHS[ModelType.BERT]}")
+if MODEL_PATHS[ModelType.BERT] == BASE_BERT_MODEL:
+    logger.warning(f"Trained BERT model not found, using base model: {BASE_BERT_MODEL}")
 
 # Log model paths
 logger.info(f"Using RoBERTa model: {MODEL_PATHS[ModelType.ROBERTA]}")
 logger.info(f"Using BERT model: {MODEL_PATHS[ModelType.BERT]}")
+if os.path.exists(MODEL_PATHS[ModelType.STUDENT]):
+    logger.info(f"Using student model: {MODEL_PATHS[ModelType.STUDENT]}")
 
 # Global variables for models and tokenizers
 tokenizers = {
     ModelType.ROBERTA: None,
-    ModelType.BERT: None
+    ModelType.BERT: None,
+    ModelType.STUDENT: None
 }
 models = {
     ModelType.ROBERTA: None,
-    ModelType.BERT: None
+    ModelType.BERT: None,
+    ModelType.STUDENT: None
 }
 device = None
 model_loaded = {
     ModelType.ROBERTA: False,
-    ModelType.BERT: False
+    ModelType.BERT: False,
+    ModelType.STUDENT: False
 }
 model_loading = {
     ModelType.ROBERTA: False,
-    ModelType.BERT: False
+    ModelType.BERT: False,
+    ModelType.STUDENT: False
 }
 last_error = {
     ModelType.ROBERTA: None,
-    ModelType.BERT: None
+    ModelType.BERT: None,
+    ModelType.STUDENT: None
+}
+warmup_stats = {
+    ModelType.ROBERTA: None,
+    ModelType.BERT: None,
+    ModelType.STUDENT: None
+}
+load_info = {
+    ModelType.ROBERTA: None,
+    ModelType.BERT: None,
+    ModelType.STUDENT: None
+}
+# Graph-mode (TorchScript / torch.compile) classifiers; None runs eagerly
+graph_backends = {
+    ModelType.ROBERTA: None,
+    ModelType.BERT: None,
+    ModelType.STUDENT: None
+}
+# Identifies the weights (and anything else that changes verdicts) behind
+# each model, so cached predictions never outlive the model that made them
+model_versions = {
+    ModelType.ROBERTA: None,
+    ModelType.BERT: None,
+    ModelType.STUDENT: None
+}
+# Early-exit classifiers (EARLY_EXIT_<MODEL>); None runs every layer
+early_exits = {
+    ModelType.ROBERTA: None,
+    ModelType.BERT: None,
+    ModelType.STUDENT: None
+}
+# The served version of each model, swapped as a whole by install_model
+loaded_models = {
+    ModelType.ROBERTA: None,
+    ModelType.BERT: None,
+    ModelType.STUDENT: None
 }
 
 # Default active model
 active_model = ModelType.ROBERTA
 
+def load_model_version(model_type: ModelType, model_path=None):
+    """
+    Load, prepare and warm one version of a model without touching the
+    version being served. Returns a record with everything run_inference
+    needs; install_model makes it live.
+
+    `model_path` loads a specific directory (e.g. a retrained model). By
+    default the current model store version is used, then a directory set
+    explicitly in BERT_MODEL_PATH / STUDENT_MODEL_PATH, then the compiled
+    bundle, then the MODEL_PATHS entry.
+    """
+    global device
+
+    source = "path"
+    if model_path is not None:
+        manifest = verify_bundle(model_path)
+        if manifest and os.path.abspath(model_path).startswith(os.path.abspath(model_store.root) + os.sep):
+            source = "store"
+    else:
+        # The versioned model store comes first (see model_store.py), then an
+        # explicitly configured directory, then a compiled artifact bundle
+        # (see compile_artifacts.py)
+        model_path, manifest = model_store.current(model_type.value)
+        if model_path:
+            source = "store"
+            logger.info(f"Using {model_type.capitalize()} version {manifest.get('version')} from the model store")
+            if model_type in EXPLICIT_MODEL_PATHS:
+                logger.warning(f"{model_type.capitalize()} model store version {manifest.get('version')} "
+                               f"takes precedence over {MODEL_PATHS[model_type]}")
+        elif model_type in EXPLICIT_MODEL_PATHS:
+            model_path = MODEL_PATHS[model_type]
+            manifest = verify_bundle(model_path)
+            if find_bundle(model_type.value)[0]:
+                logger.info(f"Using {model_path} for {model_type.capitalize()} instead of its compiled bundle")
+        else:
+            model_path, manifest = find_bundle(model_type.value)
+            if model_path:
+                source = "bundle"
+                logger.info(f"Found compiled {model_type.capitalize()} bundle from {manifest.get('source')} "
+                            f"created {manifest.get('created_at')}")
+            else:
+                model_path = MODEL_PATHS[model_type]
+                if not os.path.isdir(model_path):
+                    source = "hub"
+                    logger.warning(f"No local {model_type.capitalize()} weights found; "
+                                   f"loading {model_path} from the Hugging Face Hub")
+
+    # Local safetensors weights with a manifest: no Hub lookups
+    bundle_dir = model_path if manifest else None
+    load_kwargs = dict(BUNDLE_LOAD_KWARGS) if manifest else {}
+
+    # Set device if not already set
+    if device is None:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        logger.info(f"Using device: {device}")
+
+    # Load straight into the target dtype, streaming weights instead of
+    # materialising a randomly initialised copy first, to halve peak memory
+    dtype, dtype_reason = dtype_for(model_type.value, device)
+    load_kwargs["torch_dtype"] = dtype
+    load_kwargs["low_cpu_mem_usage"] = LOW_MEMORY_LOADING
+
+    logger.info(f"Loading {model_type.capitalize()} model from {model_path} as {dtype}...")
+    start_time = time.time()
+
+    with PeakRSSMonitor() as load_memory:
+        # Load tokenizer and model based on model type
+        if model_type == ModelType.BERT:
+            tokenizer = BertTokenizer.from_pretrained(model_path, local_files_only=bool(bundle_dir))
+            model = BertForSequenceClassification.from_pretrained(model_path, num_labels=2, **load_kwargs)
+        else:
+            tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=bool(bundle_dir))
+            model = AutoModelForSequenceClassification.from_pretrained(model_path, num_labels=2, **load_kwargs)
+
+        # Move model to device
+        model.to(device)
+        model.eval()
+    load_seconds = time.time() - start_time
+
+    logger.info(f"{model_type.capitalize()} tokenizer and model loaded successfully")
+
+    # Fall back to float32 if the reduced-precision model doesn't run cleanly
+    if dtype != torch.float32 and not low_precision_ok(model, tokenizer, device):
+        logger.warning(f"{model_type.capitalize()} falling back to float32")
+        model = model.float()
+        dtype, dtype_reason = torch.float32, f"fallback from {dtype}"
+
+    # Build the optional graph-mode backend (INFERENCE_BACKEND_<MODEL>);
+    # it is checked against eager logits and dropped if it disagrees
+    version = weights_version(model_path, manifest)
+    graph, backend_info = build_graph_backend(
+        model_type.value, model, tokenizer, model_path, version, atol=logit_atol(dtype, GRAPH_ATOL)
+    )
+
+    # Attach early-exit heads trained by early_exit.py, if enabled
+    early_exit = None
+    if early_exit_enabled(model_type.value):
+        path = heads_path(model_type.value)
+        if not os.path.exists(path):
+            logger.warning(f"Early exit enabled for {model_type.capitalize()} but no heads found at {path}")
+        elif graph is not None:
+            logger.warning(f"Early exit for {model_type.capitalize()} ignored: a graph backend is configured")
+        else:
+            early_exit = EarlyExitClassifier.load(model, path)
+            logger.info(f"{model_type.capitalize()} early exit at layers {early_exit.exit_layers}, "
+                        f"threshold {early_exit.threshold}")
+
+    # Split mixed-length batches into passes over similar lengths
+    # (PADDING_FREE_<MODEL>), unless it disagrees with the padded batch
+    padding_free = None
+    if graph is None and early_exit is None and padding_free_enabled(model_type.value):
+        runner = PaddingFreeRunner(model, tokenizer, device)
+        try:
+            # bfloat16 rounds differently for different shapes
+            runner.check(atol=logit_atol(dtype, PADDING_FREE_ATOL))
+            padding_free = runner
+        except Exception as e:
+            logger.warning(f"Padding-free batching disabled for {model_type.capitalize()}: {str(e)}")
+
+    # Warm the model up before it can be served
+    warmup = None
+    if WARMUP_ENABLED:
+        logger.info(f"Warming up {model_type.capitalize()} model...")
+        warmup = warmup_model(model, tokenizer, device)
+
+    elapsed_time = time.time() - start_time
+    logger.info(f"{model_type.capitalize()} model initialization completed in {elapsed_time:.2f} seconds")
+
+    # Verdicts differ slightly by dtype, so bfloat16 and float32 replicas
+    # keep separate prediction cache entries
+    if dtype != torch.float32:
+        version += f"-{str(dtype).replace('torch.', '')}"
+    if early_exit is not None:
+        version += f"-ee{early_exit.threshold}"
+
+    return {
+        "model": model,
+        "tokenizer": tokenizer,
+        "graph": graph,
+        "early_exit": early_exit,
+        "padding_free": padding_free,
+        "version": version,
+        "warmup": warmup,
+        "info": {
+            "path": model_path,
+            "source": source,
+            "version": version,
+            "store_version": manifest.get("version") if source == "store" else None,
+            "from_bundle": bool(bundle_dir),
+            "bundle_created_at": manifest.get("created_at") if manifest else None,
+            "load_seconds": load_seconds,
+            "ready_seconds": elapsed_time,
+            "dtype": str(dtype).replace("torch.", ""),
+            "dtype_reason": dtype_reason,
+            "memory": {
+                **load_memory.snapshot(),
+                "weights_mb": tensors_mb(model),
+                "low_memory_loading": LOW_MEMORY_LOADING
+            },
+            "loaded_at": time.time(),
+            "backend": backend_info,
+            "early_exit": early_exit is not None,
+            "padding_free": padding_free is not None
+        }
+    }
+
+def install_model(model_type: ModelType, record):
+    """
+    Make a loaded model version the one that is served.
+
+    run_inference reads `loaded_models` once per batch, so the swap is a
+    single reference assignment: batches already running finish on the old
+    weights and the next batch uses the new ones. The old version is
+    released once those batches drop their reference; the collection runs
+    on the model loader thread so it doesn't stall the event loop.
+    """
+    previous = loaded_models[model_type]
+    loaded_models[model_type] = record
+
+    tokenizers[model_type] = record["tokenizer"]
+    models[model_type] = record["model"]
+    graph_backends[model_type] = record["graph"]
+    early_exits[model_type] = record["early_exit"]
+    model_versions[model_type] = record["version"]
+    warmup_stats[model_type] = record["warmup"]
+    load_info[model_type] = record["info"]
+    model_loaded[model_type] = True
+    last_error[model_type] = None
+
+    if previous is not None:
+        logger.info(f"{model_type.capitalize()} swapped from version {previous['version']} to {record['version']}")
+        # Reused verdicts came from the old weights
+        for index_type in (model_type, ModelType.ENSEMBLE):
+            if index_type in dedup_indexes:
+                dedup_indexes[index_type].clear()
+        del previous
+        model_loader.submit(release_memory)
+
+def release_memory():
+    """Free the memory of a model version that is no longer referenced."""
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
 # Initialize model and tokenizer
 def initialize_model(model_type: ModelType = None):
-    global tokenizers, models, device, model_loaded, model_loading, last_error, active_model
-
+    """Load and install a model synchronously; used at startup."""
     # If no model type specified, use the active model
     if model_type is None:
         model_type = active_model
@@ -97,35 +373,7 @@ def initialize_model(model_type: ModelType = None):
 
     model_loading[model_type] = True
     try:
-        model_path = MODEL_PATHS[model_type]
-        logger.info(f"Loading {model_type.capitalize()} model from {model_path}...")
-        start_time = time.time()
-
-        # Set device if not already set
-        if device is None:
-            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-            logger.info(f"Using device: {device}")
-
-        # Load tokenizer and model based on model type
-        if model_type == ModelType.ROBERTA:
-            tokenizers[model_type] = AutoTokenizer.from_pretrained(model_path)
-            models[model_type] = AutoModelForSequenceClassification.from_pretrained(model_path, num_labels=2)
-        elif model_type == ModelType.BERT:
-            tokenizers[model_type] = BertTokenizer.from_pretrained(model_path)
-            models[model_type] = BertForSequenceClassification.from_pretrained(model_path, num_labels=2)
-
-        logger.info(f"{model_type.capitalize()} tokenizer loaded successfully")
-        logger.info(f"{model_type.capitalize()} model loaded successfully")
-
-        # Move model to device
-        models[model_type].to(device)
-        models[model_type].eval()
-
-        elapsed_time = time.time() - start_time
-        logger.info(f"{model_type.capitalize()} model initialization completed in {elapsed_time:.2f} seconds")
-
-        model_loaded[model_type] = True
-        last_error[model_type] = None
+        install_model(model_type, load_model_version(model_type))
         return True
     except Exception as e:
         logger.error(f"Error loading {model_type.capitalize()} model: {str(e)}", exc_info=True)
@@ -134,39 +382,537 @@ def initialize_model(model_type: ModelType = None):
     finally:
         model_loading[model_type] = False
 
+# Background loads, one at a time on their own thread so serving continues
+LOAD_RETRY_AFTER = 5
+# How long a failed load is reported before a request may trigger another
+LOAD_RETRY_SECONDS = 30
+# Required in x-api-key for /admin endpoints when set
+ADMIN_API_KEY = os.environ.get('ADMIN_API_KEY', '')
+model_loader = budgeted_executor("model-loader", MODEL_LOADER_CPU_SHARE)
+load_jobs = {}
+_load_tasks = set()
+
+async def load_in_background(model_type: ModelType, model_path=None, activate=False):
+    """
+    Load and warm a model version off the serving path, then swap it in.
+    With `activate`, it also becomes the active model once ready.
+    """
+    global active_model
+
+    job = load_jobs[model_type]
+    model_loading[model_type] = True
+    try:
+        loop = asyncio.get_running_loop()
+        record = await loop.run_in_executor(model_loader, load_model_version, model_type, model_path)
+        install_model(model_type, record)
+        if model_path is not None:
+            MODEL_PATHS[model_type] = model_path
+        if activate:
+            active_model = model_type
+            logger.info(f"Switched active model to {model_type.capitalize()}")
+        job.update(state="ready", version=record["version"], finished_at=time.time())
+    except Exception as e:
+        logger.error(f"Background load of {model_type.capitalize()} failed: {str(e)}", exc_info=True)
+        last_error[model_type] = str(e)
+        job.update(state="failed", error=str(e), finished_at=time.time())
+    finally:
+        model_loading[model_type] = False
+
+def start_background_load(model_type: ModelType, model_path=None, activate=False):
+    """Start a background load unless one is already running; returns its job record."""
+    job = load_jobs.get(model_type)
+    if job is not None and job["state"] == "loading":
+        return job
+
+    load_jobs[model_type] = {
+        "state": "loading",
+        "path": model_path or MODEL_PATHS[model_type],
+        "activate": activate,
+        "started_at": time.time(),
+        "finished_at": None,
+        "version": None,
+        "error": None
+    }
+    task = asyncio.create_task(load_in_background(model_type, model_path, activate))
+    _load_tasks.add(task)
+    task.add_done_callback(_load_tasks.discard)
+    return load_jobs[model_type]
+
+# Versioned model store, watched for newly published versions
+model_store = ModelStore()
+store_status = {
+    model_type: {"current": None, "last_checked": None, "error": None}
+    for model_type in MEMBER_MODELS
+}
+
+async def check_model_store(model_type: ModelType):
+    """
+    Hot-swap in the store's current version of a model if it isn't being
+    served yet. The version's file hashes are checked first; a version
+    that fails them is reported and skipped until a new one is published.
+    A version counts as current only once it is being served: if loading
+    it fails, the error is reported and the load retried after
+    LOAD_RETRY_SECONDS.
+    """
+    version = model_store.current_version(model_type.value)
+    state = store_status[model_type]
+    state["last_checked"] = time.time()
+    if version is None or version == state["current"]:
+        return
+
+    info = load_info[model_type]
+    if info and info.get("store_version") == version:
+        state.update(current=version, error=None)
+        return
+    if model_loading[model_type]:
+        # Try again on the next poll
+        return
+
+    job = load_jobs.get(model_type)
+    if job is not None and job["state"] == "failed" and job.get("store_version") == version:
+        state["error"] = f"Loading version {version} failed: {job['error']}"
+        if time.time() - job["finished_at"] < LOAD_RETRY_SECONDS:
+            return
+
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(model_loader, model_store.validate, model_type.value, version)
+    except ValueError as e:
+        logger.error(f"Not loading {model_type.capitalize()} version {version}: {str(e)}")
+        state.update(current=version, error=str(e))
+        return
+
+    logger.info(f"New {model_type.capitalize()} version {version} published, loading it in the background")
+    job = start_background_load(model_type, model_store.version_path(model_type.value, version))
+    job["store_version"] = version
+
+async def watch_model_store():
+    """Poll the model store every MODEL_STORE_POLL_SECONDS."""
+    while True:
+        await asyncio.sleep(MODEL_STORE_POLL_SECONDS)
+        for model_type in MEMBER_MODELS:
+            try:
+                await check_model_store(model_type)
+            except Exception as e:
+                logger.error(f"Model store check for {model_type.capitalize()} failed: {str(e)}", exc_info=True)
+
+def run_inference(model_type: ModelType, texts):
+    """
+    Run one batched forward pass. Called on the model's batching engine
+    executor, never on the event loop.
+    """
+    # One read, so a concurrent hot swap can't mix two versions in a batch
+    record = loaded_models[model_type]
+    model = record["model"]
+    tokenizer = record["tokenizer"]
+    graph = record["graph"]
+    early_exit = record["early_exit"]
+    padding_free = record["padding_free"]
+
+    if graph is not None:
+        inputs = graph.pad_to_bucket(tokenizer, texts)
+        logits = graph(inputs["input_ids"], inputs["attention_mask"])
+    elif early_exit is not None:
+        inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=512).to(device)
+        logits = early_exit(inputs["input_ids"], inputs["attention_mask"], inputs.get("token_type_ids"))
+    elif padding_free is not None:
+        logits = padding_free(texts)
+    else:
+        inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=512).to(device)
+        with torch.no_grad():
+            logits = model(**inputs).logits
+
+    probabilities = torch.softmax(logits.float(), dim=1)
+    confidence, prediction = torch.max(probabilities, dim=1)
+
+    return [
+        {"is_inappropriate": bool(p), "confidence": float(c), "model_version": record["version"]}
+        for p, c in zip(prediction.tolist(), confidence.tolist())
+    ]
+
+def startup_models():
+    """Models loaded at startup; the distilled student only once it has been trained."""
+    models = [ModelType.ROBERTA, ModelType.BERT]
+    if os.path.exists(MODEL_PATHS[ModelType.STUDENT]) or model_store.current_version(ModelType.STUDENT.value):
+        models.append(ModelType.STUDENT)
+    return models
+
+# Each model runs on its own executor thread with its own torch thread budget
+# (MODEL_CPU_SHARES), so a slow RoBERTa batch can't hold up BERT
+executors = model_executors(
+    [model_type.value for model_type in MEMBER_MODELS],
+    primary=[model_type.value for model_type in startup_models()]
+)
+
+# One batching engine per model, shared by the HTTP and gRPC front-ends
+engines = {
+    model_type: BatchingEngine(
+        model_type.value,
+        lambda texts, m=model_type: run_inference(m, texts),
+        executor=executors[model_type.value],
+        controller=BatchController(model_type.value)
+    )
+    for model_type in MEMBER_MODELS
+}
+grpc_server = None
+store_watcher = None
+
+# Optional per-client cap so a single caller can't fill the queues
+rate_limiter = ClientRateLimiter()
+
+# Ensemble members and weights; the members run concurrently on their own engines
+try:
+    ensemble_weights = parse_weights(ENSEMBLE_WEIGHTS_SPEC)
+    ensemble_members = [ModelType(name) for name in ensemble_weights]
+    if ModelType.ENSEMBLE in ensemble_members:
+        raise ValueError("the ensemble can't be one of its own members")
+except ValueError as e:
+    logger.error(f"Ensemble disabled: {str(e)}")
+    ensemble_weights, ensemble_members = {}, []
+ensemble_stats = EnsembleStats(ensemble_weights)
+
+# Exact-text verdict cache shared across replicas (PREDICTION_CACHE)
+store = create_store()
+prediction_cache = PredictionCache(store) if store is not None else None
+
+# Confident verdicts of recently scored texts, reused for near-duplicates
+dedup_indexes = {model_type: NearDuplicateIndex() for model_type in ModelType} if DEDUP_ENABLED else {}
+
+# WebSocket scanning sessions (one per browser tab)
+streaming_stats = StreamingStats()
+
+def ensure_model_loaded(model_type: ModelType):
+    """
+    Raise HTTPException unless the model can serve right now.
+
+    A model that isn't loaded yet is loaded in the background (never inside
+    the request) and the caller gets 503 with Retry-After meanwhile.
+    """
+    if model_type == ModelType.ENSEMBLE:
+        if not ensemble_members:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Ensemble mode is not configured, check ENSEMBLE_WEIGHTS"
+            )
+        missing = [member for member in ensemble_members if not model_loaded[member]]
+        for member in missing:
+            ensure_model_loaded_later(member)
+        if missing:
+            raise model_loading_exception(missing)
+        return
+
+    if model_loaded[model_type]:
+        return
+
+    ensure_model_loaded_later(model_type)
+    raise model_loading_exception([model_type])
+
+def ensure_model_loaded_later(model_type: ModelType):
+    """Start loading the model in the background, unless it failed moments ago."""
+    job = load_jobs.get(model_type)
+    if job is not None and job["state"] == "failed" and time.time() - job["finished_at"] < LOAD_RETRY_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to load {model_type.capitalize()} model: {job['error']}"
+        )
+    if not model_loading[model_type]:
+        start_background_load(model_type)
+
+def model_loading_exception(model_types):
+    names = ", ".join(model_type.capitalize() for model_type in model_types)
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"{names} model is currently loading. Please try again later.",
+        headers={"Retry-After": str(LOAD_RETRY_AFTER)}
+    )
+
+def client_id_for(http_request):
+    """Identify the caller for rate limiting: a known API key, else the client address."""
+    return rate_limit_key(
+        http_request.headers.get("x-api-key"),
+        http_request.client.host if http_request.client else None
+    )
+
+def overloaded_exception(e: Overloaded):
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"Service overloaded: {str(e)}. Please retry later.",
+        headers={"Retry-After": e.retry_after_header}
+    )
+
+async def score_texts(texts, model=None, client_id=None, deadline=None, priority=Priority.INTERACTIVE):
+    """
+    Validate texts and score them through the model's batching engine.
+
+    Shared by every front-end. Returns (model_type, results) with one
+    {"is_inappropriate", "confidence", "deadline_missed"} dict per text;
+    raises HTTPException, with 429 and Retry-After when the client or the
+    model queue is over its limit, and 413 when there are more distinct
+    texts than the model queue can hold at all.
+
+    `deadline` is an engine deadline from `deadline_after`. Texts still
+    queued when it passes are not scored: their verdict fields are None
+    and deadline_missed is True. Texts scored after it are returned with
+    deadline_missed set.
+
+    `priority` picks the engine lane: interactive texts are batched first,
+    bulk texts fill idle capacity (see BatchingEngine).
+    """
+    try:
+        model_type = ModelType(model) if model else active_model
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown model: {model}"
+        )
+
+    ensure_model_loaded(model_type)
+
+    # Validate input
+    if not texts or any(not text or len(text.strip()) == 0 for text in texts):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Text cannot be empty"
+        )
+
+    try:
+        rate_limiter.check(client_id, len(texts))
+        results, latencies = await score_unique(model_type, texts, deadline, priority)
+    except Overloaded as e:
+        raise overloaded_exception(e)
+    except RequestTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Prediction error with {model_type.capitalize()} model: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Prediction error with {model_type.capitalize()} model: {str(e)}"
+        )
+
+    late = deadline is not None and time.perf_counter() > deadline
+    return model_type, [
+        {"is_inappropriate": None, "confidence": None, "deadline_missed": True}
+        if result is None else {**result, "deadline_missed": late, "model_latency_ms": latencies}
+        for result in results
+    ]
+
+def version_for(model_type):
+    """Version of a model's verdicts, for cache keys."""
+    if model_type == ModelType.ENSEMBLE:
+        return "+".join(f"{m.value}:{model_versions[m]}:{ensemble_weights[m.value]:.3f}" for m in ensemble_members)
+    return model_versions[model_type]
+
+async def score_ensemble(texts, deadline, priority=Priority.INTERACTIVE):
+    """
+    Score texts with every ensemble member at once, each on its own
+    batching engine and executor, and combine the probabilities. Latency
+    is that of the slowest member, not the sum. Returns the results and
+    the time each member took.
+    """
+    async def timed(member):
+        started = time.perf_counter()
+        results = await engines[member].submit(texts, deadline, priority)
+        return results, (time.perf_counter() - started) * 1000
+
+    outcomes = await asyncio.gather(*(timed(member) for member in ensemble_members))
+    latencies = {member.value: ms for member, (_, ms) in zip(ensemble_members, outcomes)}
+    ensemble_stats.record(latencies)
+
+    combined = combine({member.value: results for member, (results, _) in zip(ensemble_members, outcomes)},
+                       ensemble_weights)
+    version = version_for(ModelType.ENSEMBLE)
+    return [
+        {**result, "model_version": version} if result is not None else None
+        for result in combined
+    ], latencies
+
+def lane_capacity(model_type, priority=Priority.INTERACTIVE):
+    """Most texts a request may queue for `model_type` in a lane at once."""
+    members = ensemble_members if model_type == ModelType.ENSEMBLE else [model_type]
+    return min((engines[member].max_queue_sizes[Priority(priority)] for member in members), default=BATCH_MAX_QUEUE)
+
+async def submit_texts(model_type, texts, deadline, priority=Priority.INTERACTIVE):
+    """Results from the model's engine(s), and ensemble member latencies (None for a single model)."""
+    if model_type == ModelType.ENSEMBLE:
+        return await score_ensemble(texts, deadline, priority)
+    return await engines[model_type].submit(texts, deadline, priority), None
+
+async def score_unique(model_type, texts, deadline, priority=Priority.INTERACTIVE):
+    """
+    Score texts through the batching engine, running the model as little
+    as possible: exact repeats come from the shared prediction cache,
+    confident verdicts of recent near-duplicates are reused, and each
+    distinct normalized text is sent to the engine once.
+
+    Returns the results and the ensemble member latencies of this call,
+    None unless an ensemble was run; they are kept out of cached verdicts.
+    """
+    results = [None] * len(texts)
+    latencies = None
+    todo = range(len(texts))
+    version = version_for(model_type)
+
+    if prediction_cache is not None:
+        cached = await prediction_cache.get_many(model_type.value, version, texts)
+        for i, verdict in enumerate(cached):
+            results[i] = verdict
+        todo = [i for i in todo if cached[i] is None]
+        if not todo:
+            return results, latencies
+
+    index = dedup_indexes.get(model_type)
+    keys = [normalize(text) for text in texts] if index is not None else [None] * len(texts)
+    pending = {}
+    for i in todo:
+        key = keys[i]
+        # Texts with nothing left after normalization (emoji, punctuation) are never merged
+        if not key:
+            pending[i] = [i]
+            continue
+        if key in pending:
+            pending[key].append(i)
+            continue
+        verdict = index.lookup(key)
+        if verdict is not None:
+            results[i] = verdict
+        else:
+            pending[key] = [i]
+
+    if pending:
+        groups = list(pending.values())
+        scored, latencies = await submit_texts(
+            model_type, [texts[group[0]] for group in groups], deadline, priority
+        )
+        # A swap may have happened while the texts were queued: file each
+        # verdict under the version that produced it, and only remember
+        # near-duplicates of the version now served
+        current = version_for(model_type)
+        by_version = {}
+        for group, result in zip(groups, scored):
+            for i in group:
+                results[i] = result
+            if result is None:
+                continue
+            result_version = result.get("model_version") or version
+            by_version.setdefault(result_version, {})[texts[group[0]]] = result
+            if keys[group[0]] and result_version == current:
+                index.add(keys[group[0]], result)
+        if prediction_cache is not None:
+            for result_version, verdicts in by_version.items():
+                prediction_cache.put_many(model_type.value, result_version, verdicts)
+    return results, latencies
+
 class TextRequest(BaseModel):
     text: str
     model: Optional[ModelType] = None
+    # Optional time budget: relative in milliseconds, or absolute Unix time in seconds
+    timeout_ms: Optional[float] = None
+    deadline: Optional[float] = None
+    # "bulk" for batch jobs that should only use idle capacity
+    priority: Priority = Priority.INTERACTIVE
+
+class BatchTextRequest(BaseModel):
+    # No lane holds more than this; the interactive one holds BATCH_MAX_QUEUE
+    texts: List[str] = Field(..., max_length=max(BATCH_MAX_QUEUE, BATCH_MAX_QUEUE_BULK))
+    model: Optional[ModelType] = None
+    timeout_ms: Optional[float] = None
+    deadline: Optional[float] = None
+    priority: Priority = Priority.INTERACTIVE
 
 class PredictionResponse(BaseModel):
     text: str
-    is_inappropriate: bool
+    # None only for batch items dropped because their deadline passed
+    is_inappropriate: Optional[bool]
+    confidence: Optional[float]
+    processing_time_ms: float
+    model_used: str
+    deadline_missed: bool = False
+    # Ensemble only: time each member model took
+    model_latency_ms: Optional[Dict[str, float]] = None
+    # Weights version (hash) of the model that produced the verdict
+    model_version: Optional[str] = None
+
+class BatchPredictionResponse(BaseModel):
+    results: List[PredictionResponse]
+    processing_time_ms: float
+    model_used: str
+    deadline_missed: bool = False
+    model_latency_ms: Optional[Dict[str, float]] = None
+
+class DocumentRequest(BaseModel):
+    content: str
+    # "text", "html", or "auto" to detect HTML
+    content_type: str = "auto"
+    model: Optional[ModelType] = None
+    timeout_ms: Optional[float] = None
+    deadline: Optional[float] = None
+    # Return the extracted text the segment offsets refer to
+    include_text: bool = False
+    priority: Priority = Priority.INTERACTIVE
+
+class FlaggedSegment(BaseModel):
+    start: int
+    end: int
+    text: str
     confidence: float
+
+class DocumentPredictionResponse(BaseModel):
+    # None only if the deadline passed before any segment was scored
+    is_inappropriate: Optional[bool]
+    confidence: Optional[float]
+    flagged: List[FlaggedSegment]
+    segments: int
+    unique_segments: int
+    unscored_segments: int = 0
     processing_time_ms: float
     model_used: str
+    deadline_missed: bool = False
+    model_version: Optional[str] = None
+    text: Optional[str] = None
 
 class ModelStatusResponse(BaseModel):
     status: str
     roberta_status: str
     bert_status: str
+    student_status: str
     device: str
     roberta_model: str
     bert_model: str
+    student_model: str
     active_model: str
     last_error: dict = {}
+    batching: dict = {}
+    rate_limit: dict = {}
+    warmup: dict = {}
+    load_info: dict = {}
+    early_exit: dict = {}
+    padding_free: dict = {}
+    dedup: dict = {}
+    prediction_cache: dict = {}
+    ensemble: dict = {}
+    load_jobs: dict = {}
+    model_store: dict = {}
+    streaming: dict = {}
+    saturation: dict = {}
+    process_rss_mb: float = 0.0
     uptime_seconds: float
 
 # Track when the service started
 start_time = time.time()
 
 @app.post("/predict", response_model=PredictionResponse, status_code=status.HTTP_200_OK)
-async def predict_profanity(request: TextRequest):
+async def predict_profanity(request: TextRequest, http_request: Request):
     """
     Predict if the given text contains profanity in Tagalog.
 
     Parameters:
     - text: The input text to check for profanity
-    - model: Optional model to use (roberta or bert). If not specified, uses the active model.
+    - model: Optional model to use (roberta, bert, student or ensemble). If not specified, uses the active model.
+    - timeout_ms / deadline: Optional time budget (milliseconds, or absolute Unix time in seconds)
+    - priority: "interactive" (default) or "bulk" for batch jobs, which only use idle capacity
 
     Returns:
     - text: The input text
@@ -174,78 +920,291 @@ async def predict_profanity(request: TextRequest):
     - confidence: Confidence score of the prediction (0-1)
     - processing_time_ms: Time taken to process the request in milliseconds
     - model_used: The model used for prediction
+    - deadline_missed: True if the answer was ready only after the deadline
+    - model_latency_ms: For the ensemble, how long each member model took
+    - model_version: Weights version (hash) of the model that produced the verdict
+
+    Returns 504 if the deadline passed before the text was scored, and 429
+    with a Retry-After header when the model queue is full or the caller is
+    over its rate limit.
     """
-    global active_model
     prediction_start = time.time()
 
-    # Determine which model to use
-    model_type = request.model if request.model else active_model
+    deadline = deadline_after(request.timeout_ms, request.deadline)
+    model_type, results = await score_texts(
+        [request.text], request.model, client_id_for(http_request), deadline, request.priority
+    )
+    if results[0]["is_inappropriate"] is None:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Deadline exceeded before the text was scored"
+        )
+    is_inappropriate = results[0]["is_inappropriate"]
+    confidence_value = results[0]["confidence"]
+
+    # Calculate processing time
+    processing_time = (time.time() - prediction_start) * 1000  # Convert to milliseconds
+
+    if request_log.sampled():
+        request_log.info(
+            "%s prediction: %s with confidence %.4f for %r",
+            model_type.capitalize(),
+            "INAPPROPRIATE" if is_inappropriate else "APPROPRIATE",
+            confidence_value,
+            request.text[:50],
+            model=model_type.value,
+            is_inappropriate=is_inappropriate,
+            confidence=confidence_value,
+            text_length=len(request.text),
+            processing_time_ms=processing_time
+        )
+
+    return {
+        "text": request.text,
+        "is_inappropriate": is_inappropriate,
+        "confidence": confidence_value,
+        "processing_time_ms": processing_time,
+        "model_used": model_type,
+        "deadline_missed": results[0]["deadline_missed"],
+        "model_latency_ms": results[0].get("model_latency_ms"),
+        "model_version": results[0].get("model_version")
+    }
 
-    # Check if model is loaded
-    if not model_loaded[model_type]:
-        if model_loading[model_type]:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail=f"{model_type.capitalize()} model is currently loading. Please try again later."
-            )
+@app.post("/predict/batch", response_model=BatchPredictionResponse, status_code=status.HTTP_200_OK)
+async def predict_profanity_batch(request: BatchTextRequest, http_request: Request):
+    """
+    Predict profanity for a list of texts in one call.
 
-        # Try to initialize the model
-        if not initialize_model(model_type):
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to load {model_type.capitalize()} model: {last_error[model_type]}"
-            )
+    The texts share the model's batching engine with concurrent /predict
+    and gRPC traffic, so they are scored in as few forward passes as possible.
 
-    try:
-        # Validate input
-        if not request.text or len(request.text.strip()) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Text cannot be empty"
-            )
+    Parameters:
+    - texts: The input texts to check for profanity
+    - model: Optional model to use (roberta, bert, student or ensemble). If not specified, uses the active model.
+    - timeout_ms / deadline: Optional time budget for the whole batch
+    - priority: "interactive" (default) or "bulk" (re-scoring and other batch jobs)
 
-        # Get the model and tokenizer
-        model = models[model_type]
-        tokenizer = tokenizers[model_type]
+    Returns:
+    - results: One prediction per input text, in order. Texts dropped because
+      the deadline passed have null verdicts and deadline_missed set.
+    - processing_time_ms: Time taken to process the whole batch in milliseconds
+    - model_used: The model used for prediction
+    - deadline_missed: True if any text missed the deadline
+    """
+    prediction_start = time.time()
 
-        # Tokenize and prepare input
-        logger.info(f"Processing text with {model_type.capitalize()} model: '{request.text[:50]}{'...' if len(request.text) > 50 else ''}'")
-        inputs = tokenizer(request.text, return_tensors="pt", truncation=True, max_length=512).to(device)
+    deadline = deadline_after(request.timeout_ms, request.deadline)
+    model_type, results = await score_texts(
+        request.texts, request.model, client_id_for(http_request), deadline, request.priority
+    )
 
-        # Make prediction
-        with torch.no_grad():
-            outputs = model(**inputs)
+    processing_time = (time.time() - prediction_start) * 1000
 
-        # Process results
-        logits = outputs.logits
-        probabilities = torch.softmax(logits, dim=1)
-        confidence, prediction = torch.max(probabilities, dim=1)
+    return {
+        "results": [
+            {
+                "text": text,
+                "is_inappropriate": result["is_inappropriate"],
+                "confidence": result["confidence"],
+                "processing_time_ms": processing_time,
+                "model_used": model_type,
+                "deadline_missed": result["deadline_missed"],
+                "model_latency_ms": result.get("model_latency_ms"),
+                "model_version": result.get("model_version")
+            }
+            for text, result in zip(request.texts, results)
+        ],
+        "processing_time_ms": processing_time,
+        "model_used": model_type,
+        "deadline_missed": any(result["deadline_missed"] for result in results),
+        "model_latency_ms": next(
+            (result["model_latency_ms"] for result in results if result.get("model_latency_ms")), None
+        )
+    }
 
-        is_inappropriate = bool(prediction.item())
-        confidence_value = confidence.item()
+def _extract_segments(content, content_type):
+    text = extract_text(content, content_type)
+    return text, segment(text)
 
-        # Calculate processing time
-        processing_time = (time.time() - prediction_start) * 1000  # Convert to milliseconds
+@app.post("/predict/document", response_model=DocumentPredictionResponse, status_code=status.HTTP_200_OK)
+async def predict_document(request: DocumentRequest, http_request: Request):
+    """
+    Score a whole document (plain text or HTML) in one call.
 
-        logger.info(f"{model_type.capitalize()} prediction: {'INAPPROPRIATE' if is_inappropriate else 'APPROPRIATE'} with confidence {confidence_value:.4f}")
+    The visible text is extracted (scripts, styles and markup dropped, block
+    elements as line breaks) and split into lines and sentences. Repeated
+    segments such as navigation and footers are scored once, and all
+    distinct segments go to the batching engine together.
 
-        return {
-            "text": request.text,
-            "is_inappropriate": is_inappropriate,
-            "confidence": confidence_value,
-            "processing_time_ms": processing_time,
-            "model_used": model_type
-        }
-    except HTTPException:
-        # Re-raise HTTP exceptions
-        raise
-    except Exception as e:
-        logger.error(f"Prediction error with {model_type.capitalize()} model: {str(e)}", exc_info=True)
+    Parameters:
+    - content: The document
+    - content_type: "text", "html", or "auto" (default) to detect HTML
+    - model: Optional model to use. If not specified, uses the active model.
+    - timeout_ms / deadline: Optional time budget for the whole document
+    - include_text: Also return the extracted text
+    - priority: "interactive" (default) or "bulk"
+
+    Returns:
+    - is_inappropriate: True if any segment is inappropriate
+    - confidence: Highest confidence among flagged segments, or the lowest
+      confidence among clean ones if nothing was flagged
+    - flagged: Every inappropriate segment occurrence, with start/end offsets
+      into the extracted text (the content itself for plain text)
+    - segments / unique_segments: Segments found, and distinct ones scored
+    - unscored_segments: Distinct segments dropped because the deadline passed
+    - processing_time_ms, model_used, deadline_missed, model_version
+    - text: The extracted text, if include_text was set
+
+    Returns 413 for documents over DOCUMENT_MAX_CHARS characters or
+    DOCUMENT_MAX_SEGMENTS distinct segments, and 504 if the deadline passed
+    before any segment was scored.
+    """
+    prediction_start = time.time()
+
+    if request.content_type not in ("auto", "text", "html"):
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Prediction error with {model_type.capitalize()} model: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="content_type must be text, html or auto"
+        )
+    if len(request.content) > DOCUMENT_MAX_CHARS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Document is larger than {DOCUMENT_MAX_CHARS} characters"
+        )
+
+    deadline = deadline_after(request.timeout_ms, request.deadline)
+    # Parsing a large page is CPU work; keep it off the event loop
+    text, segments = await asyncio.get_running_loop().run_in_executor(
+        None, lambda: _extract_segments(request.content, request.content_type)
+    )
+    groups = group_segments(segments)
+    if len(groups) > DOCUMENT_MAX_SEGMENTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Document has more than {DOCUMENT_MAX_SEGMENTS} distinct segments"
+        )
+
+    model_type = ModelType(request.model) if request.model else active_model
+    results = []
+    if groups:
+        # Half a lane at a time, so each chunk still fits beside other requests
+        chunk_size = max(1, lane_capacity(model_type, request.priority) // 2)
+        model_type, results = await score_in_chunks(
+            lambda chunk: score_texts(chunk, model_type, client_id_for(http_request), deadline, request.priority),
+            [segment_text for segment_text, _ in groups],
+            chunk_size
+        )
+
+    scored = [(group, result) for group, result in zip(groups, results) if result["is_inappropriate"] is not None]
+    if groups and not scored:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Deadline exceeded before the document was scored"
+        )
+
+    flagged = [
+        {"start": start, "end": end, "text": text[start:end], "confidence": result["confidence"]}
+        for (_, spans), result in scored if result["is_inappropriate"]
+        for start, end in spans
+    ]
+    flagged.sort(key=lambda segment_info: segment_info["start"])
+    if flagged:
+        confidence = max(segment_info["confidence"] for segment_info in flagged)
+    elif scored:
+        confidence = min(result["confidence"] for _, result in scored)
+    else:
+        confidence = None
+
+    processing_time = (time.time() - prediction_start) * 1000
+
+    if request_log.sampled():
+        request_log.info(
+            "%s document prediction: %d of %d segments flagged",
+            model_type.capitalize(),
+            len(flagged),
+            len(segments),
+            model=model_type.value,
+            is_inappropriate=bool(flagged),
+            segments=len(segments),
+            unique_segments=len(groups),
+            processing_time_ms=processing_time
         )
 
+    return {
+        "is_inappropriate": bool(flagged),
+        "confidence": confidence,
+        "flagged": flagged,
+        "segments": len(segments),
+        "unique_segments": len(groups),
+        "unscored_segments": len(groups) - len(scored),
+        "processing_time_ms": processing_time,
+        "model_used": model_type,
+        "deadline_missed": any(result["deadline_missed"] for result in results),
+        "model_version": next((result.get("model_version") for _, result in scored), None),
+        "text": text if request.include_text else None
+    }
+
+@app.websocket("/ws/scan")
+async def scan_stream(websocket: WebSocket, model: Optional[ModelType] = None, timeout_ms: Optional[float] = None):
+    """
+    Stream texts for scoring over one connection, e.g. one per browser tab.
+
+    Send {"id": ..., "text": ...} or {"items": [{"id": ..., "text": ...}, ...]}.
+    Each text is answered with {"id", "is_inappropriate", "confidence",
+    "deadline_missed", "model_used", "model_version"} as soon as it is
+    scored, so replies arrive out of order. Texts repeated within the
+    session are scored once ("reused": true on answers from earlier
+    verdicts). Failures are answered per item as {"id", "error", "status"}
+    plus "retry_after" while a model is loading or the service is
+    overloaded. `model` and `timeout_ms` (per text) are query parameters.
+    """
+    await websocket.accept()
+    client_id = client_id_for(websocket)
+
+    async def score(text):
+        try:
+            model_type, results = await score_texts([text], model, client_id, deadline_after(timeout_ms))
+        except HTTPException as e:
+            error = {"error": e.detail, "status": e.status_code}
+            if e.headers and "Retry-After" in e.headers:
+                error["retry_after"] = e.headers["Retry-After"]
+            return error
+        result = results[0]
+        return {
+            "is_inappropriate": result["is_inappropriate"],
+            "confidence": result["confidence"],
+            "deadline_missed": result["deadline_missed"],
+            "model_used": model_type.value,
+            "model_version": result.get("model_version")
+        }
+
+    session = ScanSession(score, websocket.send_json)
+    streaming_stats.opened(session)
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                await session.send({"id": None, "error": "Messages must be JSON", "status": 400})
+                continue
+            items = message.get("items", [message]) if isinstance(message, dict) else []
+            if not items:
+                await session.send({"id": None, "error": "Expected an item or a list of items", "status": 400})
+            for item in items:
+                if not isinstance(item, dict) or "id" not in item or not isinstance(item.get("text"), str):
+                    await session.send({
+                        "id": item.get("id") if isinstance(item, dict) else None,
+                        "error": "Each item needs an id and a text",
+                        "status": 400
+                    })
+                    continue
+                await session.submit(item["id"], item["text"])
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
+        streaming_stats.closed(session)
+
 @app.get("/health", response_model=ModelStatusResponse)
 async def health_check():
     """
@@ -255,11 +1214,31 @@ async def health_check():
     - status: API status (healthy/unhealthy)
     - roberta_status: RoBERTa model loading status
     - bert_status: BERT model loading status
+    - student_status: Distilled student model loading status
     - device: Device being used (CPU/CUDA)
     - roberta_model: Path of the RoBERTa model
     - bert_model: Path of the BERT model
+    - student_model: Path of the distilled student model
     - active_model: Currently active model
     - last_error: Last error messages if models failed to load
+    - batching: Batching engine statistics per model, including queue depth, expected wait, per-lane
+      (interactive/bulk) depth and latency, and the batch controller's mode, SLO, observed p95 and
+      recent decisions
+    - rate_limit: Per-client rate limiter settings and rejections
+    - warmup: Warmup duration and cold/warm single-request latency per model
+    - load_info: Where each model was loaded from, how long loading took, its inference backend and
+      dtype, and its memory (RSS added, peak RSS during load, size of the weights)
+    - early_exit: Per-model exit-layer counts, average layers run and estimated speedup
+    - padding_free: Per-model forward passes per batch and share of padded tokens skipped
+    - dedup: Per-model near-duplicate index size, hits and reuse rate
+    - prediction_cache: Shared prediction cache store, L1 and shared hits and hit rate
+    - ensemble: Ensemble weights and per-member latency
+    - load_jobs: Latest background load (hot swap) per model and its state
+    - model_store: Model store directory and the current published version per model
+    - streaming: Open WebSocket sessions, items streamed and the in-session reuse rate
+    - saturation: Per model, the share of the last 30s spent in forward passes, its CPU
+      threads and share, and whether it is saturated
+    - process_rss_mb: Resident memory of the whole service
     - uptime_seconds: Time since the service started
     """
     uptime = time.time() - start_time
@@ -268,45 +1247,84 @@ async def health_check():
         "status": "healthy",
         "roberta_status": "loaded" if model_loaded[ModelType.ROBERTA] else "loading" if model_loading[ModelType.ROBERTA] else "not_loaded",
         "bert_status": "loaded" if model_loaded[ModelType.BERT] else "loading" if model_loading[ModelType.BERT] else "not_loaded",
+        "student_status": "loaded" if model_loaded[ModelType.STUDENT] else "loading" if model_loading[ModelType.STUDENT] else "not_loaded",
         "device": str(device) if device else "not set",
         "roberta_model": MODEL_PATHS[ModelType.ROBERTA],
         "bert_model": MODEL_PATHS[ModelType.BERT],
+        "student_model": MODEL_PATHS[ModelType.STUDENT],
         "active_model": active_model,
         "last_error": {
             ModelType.ROBERTA: last_error[ModelType.ROBERTA],
-            ModelType.BERT: last_error[ModelType.BERT]
+            ModelType.BERT: last_error[ModelType.BERT],
+            ModelType.STUDENT: last_error[ModelType.STUDENT]
+        },
+        "batching": {model_type: engine.snapshot() for model_type, engine in engines.items()},
+        "rate_limit": rate_limiter.snapshot(),
+        "warmup": warmup_stats,
+        "load_info": load_info,
+        "ensemble": ensemble_stats.snapshot(),
+        "load_jobs": load_jobs,
+        "model_store": {
+            "dir": model_store.root,
+            "watching": store_watcher is not None and not store_watcher.done(),
+            "models": store_status
+        },
+        "streaming": streaming_stats.snapshot(),
+        "saturation": {model_type: engine.saturation() for model_type, engine in engines.items()},
+        "process_rss_mb": rss_mb(),
+        "prediction_cache": prediction_cache.snapshot() if prediction_cache else {"store": "none"},
+        "padding_free": {
+            model_type: record["padding_free"].snapshot()
+            for model_type, record in loaded_models.items() if record is not None and record["padding_free"] is not None
+        },
+        "dedup": {model_type: index.snapshot() for model_type, index in dedup_indexes.items()},
+        "early_exit": {
+            model_type: classifier.stats.snapshot()
+            for model_type, classifier in early_exits.items() if classifier is not None
         },
         "uptime_seconds": uptime
     }
 
 @app.post("/switch-model/{model_type}", status_code=status.HTTP_200_OK)
-async def switch_model(model_type: ModelType):
+async def switch_model(model_type: ModelType, response: Response):
     """
-    Switch the active model between RoBERTa and BERT.
+    Switch the active model between RoBERTa, BERT, the distilled student
+    and the BERT + RoBERTa ensemble.
+
+    A model that isn't loaded yet is loaded and warmed in the background
+    and becomes active once it is ready; the call returns 202 right away
+    and requests keep going to the current model meanwhile.
 
     Parameters:
-    - model_type: The model to switch to (roberta or bert)
+    - model_type: The model to switch to (roberta, bert, student or ensemble)
 
     Returns:
     - message: Success message
-    - active_model: The new active model
+    - active_model: The active model (still the old one while loading)
+    - loading: Jobs started for models that weren't loaded
     """
     global active_model
 
-    # Check if the model is loaded
-    if not model_loaded[model_type]:
-        if model_loading[model_type]:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail=f"{model_type.capitalize()} model is currently loading. Please try again later."
-            )
-
-        # Try to initialize the model
-        if not initialize_model(model_type):
+    if model_type == ModelType.ENSEMBLE:
+        if not ensemble_members:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to load {model_type.capitalize()} model: {last_error[model_type]}"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Ensemble mode is not configured, check ENSEMBLE_WEIGHTS"
             )
+        missing = [member for member in ensemble_members if not model_loaded[member]]
+    else:
+        missing = [] if model_loaded[model_type] else [model_type]
+
+    if missing:
+        for member in missing:
+            start_background_load(member, activate=model_type != ModelType.ENSEMBLE)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {
+            "message": f"Loading {', '.join(m.capitalize() for m in missing)} model in the background; "
+                       f"{'switch again once it is loaded' if model_type == ModelType.ENSEMBLE else 'it becomes active when ready'}",
+            "active_model": active_model,
+            "loading": {member: load_jobs[member] for member in missing}
+        }
 
     # Switch the active model
     active_model = model_type
@@ -317,6 +1335,112 @@ async def switch_model(model_type: ModelType):
         "active_model": model_type
     }
 
+class ModelLoadRequest(BaseModel):
+    # Directory of the new version; defaults to the configured source
+    path: Optional[str] = None
+    # Make it the active model once it is ready
+    activate: bool = False
+
+def require_admin(http_request: Request):
+    """Check the admin key; the /admin endpoints are refused altogether while ADMIN_API_KEY is unset."""
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Admin endpoints are disabled; set ADMIN_API_KEY to enable them")
+    if not hmac.compare_digest(http_request.headers.get("x-api-key", ""), ADMIN_API_KEY):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin API key required")
+
+def loadable_path(path):
+    """Whether `path` is a directory under the model store or the artifacts directory."""
+    real = os.path.realpath(path)
+    for root in (model_store.root, ARTIFACTS_DIR):
+        root = os.path.realpath(root)
+        if real != root and os.path.commonpath([real, root]) == root:
+            return os.path.isdir(real)
+    return False
+
+@app.post("/admin/models/{model_type}/load", status_code=status.HTTP_202_ACCEPTED)
+async def load_model_version_endpoint(model_type: ModelType, request: ModelLoadRequest, http_request: Request):
+    """
+    Load a new version of a model and hot-swap it in with no downtime.
+
+    The version is loaded and warmed in the background while the current
+    one keeps serving. The swap is atomic: batches already running finish
+    on the old weights, later ones use the new weights, and the old copy
+    is then released. Poll GET on the same path for progress.
+
+    Parameters:
+    - model_type: The model to replace (roberta, bert or student)
+    - path: Optional directory of the new version, under MODEL_STORE_DIR or ARTIFACTS_DIR
+    - activate: Also make it the active model once ready
+    """
+    require_admin(http_request)
+    if model_type == ModelType.ENSEMBLE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Load the ensemble's member models individually"
+        )
+    if request.path is not None and not loadable_path(request.path):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Not a model directory under {model_store.root} or {ARTIFACTS_DIR}: {request.path}"
+        )
+
+    job = load_jobs.get(model_type)
+    if job is not None and job["state"] == "loading":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{model_type.capitalize()} model is already being loaded"
+        )
+    return start_background_load(model_type, request.path, request.activate)
+
+@app.get("/admin/models/{model_type}/load")
+async def load_status_endpoint(model_type: ModelType, http_request: Request):
+    """Progress of the latest background load of a model, and the version being served."""
+    require_admin(http_request)
+    return {
+        "job": load_jobs.get(model_type),
+        "serving_version": model_versions.get(model_type)
+    }
+
+class BatchingOverride(BaseModel):
+    max_batch_size: Optional[int] = None
+    max_wait_ms: Optional[float] = None
+    # True hands control back to the controller; False pins the current values
+    auto: Optional[bool] = None
+
+@app.put("/admin/batching/{model_type}")
+async def batching_override_endpoint(model_type: ModelType, request: BatchingOverride, http_request: Request):
+    """
+    Override the batch controller for a model.
+
+    Setting max_batch_size and/or max_wait_ms pins them and stops automatic
+    tuning for that model; {"auto": true} hands control back. Returns the
+    engine's batching statistics.
+    """
+    require_admin(http_request)
+    if model_type == ModelType.ENSEMBLE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Set batching for the ensemble's member models individually"
+        )
+    if request.max_batch_size is not None and not 1 <= request.max_batch_size <= BATCH_SIZE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"max_batch_size must be between 1 and {BATCH_SIZE_LIMIT}"
+        )
+    if request.max_wait_ms is not None and not 0 <= request.max_wait_ms <= BATCH_WAIT_LIMIT_MS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"max_wait_ms must be between 0 and {BATCH_WAIT_LIMIT_MS}"
+        )
+
+    engine = engines[model_type]
+    if request.max_batch_size is not None or request.max_wait_ms is not None or request.auto is False:
+        engine.controller.override(engine, request.max_batch_size, request.max_wait_ms)
+    if request.auto:
+        engine.controller.resume()
+    return engine.snapshot()
+
 @app.get("/", include_in_schema=False)
 async def root():
     """Redirect to docs"""
@@ -335,6 +1459,55 @@ async def startup_event():
     logger.info("Initializing BERT model...")
     initialize_model(ModelType.BERT)
 
+    # The distilled student is optional; load it only once it has been trained
+    if ModelType.STUDENT in startup_models():
+        logger.info("Initializing student model...")
+        initialize_model(ModelType.STUDENT)
+
+    # Start the batching engines shared by all front-ends
+    for engine in engines.values():
+        await engine.start()
+
+    # Confirm every executor thread runs with its own torch thread budget
+    budgeted = {**executors, "model-loader": model_loader, "evaluation": evaluation_executor}
+    for name, executor in budgeted.items():
+        try:
+            await asyncio.wrap_future(executor.check())
+        except Exception as e:
+            logger.error(f"{name} CPU budget not applied: {str(e)}")
+
+    # Pick up versions published to the model store while running
+    global store_watcher
+    if MODEL_STORE_WATCH:
+        store_watcher = asyncio.create_task(watch_model_store())
+
+    # Start the gRPC front-end alongside the HTTP app
+    global grpc_server
+    if serve_grpc is not None:
+        try:
+            grpc_server = await serve_grpc(score_texts, GRPC_PORT)
+        except Exception as e:
+            logger.error(f"Failed to start gRPC server: {str(e)}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the gRPC server and batching engines, and flush cache writes"""
+    if store_watcher is not None:
+        store_watcher.cancel()
+    if grpc_server is not None:
+        await grpc_server.stop(grace=5)
+    for engine in engines.values():
+        await engine.stop()
+    if prediction_cache is not None:
+        prediction_cache.close()
+
+# Evaluations are bulk work: one at a time, off the event loop, and limited to
+# EVALUATION_CPU_SHARE of the CPUs so they can't take cores from serving
+evaluation_executor = budgeted_executor("evaluation", EVALUATION_CPU_SHARE)
+
+async def run_evaluation(evaluate):
+    return await asyncio.get_running_loop().run_in_executor(evaluation_executor, evaluate)
+
 @app.post("/metrics/save", status_code=status.HTTP_200_OK)
 async def save_metrics_endpoint(request: Request, model_type: Optional[ModelType] = None):
     """
@@ -342,7 +1515,7 @@ async def save_metrics_endpoint(request: Request, model_type: Optional[ModelType
     This is typically called after model evaluation or periodically.
 
     Parameters:
-    - model_type: Optional model to evaluate (roberta or bert). If not specified, uses the active model.
+    - model_type: Optional model to evaluate (roberta, bert or student). If not specified, uses the active model.
     """
     try:
         # For quick testing, use random metrics
@@ -399,13 +1572,24 @@ async def save_metrics_endpoint(request: Request, model_type: Optional[ModelType
                 from evaluate_model import main as evaluate_roberta
 
                 # Run the evaluation
-                metrics = evaluate_roberta()
+                metrics = await run_evaluation(evaluate_roberta)
+            elif model_to_evaluate == ModelType.ENSEMBLE:
+                return {
+                    "status": "error",
+                    "message": "The ensemble has no metrics of its own; evaluate its member models"
+                }
+            elif model_to_evaluate == ModelType.STUDENT:
+                # Evaluate the distilled student the same way
+                from distill_model import evaluate_student
+
+                # Run the evaluation
+                metrics = await run_evaluation(evaluate_student)
             else:
                 # Import the BERT evaluation module
                 from evaluate_bert_model import main as evaluate_bert
 
                 # Run the evaluation
-                metrics = evaluate_bert()
+                metrics = await run_evaluation(evaluate_bert)
 
             if metrics:
                 return {
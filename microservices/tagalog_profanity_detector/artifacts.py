@@ -0,0 +1,126 @@
+import os
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger("tagalog-profanity-detector.artifacts")
+
+# Directory holding one compiled bundle per model, see compile_artifacts.py
+ARTIFACTS_DIR = os.environ.get('ARTIFACTS_DIR', './artifacts')
+MANIFEST_NAME = "manifest.json"
+
+# Where each model's weights come from when neither the model store nor a
+# compiled bundle has them. The service and the offline tools both use
+# these, so a bundle is always compiled from the model the service serves
+MODEL_SOURCES = {
+    "roberta": "jcblaise/roberta-tagalog-large",
+    # Also accepts a vocabulary-pruned copy, see prune_vocab.py
+    "bert": os.environ.get('BERT_MODEL_PATH', './models/google-bert-multilingual-tagalog-profanity'),
+    # Small model distilled from RoBERTa-large, see distill_model.py
+    "student": os.environ.get('STUDENT_MODEL_PATH', './models/student-tagalog-profanity')
+}
+# Without a trained BERT the base model is used
+BASE_BERT_MODEL = "google-bert/bert-base-multilingual-uncased"
+if not os.path.exists(MODEL_SOURCES["bert"]):
+    MODEL_SOURCES["bert"] = BASE_BERT_MODEL
+# Directories set explicitly in the environment (e.g. a pruned BERT) are
+# loaded in preference to a compiled bundle of the original model
+EXPLICIT_SOURCES = {
+    name for name, variable in (("bert", "BERT_MODEL_PATH"), ("student", "STUDENT_MODEL_PATH"))
+    if os.environ.get(variable) and os.path.isdir(MODEL_SOURCES[name])
+}
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def bundle_path(model_name, artifacts_dir=None):
+    return os.path.join(artifacts_dir or ARTIFACTS_DIR, model_name)
+
+
+def write_manifest(bundle_dir, info):
+    """Record every file in the bundle with its size and hash, plus `info`."""
+    files = {}
+    for name in sorted(os.listdir(bundle_dir)):
+        path = os.path.join(bundle_dir, name)
+        if name == MANIFEST_NAME or not os.path.isfile(path):
+            continue
+        files[name] = {"size": os.path.getsize(path), "sha256": file_sha256(path)}
+
+    manifest = {**info, "files": files}
+    with open(os.path.join(bundle_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(bundle_dir):
+    with open(os.path.join(bundle_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def verify_bundle(bundle_dir, check_hashes=False):
+    """
+    Check that every file listed in the manifest is present with the right
+    size (and hash, if asked). Returns the manifest, or None if the bundle
+    is missing or incomplete.
+    """
+    if not os.path.exists(os.path.join(bundle_dir, MANIFEST_NAME)):
+        return None
+    try:
+        manifest = read_manifest(bundle_dir)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Unreadable manifest in {bundle_dir}: {str(e)}")
+        return None
+
+    for name, meta in manifest.get("files", {}).items():
+        path = os.path.join(bundle_dir, name)
+        if not os.path.isfile(path) or os.path.getsize(path) != meta["size"]:
+            logger.warning(f"Artifact bundle {bundle_dir} is incomplete: {name} is missing or truncated")
+            return None
+        if check_hashes and file_sha256(path) != meta["sha256"]:
+            logger.warning(f"Artifact bundle {bundle_dir} is corrupt: {name} hash mismatch")
+            return None
+    return manifest
+
+
+def find_bundle(model_name, artifacts_dir=None):
+    """Return (bundle_dir, manifest) for a usable compiled bundle, or (None, None)."""
+    bundle_dir = bundle_path(model_name, artifacts_dir)
+    manifest = verify_bundle(bundle_dir)
+    if manifest is None:
+        return None, None
+    return bundle_dir, manifest
+
+
+def weights_version(model_path, manifest=None):
+    """
+    Short identifier of the weights a model was loaded from: the weights
+    hash from a bundle manifest, else a hash of the path and, for local
+    directories, the weight files' modification times.
+    """
+    files = (manifest or {}).get("files", {})
+    for name in ("model.safetensors", "pytorch_model.bin"):
+        if name in files:
+            return files[name]["sha256"][:12]
+
+    stamp = model_path
+    for name in ("model.safetensors", "pytorch_model.bin"):
+        path = os.path.join(model_path, name)
+        if os.path.isfile(path):
+            stamp += f"|{name}|{os.path.getmtime(path)}"
+    return hashlib.sha1(stamp.encode()).hexdigest()[:12]
+
+
+# Keyword arguments for from_pretrained when loading a compiled bundle:
+# local files only (no Hub lookups), and weights streamed from the
+# memory-mapped safetensors file instead of being materialised twice
+BUNDLE_LOAD_KWARGS = {
+    "local_files_only": True,
+    "low_cpu_mem_usage": True
+}
@@ -0,0 +1,148 @@
+import os
+import time
+import logging
+from collections import deque
+
+logger = logging.getLogger("tagalog-profanity-detector.batch-controller")
+
+# Adjust batch size and wait window at runtime to keep p95 latency under the SLO
+BATCH_CONTROLLER = os.environ.get('BATCH_CONTROLLER', 'true').lower() in ('1', 'true', 'yes')
+# p95 target for queue wait + forward pass, per text; BATCH_SLO_P95_MS_<MODEL> overrides it per model
+BATCH_SLO_P95_MS = float(os.environ.get('BATCH_SLO_P95_MS', '250'))
+# Bounds the controller stays within
+BATCH_SIZE_MIN = int(os.environ.get('BATCH_SIZE_MIN', '1'))
+BATCH_SIZE_LIMIT = int(os.environ.get('BATCH_SIZE_LIMIT', '128'))
+BATCH_WAIT_LIMIT_MS = float(os.environ.get('BATCH_WAIT_LIMIT_MS', '50'))
+# Seconds between decisions, and texts observed before one is made
+CONTROL_INTERVAL_SECONDS = float(os.environ.get('BATCH_CONTROL_INTERVAL_SECONDS', '2'))
+CONTROL_MIN_SAMPLES = 20
+# Grow only while p95 stays below this fraction of the SLO
+HEADROOM = 0.8
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class BatchController:
+    """
+    Feedback controller for one BatchingEngine.
+
+    The engine reports each batch: its size, its forward-pass time and the
+    latency of each interactive text in it, from enqueue to result. Every CONTROL_INTERVAL_SECONDS the controller looks
+    at the p95 of those latencies:
+
+    - over the SLO: shrink the batch by a quarter if the forward pass alone
+      uses up the budget; else halve the wait window if batches aren't
+      full (waiting adds directly to latency); else grow the batch, since
+      texts are queueing behind full batches and larger passes drain the
+      queue faster;
+    - well under it, with batches filling up: grow the batch by a quarter
+      for throughput;
+    - well under it, with batches mostly empty: widen the wait window so
+      each pass gathers more texts.
+
+    An operator override pins both values until the controller is resumed.
+    """
+
+    def __init__(self, name, slo_ms=None, enabled=BATCH_CONTROLLER):
+        self.name = name
+        self.slo_ms = slo_ms or float(os.environ.get(f'BATCH_SLO_P95_MS_{name.upper()}', BATCH_SLO_P95_MS))
+        self.mode = "auto" if enabled else "fixed"
+        self._latencies = []
+        self._batch_sizes = []
+        self._batch_ms = []
+        self._last_decision_at = time.monotonic()
+        self.last_p95_ms = None
+        self.decisions = 0
+        self.history = deque(maxlen=20)
+
+    def observe(self, engine, batch_size, latencies_ms, batch_ms):
+        """Record one batch and, when due, retune `engine`."""
+        self._latencies.extend(latencies_ms)
+        self._batch_sizes.append(batch_size)
+        self._batch_ms.append(batch_ms)
+
+        now = time.monotonic()
+        if now - self._last_decision_at < CONTROL_INTERVAL_SECONDS or len(self._latencies) < CONTROL_MIN_SAMPLES:
+            return
+        p95 = percentile(self._latencies, 0.95)
+        fill = sum(self._batch_sizes) / len(self._batch_sizes) / engine.max_batch_size
+        avg_batch_ms = sum(self._batch_ms) / len(self._batch_ms)
+        self._latencies, self._batch_sizes, self._batch_ms = [], [], []
+        self._last_decision_at = now
+        self.last_p95_ms = p95
+
+        if self.mode == "auto":
+            self._decide(engine, p95, fill, avg_batch_ms)
+
+    def _decide(self, engine, p95, fill, avg_batch_ms):
+        size, wait = engine.max_batch_size, engine.max_wait_ms
+        budget = self.slo_ms * HEADROOM
+        # A text typically waits for the pass ahead of it and then its own
+        pass_too_slow = 2 * avg_batch_ms > budget
+        # Room to grow the batch by a quarter without the pass becoming too slow
+        can_grow = size < BATCH_SIZE_LIMIT and 2 * avg_batch_ms * 1.25 <= budget
+        if p95 > self.slo_ms:
+            if pass_too_slow and size > BATCH_SIZE_MIN:
+                size = max(BATCH_SIZE_MIN, int(size * 0.75))
+                reason = "p95 over SLO, forward pass too slow: smaller batches"
+            elif wait > 0 and fill < 0.9:
+                wait = wait / 2 if wait > 0.5 else 0.0
+                reason = "p95 over SLO: shorter wait"
+            elif fill >= 0.9 and can_grow:
+                size = min(BATCH_SIZE_LIMIT, size + max(1, size // 4))
+                reason = "p95 over SLO, texts queueing behind full batches: larger batches"
+            else:
+                # Beyond what batching can fix; admission control sheds the excess
+                return
+        elif p95 < budget and fill >= 0.9 and can_grow:
+            size = min(BATCH_SIZE_LIMIT, size + max(1, size // 4))
+            reason = "batches full: larger batches"
+        elif p95 < budget and fill < 0.5 and wait < BATCH_WAIT_LIMIT_MS \
+                and avg_batch_ms + 2 * max(wait, 1.0) < budget:
+            wait = min(BATCH_WAIT_LIMIT_MS, max(1.0, wait * 1.5))
+            reason = "batches sparse: longer wait"
+        else:
+            return
+
+        if (size, wait) != (engine.max_batch_size, engine.max_wait_ms):
+            self._apply(engine, size, wait, f"{reason} (p95 {p95:.1f}ms, SLO {self.slo_ms:.0f}ms)")
+
+    def _apply(self, engine, size, wait, reason):
+        engine.max_batch_size, engine.max_wait_ms = size, wait
+        self.decisions += 1
+        self.history.append({
+            "at": time.time(),
+            "max_batch_size": size,
+            "max_wait_ms": wait,
+            "p95_ms": self.last_p95_ms,
+            "reason": reason
+        })
+        logger.info(f"{self.name} batching: max_batch_size={size}, max_wait_ms={wait:.1f}: {reason}")
+
+    def override(self, engine, max_batch_size=None, max_wait_ms=None):
+        """Pin the batch size and/or wait window; the controller stops adjusting them."""
+        self.mode = "manual"
+        self._apply(
+            engine,
+            max_batch_size if max_batch_size is not None else engine.max_batch_size,
+            max_wait_ms if max_wait_ms is not None else engine.max_wait_ms,
+            "operator override"
+        )
+
+    def resume(self):
+        self.mode = "auto"
+        self._latencies, self._batch_sizes, self._batch_ms = [], [], []
+        self._last_decision_at = time.monotonic()
+        logger.info(f"{self.name} batching back under automatic control")
+
+    def snapshot(self):
+        return {
+            "mode": self.mode,
+            "slo_p95_ms": self.slo_ms,
+            "last_p95_ms": self.last_p95_ms,
+            "decisions": self.decisions,
+            "history": list(self.history)
+        }
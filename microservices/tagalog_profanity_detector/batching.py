@@ -0,0 +1,381 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import Overloaded, RequestTooLarge, BATCH_MAX_QUEUE, BATCH_MAX_QUEUE_BULK
+from batch_controller import percentile
+
+logger = logging.getLogger("tagalog-profanity-detector.batching")
+
+# Batching settings
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', '32'))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', '5'))
+# Bulk texts queued this long get a batch even while interactive work is waiting
+BATCH_BULK_MAX_DELAY_MS = float(os.environ.get('BATCH_BULK_MAX_DELAY_MS', '2000'))
+# Smoothing factor for the moving average of batch time
+BATCH_TIME_EWMA_ALPHA = 0.2
+# Recent per-text latencies kept per lane for /health
+LANE_LATENCY_WINDOW = 1000
+# Utilization is measured over this many recent seconds; a model busy (or
+# with its interactive queue full) beyond SATURATION_LEVEL is saturated
+SATURATION_WINDOW_SECONDS = 30.0
+SATURATION_LEVEL = 0.9
+
+
+class Priority(str, Enum):
+    """Scheduling lane of a request."""
+    INTERACTIVE = "interactive"
+    BULK = "bulk"
+
+
+def deadline_after(timeout_ms=None, deadline=None):
+    """
+    Convert a relative timeout (milliseconds) and/or an absolute deadline
+    (Unix epoch seconds) into an engine deadline on the perf_counter clock.
+    The earlier of the two wins; returns None if neither is given.
+    """
+    now = time.perf_counter()
+    candidates = []
+    if timeout_ms is not None:
+        candidates.append(now + timeout_ms / 1000.0)
+    if deadline is not None:
+        candidates.append(now + (deadline - time.time()))
+    return min(candidates) if candidates else None
+
+
+class _Item:
+    __slots__ = ("text", "future", "enqueued_at", "deadline")
+
+    def __init__(self, text, future, deadline=None):
+        self.text = text
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.deadline = deadline
+
+
+class BatchingEngine:
+    """
+    Gather prediction requests for one model into batched forward passes.
+
+    Every front-end (HTTP, gRPC) submits texts here. A single worker task
+    collects queued items until the batch is full or the oldest item has
+    waited `max_wait_ms`, then runs `predict_fn(texts)` on the engine's
+    executor so the event loop stays free. `predict_fn` must return one
+    result per text, in order.
+
+    Texts are queued in one of two lanes (see Priority). Interactive texts
+    are always batched first; bulk texts use the model only while no
+    interactive text is waiting. A bulk text queued for `bulk_max_delay_ms`
+    still gets a batch, alternating with interactive batches, so bulk work
+    is slowed but never starved. A batch holds texts from one lane only.
+
+    Items may carry a deadline (see `deadline_after`). Items whose deadline
+    has passed by the time their batch is formed are dropped before the
+    forward pass and resolve to None instead of a result.
+
+    Each lane is bounded (`max_queue_size`, `bulk_max_queue_size`);
+    submissions that would exceed it are refused with Overloaded, carrying
+    the expected wait as a retry hint, rather than piling up unbounded work.
+    A submission larger than the whole lane could never be admitted and is
+    refused with RequestTooLarge instead.
+
+    An optional `controller` (see batch_controller.py) is shown every
+    finished batch and may retune `max_batch_size` and `max_wait_ms`.
+    Only interactive latencies count towards its SLO.
+
+    Give each model its own `executor` (see cpu_budget.py) so one model's
+    forward passes never wait behind another's.
+    """
+
+    def __init__(self, name, predict_fn, max_batch_size=BATCH_MAX_SIZE,
+                 max_wait_ms=BATCH_MAX_WAIT_MS, max_queue_size=BATCH_MAX_QUEUE, executor=None, controller=None,
+                 bulk_max_queue_size=BATCH_MAX_QUEUE_BULK, bulk_max_delay_ms=BATCH_BULK_MAX_DELAY_MS):
+        self.name = name
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue_size = max_queue_size
+        self.max_queue_sizes = {Priority.INTERACTIVE: max_queue_size, Priority.BULK: bulk_max_queue_size}
+        self.bulk_max_delay_ms = bulk_max_delay_ms
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"infer-{name}")
+        self.controller = controller
+
+        self._lanes = None
+        self._wakeup = None
+        self._worker = None
+        self._in_flight = 0
+        self._batch_ms_avg = None
+        self._promoted_last = False
+        self._started_at = None
+        self._busy_since = None
+        self._busy = deque()
+
+        self.stats = {
+            "batches": 0,
+            "items": 0,
+            "errors": 0,
+            "rejected": 0,
+            "expired": 0,
+            "bulk_promotions": 0,
+            "last_batch_size": 0,
+            "last_batch_ms": 0.0
+        }
+        self.lane_stats = {lane: {"items": 0, "batches": 0, "rejected": 0, "expired": 0} for lane in Priority}
+        self._lane_latencies = {lane: deque(maxlen=LANE_LATENCY_WINDOW) for lane in Priority}
+
+    async def start(self):
+        """Start the batching worker on the running event loop."""
+        if self._worker is not None and not self._worker.done():
+            return
+        self._lanes = {lane: deque() for lane in Priority}
+        self._wakeup = asyncio.Event()
+        self._started_at = time.perf_counter()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and fail anything still queued."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for queue in (self._lanes or {}).values():
+            while queue:
+                item = queue.popleft()
+                if not item.future.done():
+                    item.future.set_exception(RuntimeError(f"{self.name} batching engine stopped"))
+
+    @property
+    def queue_depth(self):
+        return sum(len(queue) for queue in self._lanes.values()) if self._lanes is not None else 0
+
+    def lane_depth(self, lane):
+        return len(self._lanes[lane]) if self._lanes is not None else 0
+
+    def expected_wait_ms(self, extra_items=0, priority=Priority.INTERACTIVE):
+        """
+        Estimate how long `extra_items` new items would wait for their result:
+        the batch in flight plus every batch needed to drain the queue ahead
+        of them, at the recent average batch time. Interactive items only
+        wait for interactive work; bulk items wait for both lanes.
+        """
+        if self._batch_ms_avg is None:
+            return 0.0
+        ahead = self.lane_depth(Priority.INTERACTIVE)
+        if priority == Priority.BULK:
+            ahead += self.lane_depth(Priority.BULK)
+        batches = math.ceil((ahead + extra_items) / self.max_batch_size)
+        if self._in_flight:
+            batches += 1
+        return batches * self._batch_ms_avg
+
+    async def submit(self, texts, deadline=None, priority=Priority.INTERACTIVE):
+        """
+        Queue texts in a lane and wait for their results, in the same order.
+        Texts whose deadline passed before they were scored come back as None.
+        """
+        if self._lanes is None:
+            raise RuntimeError(f"{self.name} batching engine is not running")
+
+        lane = Priority(priority)
+        queue = self._lanes[lane]
+        if len(texts) > self.max_queue_sizes[lane]:
+            raise RequestTooLarge(
+                f"{len(texts)} texts is more than the {self.name} {lane.value} queue holds "
+                f"({self.max_queue_sizes[lane]}); send them in smaller requests"
+            )
+        if len(queue) + len(texts) > self.max_queue_sizes[lane]:
+            self.stats["rejected"] += 1
+            self.lane_stats[lane]["rejected"] += 1
+            raise Overloaded(
+                f"{self.name} {lane.value} queue is full ({len(queue)}/{self.max_queue_sizes[lane]})",
+                self.expected_wait_ms(len(texts), lane) / 1000.0
+            )
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            queue.append(_Item(text, future, deadline))
+            futures.append(future)
+        self._wakeup.set()
+        return await asyncio.gather(*futures)
+
+    async def predict(self, text, deadline=None, priority=Priority.INTERACTIVE):
+        """Queue a single text and wait for its result."""
+        results = await self.submit([text], deadline, priority)
+        return results[0]
+
+    def _pick_lane(self):
+        """Interactive first; bulk when idle, or in turns once its oldest text has waited too long."""
+        interactive, bulk = self._lanes[Priority.INTERACTIVE], self._lanes[Priority.BULK]
+        if not bulk:
+            lane = Priority.INTERACTIVE
+        elif not interactive:
+            lane = Priority.BULK
+        elif not self._promoted_last and \
+                (time.perf_counter() - bulk[0].enqueued_at) * 1000 >= self.bulk_max_delay_ms:
+            self.stats["bulk_promotions"] += 1
+            self._promoted_last = True
+            return Priority.BULK
+        else:
+            lane = Priority.INTERACTIVE
+        self._promoted_last = False
+        return lane
+
+    async def _collect(self):
+        """Wait for the first item, then fill the batch from its lane until full or timed out."""
+        while not any(self._lanes.values()):
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+        lane = self._pick_lane()
+        queue = self._lanes[lane]
+        batch = [queue.popleft()]
+        deadline = batch[0].enqueued_at + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            if queue:
+                batch.append(queue.popleft())
+                continue
+            # Don't hold up interactive work to top up a bulk batch
+            if lane == Priority.BULK and self._lanes[Priority.INTERACTIVE]:
+                break
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return lane, batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lane, batch = await self._collect()
+            # Callers that gave up (cancelled) or whose deadline has passed
+            # don't need a forward pass
+            now = time.perf_counter()
+            live = []
+            for item in batch:
+                if item.future.done():
+                    continue
+                if item.deadline is not None and item.deadline <= now:
+                    self.stats["expired"] += 1
+                    self.lane_stats[lane]["expired"] += 1
+                    item.future.set_result(None)
+                    continue
+                live.append(item)
+            batch = live
+            if not batch:
+                continue
+
+            started = self._busy_since = time.perf_counter()
+            self._in_flight = len(batch)
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.predict_fn, [item.text for item in batch]
+                )
+                if len(results) != len(batch):
+                    # Pairing results with texts would leave callers waiting forever
+                    raise RuntimeError(f"{self.name} returned {len(results)} results for {len(batch)} texts")
+            except Exception as e:
+                self._in_flight = 0
+                self._busy_since = None
+                self._busy.append((started, time.perf_counter()))
+                logger.error(f"{self.name} batch of {len(batch)} failed: {str(e)}", exc_info=True)
+                self.stats["errors"] += 1
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            elapsed_ms = (finished - started) * 1000
+            self._in_flight = 0
+            self._busy_since = None
+            self._busy.append((started, finished))
+            if self._batch_ms_avg is None:
+                self._batch_ms_avg = elapsed_ms
+            else:
+                self._batch_ms_avg += BATCH_TIME_EWMA_ALPHA * (elapsed_ms - self._batch_ms_avg)
+            self.stats["batches"] += 1
+            self.stats["items"] += len(batch)
+            self.stats["last_batch_size"] = len(batch)
+            self.stats["last_batch_ms"] = elapsed_ms
+            self.lane_stats[lane]["batches"] += 1
+            self.lane_stats[lane]["items"] += len(batch)
+
+            for item, result in zip(batch, results):
+                if not item.future.done():
+                    item.future.set_result(result)
+
+            latencies = [(finished - item.enqueued_at) * 1000 for item in batch]
+            self._lane_latencies[lane].extend(latencies)
+            if self.controller is not None:
+                self.controller.observe(
+                    self, len(batch), latencies if lane == Priority.INTERACTIVE else [], elapsed_ms
+                )
+
+    def utilization(self):
+        """Fraction of the last SATURATION_WINDOW_SECONDS spent in forward passes."""
+        if self._started_at is None:
+            return 0.0
+        now = time.perf_counter()
+        window_start = max(self._started_at, now - SATURATION_WINDOW_SECONDS)
+        while self._busy and self._busy[0][1] <= window_start:
+            self._busy.popleft()
+        busy = sum(finished - max(started, window_start) for started, finished in self._busy)
+        if self._busy_since is not None:
+            busy += now - max(self._busy_since, window_start)
+        return min(1.0, busy / (now - window_start)) if now > window_start else 0.0
+
+    def saturation(self):
+        """How close this model is to its own capacity, whatever the other models are doing."""
+        utilization = self.utilization()
+        queue_fill = self.lane_depth(Priority.INTERACTIVE) / self.max_queue_size if self.max_queue_size else 0.0
+        return {
+            "utilization": utilization,
+            "threads": getattr(self.executor, "threads", None),
+            "cpu_share": getattr(self.executor, "share", None),
+            "queue_depth": self.queue_depth,
+            "queue_fill": queue_fill,
+            "expected_wait_ms": self.expected_wait_ms(),
+            "saturated": utilization >= SATURATION_LEVEL or queue_fill >= SATURATION_LEVEL
+        }
+
+    def snapshot(self):
+        """Engine statistics for /health."""
+        batches = self.stats["batches"]
+        lanes = {}
+        for lane in Priority:
+            latencies = self._lane_latencies[lane]
+            lanes[lane.value] = {
+                **self.lane_stats[lane],
+                "queue_depth": self.lane_depth(lane),
+                "max_queue_size": self.max_queue_sizes[lane],
+                "expected_wait_ms": self.expected_wait_ms(priority=lane),
+                "avg_latency_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+                "p95_latency_ms": percentile(latencies, 0.95) if latencies else 0.0
+            }
+        return {
+            **self.stats,
+            "queue_depth": self.queue_depth,
+            "max_queue_size": self.max_queue_size,
+            "expected_wait_ms": self.expected_wait_ms(),
+            "avg_batch_ms": self._batch_ms_avg or 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "avg_batch_size": self.stats["items"] / batches if batches else 0.0,
+            "lanes": lanes,
+            "saturation": self.saturation(),
+            "controller": self.controller.snapshot() if self.controller is not None else None
+        }
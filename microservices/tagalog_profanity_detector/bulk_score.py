@@ -0,0 +1,224 @@
+import os
+import csv
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger("bulk-scorer")
+
+CHECKPOINT_NAME = "checkpoint.json"
+
+# Set in each worker process by _init_worker
+_worker = {}
+
+
+def read_rows(path, text_field, id_field=None, chunk_size=10000):
+    """
+    Stream (row_number, id, text) chunks from a JSONL, CSV or Parquet file
+    without loading the whole file.
+    """
+    def rows():
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            columns = [text_field] + ([id_field] if id_field else [])
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+                yield from batch.to_pylist()
+        elif path.endswith(".csv"):
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                yield from csv.DictReader(f)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    chunk = []
+    for number, row in enumerate(rows()):
+        text = row.get(text_field)
+        chunk.append((number, row.get(id_field) if id_field else number, "" if text is None else str(text)))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def length_sorted_batches(rows, batch_size):
+    """Split rows into batches of similar length so little padding is scored."""
+    ordered = sorted(rows, key=lambda row: len(row[2]))
+    return [ordered[i:i + batch_size] for i in range(0, len(ordered), batch_size)]
+
+
+def _init_worker(model_name, model_path, threads):
+    import torch
+    from compile_artifacts import load_model
+    from artifacts import weights_version, verify_bundle
+
+    torch.set_num_threads(threads)
+    model, tokenizer, model_path = load_model(model_name, model_path=model_path)
+    _worker.update(
+        model=model,
+        tokenizer=tokenizer,
+        version=weights_version(model_path, verify_bundle(model_path))
+    )
+
+
+def _score_batch(batch):
+    import torch
+
+    model, tokenizer = _worker["model"], _worker["tokenizer"]
+    inputs = tokenizer([text for _, _, text in batch], return_tensors="pt",
+                       padding=True, truncation=True, max_length=512)
+    with torch.no_grad():
+        probabilities = torch.softmax(model(**inputs).logits.float(), dim=-1)
+    return [
+        (number, row_id, bool(probability[1] > probability[0]), float(probability.max()), _worker["version"])
+        for (number, row_id, _), probability in zip(batch, probabilities)
+    ]
+
+
+class OutputWriter:
+    """
+    Writes each finished chunk as its own part file (Parquet when pyarrow is
+    available, else JSONL), renamed into place once complete.
+    """
+
+    def __init__(self, output_dir, fmt):
+        self.output_dir = output_dir
+        self.fmt = fmt
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, chunk_index, results, model_name):
+        path = os.path.join(self.output_dir, f"part-{chunk_index:05d}.{self.fmt}")
+        columns = {
+            "row": [r[0] for r in results],
+            "id": [r[1] for r in results],
+            "is_inappropriate": [r[2] for r in results],
+            "confidence": [r[3] for r in results],
+            "model": [model_name] * len(results),
+            "model_version": [r[4] for r in results]
+        }
+        tmp = f"{path}.tmp"
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            pq.write_table(pa.table(columns), tmp)
+        else:
+            with open(tmp, "w", encoding="utf-8") as f:
+                for values in zip(*columns.values()):
+                    f.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False) + "\n")
+        os.replace(tmp, path)
+        return path
+
+
+def load_checkpoint(output_dir, args, version, fmt):
+    path = os.path.join(output_dir, CHECKPOINT_NAME)
+    if not os.path.exists(path):
+        return {"input": os.path.abspath(args.input), "model": args.model, "version": version,
+                "chunk_size": args.chunk_size, "format": fmt, "chunks_done": 0, "rows_done": 0}
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    # Chunk boundaries must match for the completed parts to line up, and
+    # every part must come from the same weights and be in the same format
+    for key, value in (("input", os.path.abspath(args.input)), ("model", args.model),
+                       ("version", version), ("chunk_size", args.chunk_size), ("format", fmt)):
+        if checkpoint.get(key) != value:
+            raise ValueError(f"Checkpoint in {output_dir} was written with {key}={checkpoint.get(key)!r}, "
+                             f"not {value!r}; use a new --output directory")
+    return checkpoint
+
+
+def save_checkpoint(output_dir, checkpoint):
+    path = os.path.join(output_dir, CHECKPOINT_NAME)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Score a large JSONL/CSV/Parquet file offline, resumably")
+    parser.add_argument("--input", required=True)
+    parser.add_argument("--output", required=True, help="Directory for part files and the checkpoint")
+    parser.add_argument("--model", choices=["roberta", "bert", "student"], default="bert")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default=None, help="Column copied to the output (default: row number)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: CPUs / --threads-per-worker)")
+    parser.add_argument("--threads-per-worker", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Rows per part file and checkpoint")
+    parser.add_argument("--format", choices=["parquet", "jsonl"], default=None,
+                        help="Output format (default: parquet if pyarrow is installed)")
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None:
+        try:
+            import pyarrow  # noqa: F401
+            fmt = "parquet"
+        except ImportError:
+            fmt = "jsonl"
+            logger.warning("pyarrow not installed, writing JSONL parts")
+
+    from compile_artifacts import resolve_model
+    from artifacts import weights_version
+
+    # Resolve the weights once, as the service does, so every worker (and
+    # every resumed run) scores with the same version
+    model_path, manifest = resolve_model(args.model)
+    version = weights_version(model_path, manifest)
+
+    workers = args.workers or max(1, cpus // args.threads_per_worker)
+    writer = OutputWriter(args.output, fmt)
+    checkpoint = load_checkpoint(args.output, args, version, fmt)
+    if checkpoint["chunks_done"]:
+        logger.info(f"Resuming after {checkpoint['chunks_done']} chunks ({checkpoint['rows_done']} rows)")
+
+    logger.info(f"Scoring {args.input} with {args.model} version {version} from {model_path} "
+                f"on {workers} workers x {args.threads_per_worker} threads")
+    started = time.time()
+    rows_this_run = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(args.model, model_path, args.threads_per_worker)) as pool:
+        for chunk_index, chunk in enumerate(read_rows(args.input, args.text_field, args.id_field, args.chunk_size)):
+            if chunk_index < checkpoint["chunks_done"]:
+                continue
+            chunk_started = time.time()
+            results = []
+            for batch_results in pool.map(_score_batch, length_sorted_batches(chunk, args.batch_size)):
+                results.extend(batch_results)
+            results.sort(key=lambda result: result[0])
+            writer.write(chunk_index, results, args.model)
+
+            checkpoint["chunks_done"] = chunk_index + 1
+            checkpoint["rows_done"] += len(chunk)
+            save_checkpoint(args.output, checkpoint)
+
+            rows_this_run += len(chunk)
+            elapsed = time.time() - started
+            logger.info(f"Chunk {chunk_index}: {len(chunk)} rows at {len(chunk) / (time.time() - chunk_started):.1f}/s; "
+                        f"{checkpoint['rows_done']} rows done, sustained {rows_this_run / elapsed:.1f} rows/s")
+
+    elapsed = time.time() - started
+    summary = {
+        "rows_scored": rows_this_run,
+        "rows_total": checkpoint["rows_done"],
+        "seconds": elapsed,
+        "rows_per_second": rows_this_run / elapsed if elapsed else None,
+        "workers": workers,
+        "output": args.output,
+        "format": fmt
+    }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import os
+import time
+import shutil
+import logging
+import argparse
+
+import torch
+import transformers
+from transformers import (
+    AutoModelForSequenceClassification,
+    AutoTokenizer,
+    BertTokenizer,
+    BertForSequenceClassification
+)
+
+from artifacts import (
+    ARTIFACTS_DIR, MODEL_SOURCES, EXPLICIT_SOURCES, BUNDLE_LOAD_KWARGS,
+    bundle_path, write_manifest, find_bundle, verify_bundle
+)
+from model_store import ModelStore
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("artifact-compiler")
+
+MODEL_LOADERS = {
+    "roberta": (AutoTokenizer, AutoModelForSequenceClassification),
+    "bert": (BertTokenizer, BertForSequenceClassification),
+    "student": (AutoTokenizer, AutoModelForSequenceClassification)
+}
+
+
+def resolve_model(model_name, artifacts_dir=ARTIFACTS_DIR, store=None):
+    """
+    (model_path, manifest) of the weights the service would load: the model
+    store's current version, then an explicitly set BERT_MODEL_PATH /
+    STUDENT_MODEL_PATH directory, then the compiled bundle, then the
+    original source (manifest None unless it is a bundle).
+    """
+    model_path, manifest = (store or ModelStore()).current(model_name)
+    if model_path:
+        return model_path, manifest
+    if model_name in EXPLICIT_SOURCES:
+        return MODEL_SOURCES[model_name], verify_bundle(MODEL_SOURCES[model_name])
+    model_path, manifest = find_bundle(model_name, artifacts_dir)
+    if model_path:
+        return model_path, manifest
+    return MODEL_SOURCES[model_name], None
+
+
+def load_model(model_name, artifacts_dir=ARTIFACTS_DIR, model_path=None):
+    """
+    Load a model and tokenizer for offline tooling from `model_path`, by
+    default the same weights the service serves (see `resolve_model`).
+    Returns (model, tokenizer, model_path).
+    """
+    tokenizer_class, model_class = MODEL_LOADERS[model_name]
+    if model_path is None:
+        model_path, manifest = resolve_model(model_name, artifacts_dir)
+    else:
+        manifest = verify_bundle(model_path)
+    if manifest:
+        tokenizer = tokenizer_class.from_pretrained(model_path, local_files_only=True)
+        model = model_class.from_pretrained(model_path, num_labels=2, **BUNDLE_LOAD_KWARGS)
+    else:
+        tokenizer = tokenizer_class.from_pretrained(model_path)
+        model = model_class.from_pretrained(model_path, num_labels=2)
+    model.eval()
+    logger.info(f"Loaded {model_name} from {model_path}")
+    return model, tokenizer, model_path
+
+
+def compile_model(model_name, artifacts_dir=ARTIFACTS_DIR):
+    """
+    Load a model once from its source (Hub or local directory) and write it
+    as a self-contained bundle: safetensors weights, config, tokenizer files
+    and a manifest with per-file hashes. Services load the bundle with
+    local files only, so boot needs no download and no pickle unpacking.
+    """
+    source = MODEL_SOURCES[model_name]
+    tokenizer_class, model_class = MODEL_LOADERS[model_name]
+    output_dir = bundle_path(model_name, artifacts_dir)
+
+    logger.info(f"Compiling {model_name} from {source} into {output_dir}...")
+    start_time = time.time()
+
+    tokenizer = tokenizer_class.from_pretrained(source)
+    model = model_class.from_pretrained(source, num_labels=2)
+    model.eval()
+
+    # Write into a temporary directory and swap it in, so a service never
+    # sees a half-written bundle
+    staging_dir = f"{output_dir}.tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+
+    model.save_pretrained(staging_dir, safe_serialization=True)
+    tokenizer.save_pretrained(staging_dir)
+
+    manifest = write_manifest(staging_dir, {
+        "model_name": model_name,
+        "source": source,
+        "model_class": model_class.__name__,
+        "tokenizer_class": tokenizer_class.__name__,
+        "num_parameters": sum(p.numel() for p in model.parameters()),
+        "dtype": str(next(model.parameters()).dtype),
+        "torch_version": torch.__version__,
+        "transformers_version": transformers.__version__,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    })
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(staging_dir, output_dir)
+
+    size_mb = sum(meta["size"] for meta in manifest["files"].values()) / (1024 * 1024)
+    logger.info(f"{model_name} bundle written in {time.time() - start_time:.2f} seconds ({size_mb:.1f} MB)")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile models into fast-loading artifact bundles")
+    parser.add_argument("--model", choices=["roberta", "bert", "student", "all"], default="all",
+                        help="Model to compile (default: all)")
+    parser.add_argument("--output", default=ARTIFACTS_DIR,
+                        help=f"Artifacts directory (default: {ARTIFACTS_DIR})")
+    args = parser.parse_args()
+
+    if args.model == "all":
+        # The student only exists once distill_model.py has been run
+        model_names = [name for name in MODEL_SOURCES
+                       if name != "student" or os.path.exists(MODEL_SOURCES[name])]
+    else:
+        model_names = [args.model]
+    for model_name in model_names:
+        compile_model(model_name, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("tagalog-profanity-detector.cpu-budget")
+
+# Share of the CPUs each model's forward passes may use, e.g.
+# "roberta=0.5,bert=0.3,student=0.2". Models loaded at startup that are left
+# out split what remains; unset, they get equal shares
+MODEL_CPU_SHARES_SPEC = os.environ.get('MODEL_CPU_SHARES', '')
+# Share for /metrics/save evaluations, which run next to serving
+EVALUATION_CPU_SHARE = float(os.environ.get('EVALUATION_CPU_SHARE', '0.1'))
+# Share for background model loads (warmup and checks during hot swaps)
+MODEL_LOADER_CPU_SHARE = float(os.environ.get('MODEL_LOADER_CPU_SHARE', '0.25'))
+
+# torch.set_num_threads also writes a process-wide default that a thread only
+# adopts at its first parallel op, so budgets are set and pinned one at a time
+_budget_lock = threading.Lock()
+
+
+def available_cpus():
+    """CPUs this process may run on (respects container/affinity limits)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def parse_shares(spec):
+    """Parse "name=share,..." into {name: share}."""
+    shares = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        share = float(value)
+        if not 0 < share <= 1:
+            raise ValueError(f"CPU share for {name.strip()} must be in (0, 1]: {spec!r}")
+        shares[name.strip().lower()] = share
+    return shares
+
+
+def cpu_shares(model_names, spec=MODEL_CPU_SHARES_SPEC, primary=None):
+    """
+    CPU share per model: the configured ones, with the remainder split
+    evenly over the other `primary` models (those served from startup;
+    default all). Models outside `primary` that aren't configured get an
+    even share of the whole machine, for when they are loaded later.
+    """
+    primary = model_names if primary is None else primary
+    try:
+        configured = {name: share for name, share in parse_shares(spec).items() if name in model_names}
+    except ValueError as e:
+        logger.error(f"Ignoring MODEL_CPU_SHARES: {str(e)}")
+        configured = {}
+    total = sum(configured.values())
+    if total > 1.0:
+        logger.warning(f"MODEL_CPU_SHARES adds up to {total:.2f}; scaling the shares down to 1")
+        configured = {name: share / total for name, share in configured.items()}
+    shares = dict(configured)
+    rest = [name for name in model_names if name not in configured and name in primary]
+    if rest:
+        remaining = max(0.0, 1.0 - sum(share for name, share in configured.items() if name in primary))
+        for name in rest:
+            # Never starve a model completely, even if the spec overcommits
+            shares[name] = max(remaining / len(rest), 1.0 / (len(model_names) * 4))
+    for name in model_names:
+        shares.setdefault(name, 1.0 / len(model_names))
+    return {name: shares[name] for name in model_names}
+
+
+class BudgetedExecutor(ThreadPoolExecutor):
+    """
+    Single-thread executor whose thread runs torch with at most `threads`
+    intra-op threads. With the OpenMP builds of torch (the standard CPU
+    wheels) the limit is per calling thread once that thread has run a
+    parallel op, so each model gets its own pool of that size instead of
+    all models sharing every core. `check()` confirms it took effect.
+    """
+
+    def __init__(self, name, threads, share=None):
+        super().__init__(max_workers=1, thread_name_prefix=f"infer-{name}",
+                         initializer=self._limit_threads, initargs=(threads,))
+        self.threads = threads
+        self.share = share
+
+    @staticmethod
+    def _limit_threads(threads):
+        import torch
+        with _budget_lock:
+            torch.set_num_threads(threads)
+            # Run a parallel op now, while the process-wide default is still
+            # ours, so this thread keeps `threads` whatever is set later
+            torch.ones(2).add_(1)
+            torch.get_num_threads()
+
+    def check(self):
+        """Future for the thread count torch uses on this executor; fails if it isn't `threads`."""
+        return self.submit(self._check_threads, self.threads)
+
+    @staticmethod
+    def _check_threads(threads):
+        import torch
+        actual = torch.get_num_threads()
+        if actual != threads:
+            raise RuntimeError(f"torch uses {actual} threads here instead of the budgeted {threads}")
+        return actual
+
+
+def budgeted_executor(name, share, cpus=None):
+    """A BudgetedExecutor with `share` of the CPUs, at least one thread."""
+    cpus = cpus or available_cpus()
+    threads = max(1, int(round(share * cpus)))
+    logger.info(f"{name}: {threads} of {cpus} CPU threads (share {share:.2f})")
+    return BudgetedExecutor(name, threads, share)
+
+
+def model_executors(model_names, primary=None, spec=MODEL_CPU_SHARES_SPEC, cpus=None):
+    """One BudgetedExecutor per model, sized by its CPU share."""
+    return {
+        name: budgeted_executor(name, share, cpus)
+        for name, share in cpu_shares(model_names, spec, primary).items()
+    }
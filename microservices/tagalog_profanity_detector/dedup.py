@@ -0,0 +1,196 @@
+import os
+import re
+import zlib
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+# Near-duplicate reuse settings
+DEDUP_ENABLED = os.environ.get('DEDUP_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+# Minimum estimated Jaccard similarity (over character shingles) to reuse a verdict
+DEDUP_THRESHOLD = float(os.environ.get('DEDUP_THRESHOLD', '0.85'))
+# Only verdicts at least this confident are reused
+DEDUP_MIN_CONFIDENCE = float(os.environ.get('DEDUP_MIN_CONFIDENCE', '0.9'))
+DEDUP_MAX_ENTRIES = int(os.environ.get('DEDUP_MAX_ENTRIES', '50000'))
+DEDUP_NUM_PERM = int(os.environ.get('DEDUP_NUM_PERM', '64'))
+DEDUP_BANDS = int(os.environ.get('DEDUP_BANDS', '16'))
+SHINGLE_SIZE = 3
+
+# Leetspeak substitutions, applied only inside words that contain letters
+LEET = str.maketrans({
+    "0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b",
+    "@": "a", "$": "s", "!": "i", "|": "l"
+})
+
+# Common Tagalog/Taglish text-speak spellings and their full forms
+SHORTHAND = {
+    "aq": "ako", "q": "ko", "u": "you", "ur": "your",
+    "xa": "siya", "cya": "siya", "sya": "siya", "xia": "siya",
+    "nmn": "naman", "nman": "naman", "lng": "lang", "lan": "lang",
+    "kc": "kasi", "kse": "kasi", "kz": "kasi", "pra": "para",
+    "tlga": "talaga", "tlaga": "talaga", "d2": "dito", "dn": "din", "dw": "daw",
+    "nde": "hindi", "hnd": "hindi", "hndi": "hindi", "di": "hindi",
+    "bkt": "bakit", "anu": "ano", "ung": "yung", "un": "yun", "pre": "pare",
+    "tngina": "tangina", "tnginamo": "tanginamo"
+}
+
+_SPACED_LETTERS = re.compile(r"\b(?:\w[\s.\-_*]+){2,}\w\b")
+_LETTER_SEPARATORS = re.compile(r"[\s.\-_*]+")
+_REPEATS = re.compile(r"(.)\1{2,}")
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def _join_spaced(match):
+    # Only runs of at least three letters; "1 2 3" or "si a" stay as they are
+    joined = _LETTER_SEPARATORS.sub("", match.group(0))
+    if sum(ch.isalpha() for ch in joined) < 3:
+        return match.group(0)
+    return joined
+
+
+def normalize(text):
+    """
+    Canonical form of a text for duplicate detection: lower-cased,
+    accents and look-alike characters folded, "p u t a" / "p.u.t.a"
+    joined (runs of three or more single letters only), text-speak expanded, leetspeak undone inside words, runs of
+    three or more repeated letters cut to two (Tagalog keeps real double
+    vowels, as in "maaga"), punctuation dropped and spacing collapsed.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _SPACED_LETTERS.sub(_join_spaced, text)
+
+    words = []
+    for word in text.split():
+        # Trailing punctuation is not leetspeak ("bobo!" is not "boboi")
+        word = word.rstrip(".,!?")
+        word = SHORTHAND.get(word, word)
+        if any(ch.isalpha() for ch in word):
+            word = word.translate(LEET)
+        words.append(word)
+    text = " ".join(words)
+
+    text = _REPEATS.sub(r"\1\1", text)
+    text = _NON_WORD.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+class MinHasher:
+    """MinHash signatures over character shingles, with a fixed seed."""
+
+    PRIME = (1 << 31) - 1
+
+    def __init__(self, num_perm=DEDUP_NUM_PERM, shingle_size=SHINGLE_SIZE, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.randint(1, self.PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, self.PRIME, size=num_perm).astype(np.uint64)
+
+    def shingles(self, text):
+        k = self.shingle_size
+        if len(text) <= k:
+            return {text}
+        return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+    def signature(self, text):
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) & self.PRIME for s in self.shingles(text)),
+            dtype=np.uint64
+        )
+        # (a * h + b) mod p for every permutation and shingle; a, h < 2^31 so no overflow
+        permuted = (np.outer(hashes, self._a) + self._b) % self.PRIME
+        return permuted.min(axis=0)
+
+
+class NearDuplicateIndex:
+    """
+    Recently scored texts with confident verdicts, searchable by
+    near-duplicate.
+
+    Exact matches on the normalized text are found directly; other texts
+    go through MinHash LSH (`bands` bands of the signature) and a
+    candidate is reused when its estimated Jaccard similarity reaches
+    `threshold`. Least recently used entries are evicted beyond
+    `max_entries`. Used from the event loop only, so it takes no locks.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD, min_confidence=DEDUP_MIN_CONFIDENCE,
+                 max_entries=DEDUP_MAX_ENTRIES, num_perm=DEDUP_NUM_PERM, bands=DEDUP_BANDS):
+        if num_perm % bands:
+            raise ValueError("DEDUP_NUM_PERM must be a multiple of DEDUP_BANDS")
+        self.threshold = threshold
+        self.min_confidence = min_confidence
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self._entries = OrderedDict()  # normalized text -> (signature, verdict)
+        self._buckets = {}             # (band, band hash) -> set of normalized texts
+        self.stats = {"lookups": 0, "exact_hits": 0, "near_hits": 0, "stored": 0, "evicted": 0}
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def lookup(self, normalized):
+        """Verdict of a stored near-duplicate of `normalized`, or None."""
+        self.stats["lookups"] += 1
+        entry = self._entries.get(normalized)
+        if entry is not None:
+            self._entries.move_to_end(normalized)
+            self.stats["exact_hits"] += 1
+            return entry[1]
+
+        signature = self.hasher.signature(normalized)
+        best, best_similarity = None, self.threshold
+        seen = set()
+        for key in self._band_keys(signature):
+            for candidate in self._buckets.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = float(np.mean(self._entries[candidate][0] == signature))
+                if similarity >= best_similarity:
+                    best, best_similarity = candidate, similarity
+        if best is None:
+            return None
+        self._entries.move_to_end(best)
+        self.stats["near_hits"] += 1
+        return self._entries[best][1]
+
+    def add(self, normalized, verdict):
+        """Remember a verdict if it is confident enough to be reused."""
+        if verdict["confidence"] < self.min_confidence or normalized in self._entries:
+            return
+        signature = self.hasher.signature(normalized)
+        self._entries[normalized] = (signature, verdict)
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(normalized)
+        self.stats["stored"] += 1
+
+        if len(self._entries) > self.max_entries:
+            evicted, (old_signature, _) = self._entries.popitem(last=False)
+            for key in self._band_keys(old_signature):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(evicted)
+                    if not bucket:
+                        del self._buckets[key]
+            self.stats["evicted"] += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._buckets.clear()
+
+    def snapshot(self):
+        hits = self.stats["exact_hits"] + self.stats["near_hits"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "min_confidence": self.min_confidence,
+            "reuse_rate": hits / self.stats["lookups"] if self.stats["lookups"] else 0.0
+        }
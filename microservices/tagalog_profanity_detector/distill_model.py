@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import statistics
+
+import torch
+import torch.nn.functional as F
+from datasets import load_dataset
+from transformers import (
+    AutoConfig,
+    AutoModelForSequenceClassification,
+    AutoTokenizer,
+    get_linear_schedule_with_warmup
+)
+
+from evaluate_model import evaluate_model, load_dataset_for_evaluation, save_metrics_to_db, save_model_log
+from precision import precision_parity, PARITY_CHECK_ENABLED
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("model-distiller")
+
+# Teacher: the fine-tuned RoBERTa-large classifier
+TEACHER_MODEL_PATH = os.environ.get('TEACHER_MODEL_PATH', './models/roberta-tagalog-profanity')
+
+# Student output - the path app.py serves as ModelType.STUDENT
+STUDENT_MODEL_PATH = os.environ.get('STUDENT_MODEL_PATH', './models/student-tagalog-profanity')
+STUDENT_MODEL_VERSION = os.environ.get('STUDENT_MODEL_VERSION', 'v1.0.0')
+REPORT_NAME = "distillation_report.json"
+
+DATASET_NAME = "mginoben/tagalog-profanity-dataset"
+
+
+def load_teacher(device):
+    logger.info(f"Loading teacher from {TEACHER_MODEL_PATH}...")
+    tokenizer = AutoTokenizer.from_pretrained(TEACHER_MODEL_PATH)
+    teacher = AutoModelForSequenceClassification.from_pretrained(TEACHER_MODEL_PATH, num_labels=2)
+    teacher.to(device)
+    teacher.eval()
+    return teacher, tokenizer
+
+
+def build_student(teacher, layers, hidden_size, heads):
+    """
+    A small classifier of the teacher's architecture family that shares its
+    tokenizer and vocabulary, so it can be served with the same pipeline.
+    """
+    config = AutoConfig.from_pretrained(TEACHER_MODEL_PATH, num_labels=2)
+    config.num_hidden_layers = layers
+    config.hidden_size = hidden_size
+    config.num_attention_heads = heads
+    config.intermediate_size = hidden_size * 4
+    student = AutoModelForSequenceClassification.from_config(config)
+    logger.info(f"Student: {layers} layers, hidden size {hidden_size}, "
+                f"{sum(p.numel() for p in student.parameters()) / 1e6:.1f}M parameters "
+                f"(teacher {sum(p.numel() for p in teacher.parameters()) / 1e6:.1f}M)")
+    return student
+
+
+def teacher_soft_labels(teacher, tokenizer, texts, device, batch_size, max_length):
+    """Teacher logits for every training text, computed once up front."""
+    logger.info(f"Computing teacher soft labels for {len(texts)} examples...")
+    all_logits = []
+    for i in range(0, len(texts), batch_size):
+        inputs = tokenizer(texts[i:i + batch_size], padding=True, truncation=True,
+                           max_length=max_length, return_tensors="pt").to(device)
+        with torch.no_grad():
+            all_logits.append(teacher(**inputs).logits.float().cpu())
+    return torch.cat(all_logits)
+
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature, alpha):
+    """Soft-label KL at `temperature` blended with hard-label cross-entropy."""
+    soft = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=-1),
+        F.softmax(teacher_logits / temperature, dim=-1),
+        reduction="batchmean"
+    ) * (temperature ** 2)
+    hard = F.cross_entropy(student_logits, labels)
+    return alpha * soft + (1 - alpha) * hard
+
+
+def train_student(student, tokenizer, texts, labels, soft_labels, device, args):
+    student.to(device)
+    student.train()
+
+    optimizer = torch.optim.AdamW(student.parameters(), lr=args.learning_rate, weight_decay=0.01)
+    steps_per_epoch = (len(texts) + args.batch_size - 1) // args.batch_size
+    scheduler = get_linear_schedule_with_warmup(
+        optimizer,
+        num_warmup_steps=int(0.1 * steps_per_epoch * args.epochs),
+        num_training_steps=steps_per_epoch * args.epochs
+    )
+
+    order = list(range(len(texts)))
+    for epoch in range(1, args.epochs + 1):
+        random.shuffle(order)
+        epoch_start = time.time()
+        losses = []
+        for i in range(0, len(order), args.batch_size):
+            idx = order[i:i + args.batch_size]
+            inputs = tokenizer([texts[j] for j in idx], padding=True, truncation=True,
+                               max_length=args.max_length, return_tensors="pt").to(device)
+            batch_labels = torch.tensor([labels[j] for j in idx], device=device)
+            batch_soft = soft_labels[idx].to(device)
+
+            loss = distillation_loss(student(**inputs).logits, batch_soft, batch_labels,
+                                     args.temperature, args.alpha)
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(student.parameters(), 1.0)
+            optimizer.step()
+            scheduler.step()
+            optimizer.zero_grad()
+            losses.append(loss.item())
+
+        logger.info(f"Epoch {epoch}/{args.epochs}: loss {statistics.mean(losses):.4f}, "
+                    f"time {time.time() - epoch_start:.1f}s")
+
+    student.eval()
+    return student
+
+
+def measure_latency(model, tokenizer, device, batch_size, runs=20):
+    """Median CPU/GPU latency in ms for a batch of typical short comments."""
+    texts = ["Grabe naman yung sinabi mo sa kanya kahapon, hindi ka ba nahihiya"] * batch_size
+    inputs = tokenizer(texts, padding=True, truncation=True, return_tensors="pt").to(device)
+    timings = []
+    with torch.no_grad():
+        model(**inputs)
+        for _ in range(runs):
+            started = time.perf_counter()
+            model(**inputs)
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def report_for(name, model, tokenizer, eval_dataset, device):
+    metrics = evaluate_model(model, tokenizer, eval_dataset, device)
+    return {
+        "model": name,
+        "parameters": sum(p.numel() for p in model.parameters()),
+        "latency_ms_batch_1": measure_latency(model, tokenizer, device, 1),
+        "latency_ms_batch_32": measure_latency(model, tokenizer, device, 32),
+        **metrics
+    }
+
+
+def evaluate_student():
+    """
+    Evaluate the saved student like the other models and save the metrics
+    to the database the same way; used by /metrics/save.
+    """
+    version = f"student-{STUDENT_MODEL_VERSION}"
+    try:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        tokenizer = AutoTokenizer.from_pretrained(STUDENT_MODEL_PATH)
+        model = AutoModelForSequenceClassification.from_pretrained(STUDENT_MODEL_PATH, num_labels=2)
+        model.to(device)
+        dataset = load_dataset_for_evaluation()
+        metrics = evaluate_model(model, tokenizer, dataset, device)
+
+        if PARITY_CHECK_ENABLED:
+            parity = precision_parity(model, tokenizer, dataset, device, evaluate_model)
+            metrics["precision_parity"] = parity
+            if not parity["passed"]:
+                save_model_log("warning", f"Student model {STUDENT_MODEL_VERSION} loses "
+                                          f"{parity['accuracy_drop']:.4f} accuracy in bfloat16", version)
+
+        save_metrics_to_db(metrics, version, "Distilled student")
+        save_model_log("info", f"Student model {STUDENT_MODEL_VERSION} evaluated successfully "
+                               f"with accuracy {metrics['accuracy']:.4f}", version)
+        return metrics
+    except Exception as e:
+        logger.error(f"Error evaluating student model: {str(e)}")
+        save_model_log("error", f"Error evaluating student model {STUDENT_MODEL_VERSION}: {str(e)}", version)
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill the RoBERTa-large classifier into a small student")
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--heads", type=int, default=4)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--learning-rate", type=float, default=5e-4)
+    parser.add_argument("--temperature", type=float, default=2.0)
+    parser.add_argument("--alpha", type=float, default=0.7,
+                        help="Weight of the soft-label loss (the rest is hard-label cross-entropy)")
+    parser.add_argument("--max-length", type=int, default=128)
+    parser.add_argument("--max-train-samples", type=int, default=None)
+    parser.add_argument("--output", default=STUDENT_MODEL_PATH)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # The base model has an untrained classification head; distilling it
+    # would overwrite the served student with a model that guesses
+    if not os.path.isdir(TEACHER_MODEL_PATH):
+        parser.error(f"Fine-tuned teacher not found at {TEACHER_MODEL_PATH}; set TEACHER_MODEL_PATH")
+
+    random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    logger.info(f"Using device: {device}")
+
+    teacher, tokenizer = load_teacher(device)
+
+    train_data = load_dataset(DATASET_NAME)["train"].to_list()
+    if args.max_train_samples:
+        train_data = train_data[:args.max_train_samples]
+    texts = [item["text"] for item in train_data]
+    labels = [item["label"] for item in train_data]
+
+    soft_labels = teacher_soft_labels(teacher, tokenizer, texts, device, args.batch_size, args.max_length)
+
+    student = build_student(teacher, args.layers, args.hidden_size, args.heads)
+    student = train_student(student, tokenizer, texts, labels, soft_labels, device, args)
+
+    os.makedirs(args.output, exist_ok=True)
+    student.save_pretrained(args.output, safe_serialization=True)
+    tokenizer.save_pretrained(args.output)
+    logger.info(f"Student saved to {args.output}")
+
+    # Score teacher and student with the same evaluation as evaluate_model.py
+    eval_dataset = load_dataset_for_evaluation()
+    teacher_report = report_for("teacher", teacher, tokenizer, eval_dataset, device)
+    student_report = report_for("student", student, tokenizer, eval_dataset, device)
+    report = {
+        "teacher_path": TEACHER_MODEL_PATH,
+        "student_path": args.output,
+        "student_config": {
+            "layers": args.layers,
+            "hidden_size": args.hidden_size,
+            "heads": args.heads
+        },
+        "teacher": teacher_report,
+        "student": student_report,
+        "speedup_batch_1": teacher_report["latency_ms_batch_1"] / student_report["latency_ms_batch_1"],
+        "speedup_batch_32": teacher_report["latency_ms_batch_32"] / student_report["latency_ms_batch_32"],
+        "accuracy_delta": student_report["accuracy"] - teacher_report["accuracy"],
+        "f1_delta": student_report["f1_score"] - teacher_report["f1_score"]
+    }
+    with open(os.path.join(args.output, REPORT_NAME), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    logger.info(f"Teacher: accuracy {teacher_report['accuracy']:.4f}, F1 {teacher_report['f1_score']:.4f}, "
+                f"{teacher_report['latency_ms_batch_1']:.1f} ms/text")
+    logger.info(f"Student: accuracy {student_report['accuracy']:.4f}, F1 {student_report['f1_score']:.4f}, "
+                f"{student_report['latency_ms_batch_1']:.1f} ms/text")
+    logger.info(f"Speedup: {report['speedup_batch_1']:.1f}x (batch 1), {report['speedup_batch_32']:.1f}x (batch 32)")
+
+
+if __name__ == "__main__":
+    main()
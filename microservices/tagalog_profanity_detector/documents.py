@@ -0,0 +1,132 @@
+import os
+import re
+from html.parser import HTMLParser
+
+from dedup import normalize
+
+# Largest document accepted, in characters of the request body
+DOCUMENT_MAX_CHARS = int(os.environ.get('DOCUMENT_MAX_CHARS', '2000000'))
+# Most distinct segments scored per document
+DOCUMENT_MAX_SEGMENTS = int(os.environ.get('DOCUMENT_MAX_SEGMENTS', '5000'))
+# Longer segments are cut at word boundaries into pieces of about this size
+MAX_SEGMENT_CHARS = int(os.environ.get('DOCUMENT_MAX_SEGMENT_CHARS', '400'))
+
+# Content that is never shown to a reader
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head", "iframe", "object"}
+# Tags that start a new line of text, so segments never run across them
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header",
+    "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul",
+    "button", "option", "label", "title"
+}
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+_HAS_WORD = re.compile(r"\w")
+_HTML_HINT = re.compile(r"<\s*(html|body|div|p|span|a|br|!doctype)\b", re.IGNORECASE)
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+        elif tag == "img":
+            alt = dict(attrs).get("alt")
+            if alt and not self._skip_depth:
+                self.parts.append(f"\n{alt}\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def looks_like_html(content):
+    return bool(_HTML_HINT.search(content[:4096]))
+
+
+def extract_text(content, content_type="auto"):
+    """Visible text of a document. HTML block elements become line breaks."""
+    if content_type == "html" or (content_type == "auto" and looks_like_html(content)):
+        extractor = _TextExtractor()
+        extractor.feed(content)
+        extractor.close()
+        return "".join(extractor.parts)
+    return content
+
+
+def _split_long(text, start):
+    """Cut an over-long piece at word boundaries, keeping offsets."""
+    while len(text) > MAX_SEGMENT_CHARS:
+        cut = text.rfind(" ", 0, MAX_SEGMENT_CHARS)
+        if cut <= 0:
+            cut = MAX_SEGMENT_CHARS
+        yield start, text[:cut]
+        skipped = len(text[cut:]) - len(text[cut:].lstrip())
+        start += cut + skipped
+        text = text[cut + skipped:]
+    if text:
+        yield start, text
+
+
+def segment(text):
+    """
+    Split text into (start, end, segment) by line and sentence, with
+    offsets into `text`. Pieces without any word characters are dropped.
+    """
+    segments = []
+    line_start = 0
+    for line in text.split("\n"):
+        position = 0
+        for sentence in _SENTENCE_END.split(line):
+            offset = line.index(sentence, position) if sentence else position
+            position = offset + len(sentence)
+            stripped = sentence.strip()
+            if not stripped or not _HAS_WORD.search(stripped):
+                continue
+            start = line_start + offset + (len(sentence) - len(sentence.lstrip()))
+            for piece_start, piece in _split_long(stripped, start):
+                segments.append((piece_start, piece_start + len(piece), piece))
+        line_start += len(line) + 1
+    return segments
+
+
+def group_segments(segments):
+    """
+    Group repeated segments (navigation, footers, boilerplate) by their
+    normalized text. Returns a list of (text, [(start, end), ...]) in order
+    of first appearance.
+    """
+    groups = {}
+    for start, end, text in segments:
+        key = normalize(text) or text.lower()
+        if key not in groups:
+            groups[key] = (text, [])
+        groups[key][1].append((start, end))
+    return list(groups.values())
+
+
+async def score_in_chunks(score, texts, chunk_size):
+    """
+    Score `texts` with `score(chunk)`, which returns (model_type, results),
+    in consecutive chunks of at most `chunk_size` texts. A model queue only
+    admits so many texts at once, so a long page is fed to it in turns
+    rather than refused.
+    """
+    model_type, results = None, []
+    for start in range(0, len(texts), chunk_size):
+        model_type, chunk_results = await score(texts[start:start + chunk_size])
+        results.extend(chunk_results)
+    return model_type, results
@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+
+import torch
+import torch.nn.functional as F
+
+logger = logging.getLogger("tagalog-profanity-detector.early-exit")
+
+# Early-exit settings
+EARLY_EXIT_DIR = os.environ.get('EARLY_EXIT_DIR', './early_exit')
+EARLY_EXIT_THRESHOLD = float(os.environ.get('EARLY_EXIT_THRESHOLD', '0.95'))
+
+
+def early_exit_enabled(model_name):
+    """Whether EARLY_EXIT_<MODEL> asks for the early-exit variant of a model."""
+    return os.environ.get(f'EARLY_EXIT_{model_name.upper()}', 'false').lower() in ('1', 'true', 'yes')
+
+
+def heads_path(model_name, exit_dir=None):
+    return os.path.join(exit_dir or EARLY_EXIT_DIR, f"{model_name}.pt")
+
+
+def default_exit_layers(num_layers):
+    """An exit after every quarter of the encoder (every 3 of 12, every 6 of 24)."""
+    step = max(1, num_layers // 4)
+    return list(range(step, num_layers, step))
+
+
+class ExitStats:
+    """Counts of which layer each text exited at, for /health."""
+
+    def __init__(self, num_layers):
+        self.num_layers = num_layers
+        self._lock = threading.Lock()
+        self.exits = {}
+        self.texts = 0
+        self.layers_run = 0
+
+    def record(self, layer, count):
+        with self._lock:
+            self.exits[layer] = self.exits.get(layer, 0) + count
+            self.texts += count
+            self.layers_run += layer * count
+
+    def snapshot(self):
+        with self._lock:
+            avg_layers = self.layers_run / self.texts if self.texts else float(self.num_layers)
+            return {
+                "texts": self.texts,
+                "exits_by_layer": dict(sorted(self.exits.items())),
+                "avg_layers": avg_layers,
+                # Encoder compute saved relative to running every layer
+                "estimated_speedup": self.num_layers / avg_layers if avg_layers else 1.0
+            }
+
+
+class EarlyExitClassifier(torch.nn.Module):
+    """
+    BERT/RoBERTa sequence classifier with small classifier heads on
+    intermediate encoder layers.
+
+    Layers run one at a time. After each exit layer, texts whose exit-head
+    confidence reaches `threshold` are finalised there and dropped from the
+    batch, so the remaining layers only run for the harder texts. Texts
+    that never exit get the original classifier's logits. The backbone and
+    its final classifier are the existing fine-tuned model, unchanged.
+    """
+
+    def __init__(self, model, exit_layers=None, threshold=EARLY_EXIT_THRESHOLD):
+        super().__init__()
+        self.model = model
+        self.base = model.base_model
+        self.num_layers = len(self.base.encoder.layer)
+        self.exit_layers = sorted(exit_layers or default_exit_layers(self.num_layers))
+        self.threshold = threshold
+
+        hidden_size = model.config.hidden_size
+        num_labels = model.config.num_labels
+        self.heads = torch.nn.ModuleDict({
+            str(layer): torch.nn.Sequential(
+                torch.nn.Linear(hidden_size, hidden_size),
+                torch.nn.Tanh(),
+                torch.nn.Linear(hidden_size, num_labels)
+            )
+            for layer in self.exit_layers
+        })
+        parameter = next(model.parameters())
+        self.heads.to(device=parameter.device, dtype=parameter.dtype)
+        self.stats = ExitStats(self.num_layers)
+
+    def _final_logits(self, hidden):
+        # BERT classifies the pooled [CLS] state; RoBERTa's head takes the
+        # whole sequence and picks <s> itself
+        if getattr(self.base, "pooler", None) is not None:
+            return self.model.classifier(self.model.dropout(self.base.pooler(hidden)))
+        return self.model.classifier(hidden)
+
+    def _head_logits(self, layer, hidden):
+        return self.heads[str(layer)](hidden[:, 0])
+
+    @torch.no_grad()
+    def forward(self, input_ids, attention_mask, token_type_ids=None):
+        """Logits for the batch, stopping early per text where confident."""
+        batch_size = input_ids.shape[0]
+        logits = torch.zeros((batch_size, self.model.config.num_labels), device=input_ids.device)
+        active = torch.arange(batch_size, device=input_ids.device)
+
+        hidden = self.base.embeddings(input_ids=input_ids, token_type_ids=token_type_ids)
+        mask = self.base.get_extended_attention_mask(attention_mask, input_ids.shape)
+
+        for index, layer_module in enumerate(self.base.encoder.layer):
+            hidden = layer_module(hidden, attention_mask=mask)[0]
+            layer = index + 1
+            if layer not in self.exit_layers:
+                continue
+
+            head_logits = self._head_logits(layer, hidden)
+            confidence = torch.softmax(head_logits, dim=-1).max(dim=-1).values
+            done = confidence >= self.threshold
+            if done.any():
+                logits[active[done]] = head_logits[done].float()
+                self.stats.record(layer, int(done.sum()))
+                keep = ~done
+                active, hidden, mask = active[keep], hidden[keep], mask[keep]
+                if active.numel() == 0:
+                    return logits
+
+        logits[active] = self._final_logits(hidden).float()
+        self.stats.record(self.num_layers, active.numel())
+        return logits
+
+    def save_heads(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        torch.save({
+            "exit_layers": self.exit_layers,
+            "num_layers": self.num_layers,
+            "hidden_size": self.model.config.hidden_size,
+            "state_dict": self.heads.state_dict()
+        }, path)
+
+    @classmethod
+    def load(cls, model, path, threshold=EARLY_EXIT_THRESHOLD):
+        """Attach heads trained by `train_heads` to a loaded model."""
+        checkpoint = torch.load(path, map_location=next(model.parameters()).device)
+        if checkpoint["hidden_size"] != model.config.hidden_size or \
+                checkpoint["num_layers"] != len(model.base_model.encoder.layer):
+            raise ValueError(f"Early-exit heads in {path} were trained for a different model")
+        classifier = cls(model, checkpoint["exit_layers"], threshold)
+        classifier.heads.load_state_dict(checkpoint["state_dict"])
+        classifier.eval()
+        return classifier
+
+
+def train_heads(classifier, tokenizer, texts, labels, device, epochs=2, batch_size=32,
+                learning_rate=1e-3, max_length=128, alpha=0.5):
+    """
+    Train only the exit heads; the backbone stays frozen. Each head learns
+    from the hard labels and from the model's own final logits, so it
+    agrees with the full model where it is confident.
+    """
+    model = classifier.model
+    model.eval()
+    for param in model.parameters():
+        param.requires_grad = False
+    classifier.heads.train()
+
+    optimizer = torch.optim.AdamW(classifier.heads.parameters(), lr=learning_rate)
+    order = list(range(len(texts)))
+    for epoch in range(1, epochs + 1):
+        random.shuffle(order)
+        epoch_start = time.time()
+        total_loss = 0.0
+        for i in range(0, len(order), batch_size):
+            idx = order[i:i + batch_size]
+            inputs = tokenizer([texts[j] for j in idx], padding=True, truncation=True,
+                               max_length=max_length, return_tensors="pt").to(device)
+            batch_labels = torch.tensor([labels[j] for j in idx], device=device)
+
+            with torch.no_grad():
+                outputs = model(**inputs, output_hidden_states=True)
+            teacher = F.softmax(outputs.logits, dim=-1)
+
+            loss = 0.0
+            for layer in classifier.exit_layers:
+                # hidden_states[0] is the embedding output
+                head_logits = classifier._head_logits(layer, outputs.hidden_states[layer])
+                loss = loss + alpha * F.cross_entropy(head_logits, batch_labels) + \
+                    (1 - alpha) * F.kl_div(F.log_softmax(head_logits, dim=-1), teacher, reduction="batchmean")
+
+            loss.backward()
+            optimizer.step()
+            optimizer.zero_grad()
+            total_loss += loss.item()
+
+        logger.info(f"Epoch {epoch}/{epochs}: loss {total_loss / max(1, len(order) // batch_size):.4f}, "
+                    f"time {time.time() - epoch_start:.1f}s")
+
+    classifier.heads.eval()
+    return classifier
+
+
+def compare(classifier, tokenizer, dataset, device, batch_size=32):
+    """Accuracy and wall-clock time of the full model versus early exit."""
+    texts = [item["text"] for item in dataset]
+    labels = torch.tensor([item["label"] for item in dataset])
+    results = {}
+    for name in ("full", "early_exit"):
+        predictions = []
+        started = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            inputs = tokenizer(texts[i:i + batch_size], padding=True, truncation=True,
+                               max_length=512, return_tensors="pt").to(device)
+            with torch.no_grad():
+                if name == "full":
+                    logits = classifier.model(**inputs).logits
+                else:
+                    logits = classifier(inputs["input_ids"], inputs["attention_mask"], inputs.get("token_type_ids"))
+            predictions.append(logits.argmax(dim=-1).cpu())
+        elapsed = time.perf_counter() - started
+        accuracy = (torch.cat(predictions) == labels).float().mean().item()
+        results[name] = {"accuracy": accuracy, "seconds": elapsed}
+    results["speedup"] = results["full"]["seconds"] / results["early_exit"]["seconds"]
+    results["exit_stats"] = classifier.stats.snapshot()
+    return results
+
+
+def main():
+    from datasets import load_dataset
+    from compile_artifacts import load_model
+    from evaluate_model import load_dataset_for_evaluation
+
+    parser = argparse.ArgumentParser(description="Train and evaluate early-exit heads for a classifier")
+    parser.add_argument("--model", choices=["roberta", "bert"], required=True)
+    parser.add_argument("--exit-layers", default=None,
+                        help="Comma-separated layers to attach heads to (default: every quarter)")
+    parser.add_argument("--threshold", type=float, default=EARLY_EXIT_THRESHOLD)
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--max-train-samples", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Heads file (default: EARLY_EXIT_DIR/<model>.pt)")
+    args = parser.parse_args()
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model, tokenizer, _ = load_model(args.model)
+    model.to(device)
+
+    exit_layers = [int(n) for n in args.exit_layers.split(",")] if args.exit_layers else None
+    classifier = EarlyExitClassifier(model, exit_layers, args.threshold)
+
+    train_data = load_dataset("mginoben/tagalog-profanity-dataset")["train"].to_list()
+    if args.max_train_samples:
+        train_data = train_data[:args.max_train_samples]
+    train_heads(classifier, tokenizer, [item["text"] for item in train_data],
+                [item["label"] for item in train_data], device, epochs=args.epochs)
+
+    output = args.output or heads_path(args.model)
+    classifier.save_heads(output)
+    logger.info(f"Early-exit heads saved to {output}")
+
+    results = compare(classifier, tokenizer, load_dataset_for_evaluation(), device)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    main()
@@ -0,0 +1,72 @@
+import os
+import logging
+
+logger = logging.getLogger("tagalog-profanity-detector.ensemble")
+
+# Member models and their weights, e.g. "roberta=0.6,bert=0.4"
+ENSEMBLE_WEIGHTS_SPEC = os.environ.get('ENSEMBLE_WEIGHTS', 'roberta=0.5,bert=0.5')
+# Smoothing factor for the per-model latency averages
+LATENCY_EWMA_ALPHA = 0.2
+
+
+def parse_weights(spec):
+    """Parse "name=weight,..." into {name: weight} with weights summing to 1."""
+    weights = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        weights[name.strip().lower()] = float(value) if value else 1.0
+    total = sum(weights.values())
+    if len(weights) < 2 or total <= 0:
+        raise ValueError(f"ENSEMBLE_WEIGHTS needs at least two models with positive weights: {spec!r}")
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def combine(member_results, weights):
+    """
+    Weighted average of the members' probabilities that each text is
+    inappropriate. `member_results` maps model name to that model's results
+    for the same texts; a text any member didn't score (deadline) stays None.
+    """
+    names = list(member_results)
+    combined = []
+    for per_model in zip(*(member_results[name] for name in names)):
+        if any(result is None for result in per_model):
+            combined.append(None)
+            continue
+        probability = sum(
+            weights[name] * (result["confidence"] if result["is_inappropriate"] else 1 - result["confidence"])
+            for name, result in zip(names, per_model)
+        )
+        combined.append({
+            "is_inappropriate": probability >= 0.5,
+            "confidence": max(probability, 1 - probability)
+        })
+    return combined
+
+
+class EnsembleStats:
+    """Per-member and end-to-end latency of ensemble requests."""
+
+    def __init__(self, weights):
+        self.weights = weights
+        self.requests = 0
+        self.last_ms = {}
+        self.avg_ms = {}
+
+    def record(self, latencies):
+        self.requests += 1
+        for name, ms in latencies.items():
+            self.last_ms[name] = ms
+            previous = self.avg_ms.get(name)
+            self.avg_ms[name] = ms if previous is None else \
+                LATENCY_EWMA_ALPHA * ms + (1 - LATENCY_EWMA_ALPHA) * previous
+
+    def snapshot(self):
+        return {
+            "weights": self.weights,
+            "requests": self.requests,
+            "last_ms": self.last_ms,
+            "avg_ms": self.avg_ms
+        }
@@ -6,9 +6,11 @@ import numpy as np
 from datasets import load_dataset
 from transformers import BertTokenizer, BertForSequenceClassification
 from sklearn.metrics import accuracy_score, precision_recall_fscore_support, confusion_matrix
-import requests
 import json
 
+from telemetry import get_shipper
+from precision import precision_parity, PARITY_CHECK_ENABLED
+
 # Try to load environment variables
 try:
     from dotenv import load_dotenv
@@ -236,32 +238,11 @@ def save_metrics_to_db(metrics):
     # Log the metrics locally since we might not be able to save to the database
     logger.info(f"Evaluation metrics: {json.dumps(payload, indent=2)}")
     
-    # Try to save to the database, but don't fail if it doesn't work
-    try:
-        headers = {
-            "Content-Type": "application/json",
-            "x-api-key": API_KEY
-        }
-        
-        logger.info(f"Saving metrics to database via API: {API_URL}/api/model/metrics/microservice")
-        response = requests.post(
-            f"{API_URL}/api/model/metrics/microservice",
-            json=payload,
-            headers=headers,
-            timeout=10  # Add a timeout to avoid hanging
-        )
-        
-        if response.status_code == 201:
-            logger.info(f"Metrics saved successfully to database")
-            return True
-        else:
-            logger.warning(f"Failed to save metrics to database: {response.status_code} - {response.text}")
-            # Return True anyway since we logged the metrics locally
-            return True
-    except Exception as e:
-        logger.warning(f"Error saving metrics to database: {str(e)}")
-        # Return True anyway since we logged the metrics locally
-        return True
+    # Queue the metrics for the background shipper; it spools them locally
+    # if the database API is unreachable, so evaluation never waits on it
+    get_shipper(API_URL, API_KEY).metrics(payload)
+    logger.info(f"Metrics queued for saving via API: {API_URL}/api/model/metrics/microservice")
+    return True
 
 def save_model_log(log_type, message):
     """Save a log message to the database."""
@@ -273,35 +254,9 @@ def save_model_log(log_type, message):
     else:
         logger.info(message)
     
-    # Try to save to the database, but don't fail if it doesn't work
-    try:
-        payload = {
-            "type": log_type,  # 'info', 'warning', or 'error'
-            "message": message,
-            "model_version": f"bert-{MODEL_VERSION}"
-        }
-        
-        headers = {
-            "Content-Type": "application/json",
-            "x-api-key": API_KEY
-        }
-        
-        response = requests.post(
-            f"{API_URL}/api/model/logs",
-            json=payload,
-            headers=headers,
-            timeout=5  # Add a timeout to avoid hanging
-        )
-        
-        if response.status_code == 201:
-            logger.info(f"Log saved successfully to database")
-            return True
-        else:
-            logger.warning(f"Failed to save log to database: {response.status_code} - {response.text}")
-            return True  # Return True anyway since we logged locally
-    except Exception as e:
-        logger.warning(f"Error saving log to database: {str(e)}")
-        return True  # Return True anyway since we logged locally
+    # Queue the log for the background shipper; don't wait on the network
+    get_shipper(API_URL, API_KEY).log(log_type, message, f"bert-{MODEL_VERSION}")
+    return True  # Return True anyway since we logged locally
 
 def main():
     """Main function to evaluate the model and save metrics."""
@@ -314,6 +269,14 @@ def main():
         
         # Evaluate model
         metrics = evaluate_model(model, tokenizer, dataset, device)
+
+        # Check that bfloat16 inference keeps accuracy within tolerance
+        if PARITY_CHECK_ENABLED:
+            parity = precision_parity(model, tokenizer, dataset, device, evaluate_model)
+            metrics["precision_parity"] = parity
+            if not parity["passed"]:
+                save_model_log("warning", f"BERT model {MODEL_VERSION} loses "
+                                          f"{parity['accuracy_drop']:.4f} accuracy in bfloat16")
         
         # Save metrics to database
         success = save_metrics_to_db(metrics)
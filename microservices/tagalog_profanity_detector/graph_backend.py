@@ -0,0 +1,256 @@
+import os
+import time
+import hashlib
+import logging
+import argparse
+import statistics
+
+import torch
+
+logger = logging.getLogger("tagalog-profanity-detector.graph")
+
+# Backend per model: 'eager' (default), 'torchscript' or 'compile'
+BACKENDS = ("eager", "torchscript", "compile")
+GRAPH_CACHE_DIR = os.environ.get('GRAPH_CACHE_DIR', './graph_cache')
+# Inputs are padded up to the nearest bucket so each graph sees few shapes
+SEQ_BUCKETS = [int(n) for n in os.environ.get('GRAPH_SEQ_BUCKETS', '32,64,128,256,512').split(',') if n]
+# Largest allowed |graph - eager| logit difference before falling back to eager
+GRAPH_ATOL = float(os.environ.get('GRAPH_ATOL', '1e-3'))
+
+# Texts used for the correctness check
+CHECK_TEXTS = [
+    "Ang ganda ng araw ngayon",
+    "Putang ina mo talaga, bobo ka",
+    "Salamat po sa tulong ninyo kahapon, sobrang laking bagay nun sa amin",
+    "grabe yung traffic sa EDSA kanina, halos dalawang oras ako sa jeep bago makarating sa opisina"
+]
+
+
+def backend_for(model_name):
+    """Configured backend for a model, from INFERENCE_BACKEND_<MODEL>."""
+    backend = os.environ.get(f'INFERENCE_BACKEND_{model_name.upper()}', 'eager').lower()
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown inference backend '{backend}' for {model_name}, using eager")
+        return "eager"
+    return backend
+
+
+def bucket_for(length, buckets=None):
+    """Smallest bucket that fits `length` tokens (the largest if none does)."""
+    buckets = buckets or SEQ_BUCKETS
+    for bucket in buckets:
+        if length <= bucket:
+            return bucket
+    return buckets[-1]
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Wrap a HF classifier so it takes plain tensors and returns logits."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask, return_dict=False)[0]
+
+
+class GraphClassifier:
+    """
+    Graph-mode version of a sequence classifier.
+
+    Inputs are padded to a sequence-length bucket and each bucket gets its
+    own graph: a frozen TorchScript trace saved under `cache_dir`, or a
+    `torch.compile` graph with a dynamic batch dimension (kept in the
+    inductor cache under `cache_dir`). Call it with tokenizer output padded
+    by `pad_to_bucket`; it returns logits like the eager model.
+    """
+
+    def __init__(self, model, backend, cache_dir, cache_key, buckets=None):
+        if backend not in ("torchscript", "compile"):
+            raise ValueError(f"Not a graph backend: {backend}")
+        self.model = model
+        self.backend = backend
+        self.buckets = sorted(buckets or SEQ_BUCKETS)
+        self.cache_dir = os.path.join(cache_dir, cache_key)
+        self.device = next(model.parameters()).device
+        self._graphs = {}
+        self._compiled = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _trace_path(self, bucket):
+        return os.path.join(self.cache_dir, f"seq{bucket}.pt")
+
+    def _example(self, bucket, batch_size=2):
+        input_ids = torch.ones((batch_size, bucket), dtype=torch.long, device=self.device)
+        attention_mask = torch.ones_like(input_ids)
+        return input_ids, attention_mask
+
+    def _build(self, bucket):
+        if self.backend == "compile":
+            if self._compiled is None:
+                os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.join(self.cache_dir, "inductor"))
+                os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+                self._compiled = torch.compile(_LogitsOnly(self.model), dynamic=True)
+            return self._compiled
+
+        path = self._trace_path(bucket)
+        if os.path.exists(path):
+            return torch.jit.load(path, map_location=self.device)
+
+        with torch.no_grad():
+            traced = torch.jit.trace(_LogitsOnly(self.model), self._example(bucket), check_trace=False)
+            traced = torch.jit.freeze(traced.eval())
+        torch.jit.save(traced, path)
+        return traced
+
+    def prepare(self):
+        """Build (or load from cache) the graph for every bucket and run it once."""
+        started = time.perf_counter()
+        for bucket in self.buckets:
+            graph = self._build(bucket)
+            with torch.no_grad():
+                graph(*self._example(bucket))
+            self._graphs[bucket] = graph
+        elapsed = time.perf_counter() - started
+        logger.info(f"Prepared {self.backend} graphs for buckets {self.buckets} in {elapsed:.2f} seconds")
+        return elapsed
+
+    def pad_to_bucket(self, tokenizer, texts, max_length=512):
+        """Tokenize texts and pad them to the bucket of the longest one."""
+        encoded = tokenizer(texts, truncation=True, max_length=min(max_length, self.buckets[-1]))
+        longest = max(len(ids) for ids in encoded["input_ids"])
+        bucket = bucket_for(longest, self.buckets)
+        return tokenizer.pad(
+            {"input_ids": encoded["input_ids"], "attention_mask": encoded["attention_mask"]},
+            padding="max_length",
+            max_length=bucket,
+            return_tensors="pt"
+        ).to(self.device)
+
+    def __call__(self, input_ids, attention_mask):
+        bucket = input_ids.shape[1]
+        graph = self._graphs.get(bucket)
+        if graph is None:
+            graph = self._graphs[bucket] = self._build(bucket)
+        with torch.no_grad():
+            return graph(input_ids, attention_mask)
+
+    def verify(self, tokenizer, texts=None, atol=GRAPH_ATOL):
+        """
+        Compare graph logits against the eager model on sample texts, padded
+        to every bucket in turn so each graph (cached or fresh) is checked.
+        Returns the largest absolute difference; raises if it exceeds `atol`.
+        """
+        texts = texts or CHECK_TEXTS
+        max_diff = 0.0
+        for bucket in self.buckets:
+            inputs = tokenizer(texts, truncation=True, max_length=bucket, padding="max_length",
+                               return_tensors="pt").to(self.device)
+            with torch.no_grad():
+                eager_logits = self.model(**inputs).logits
+            graph_logits = self(inputs["input_ids"], inputs["attention_mask"])
+            diff = (eager_logits.float() - graph_logits.float()).abs().max().item()
+            if diff > atol:
+                raise RuntimeError(f"{self.backend} logits for bucket {bucket} differ from eager by {diff:.2e} "
+                                   f"(tolerance {atol:.0e})")
+            max_diff = max(max_diff, diff)
+        logger.info(f"{self.backend} logits match eager within {max_diff:.2e} for buckets {self.buckets}")
+        return max_diff
+
+
+def cache_key_for(model_name, model_path, version, dtype):
+    """
+    Cache directory name tied to the weights (`version`, from
+    artifacts.weights_version), their dtype and the torch build, so
+    retrained weights at the same path never reuse old traces.
+    """
+    digest = hashlib.sha1(f"{model_path}|{version}|{dtype}|{torch.__version__}".encode()).hexdigest()[:12]
+    return f"{model_name}-{digest}"
+
+
+def build_graph_backend(model_name, model, tokenizer, model_path, version, cache_dir=GRAPH_CACHE_DIR,
+                        atol=GRAPH_ATOL):
+    """
+    Build the configured graph backend for a loaded model, whose weights
+    version is `version` (see artifacts.weights_version). `atol` bounds the
+    logit difference from eager (loosen it for reduced precision).
+
+    Returns (graph_classifier, info) where graph_classifier is None when the
+    model should run eagerly, either by configuration or because building or
+    the correctness check failed.
+    """
+    backend = backend_for(model_name)
+    info = {"backend": backend}
+    if backend == "eager":
+        return None, info
+
+    try:
+        dtype = next(model.parameters()).dtype
+        graph = GraphClassifier(model, backend, cache_dir, cache_key_for(model_name, model_path, version, dtype))
+        info["prepare_seconds"] = graph.prepare()
+        info["max_logit_diff"] = graph.verify(tokenizer, atol=atol)
+        return graph, info
+    except Exception as e:
+        logger.error(f"{backend} backend for {model_name} failed, falling back to eager: {str(e)}", exc_info=True)
+        return None, {"backend": "eager", "requested_backend": backend, "error": str(e)}
+
+
+def benchmark(model, graph, tokenizer, batch_sizes=(1, 8, 32), runs=10):
+    """Median eager and graph latency per bucket and batch size."""
+    rows = []
+    for bucket in graph.buckets:
+        for batch_size in batch_sizes:
+            text = " ".join(["salita"] * bucket)
+            inputs = graph.pad_to_bucket(tokenizer, [text] * batch_size, max_length=bucket)
+            timings = {}
+            for name, forward in (
+                ("eager", lambda: model(**inputs)),
+                (graph.backend, lambda: graph(inputs["input_ids"], inputs["attention_mask"]))
+            ):
+                samples = []
+                for _ in range(runs):
+                    started = time.perf_counter()
+                    with torch.no_grad():
+                        forward()
+                    samples.append((time.perf_counter() - started) * 1000)
+                timings[name] = statistics.median(samples)
+            rows.append({
+                "seq_length": bucket,
+                "batch_size": batch_size,
+                "eager_ms": timings["eager"],
+                "graph_ms": timings[graph.backend],
+                "speedup": timings["eager"] / timings[graph.backend]
+            })
+    return rows
+
+
+def main():
+    from compile_artifacts import load_model
+    from artifacts import verify_bundle, weights_version
+
+    parser = argparse.ArgumentParser(description="Build, check and benchmark a graph-mode backend")
+    parser.add_argument("--model", choices=["roberta", "bert", "student"], required=True)
+    parser.add_argument("--backend", choices=["torchscript", "compile"], default="torchscript")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    model, tokenizer, model_path = load_model(args.model)
+    version = weights_version(model_path, verify_bundle(model_path))
+    dtype = next(model.parameters()).dtype
+    graph = GraphClassifier(model, args.backend, GRAPH_CACHE_DIR, cache_key_for(args.model, model_path, version, dtype))
+    graph.prepare()
+    graph.verify(tokenizer)
+
+    print(f"{'seq':>5} {'batch':>5} {'eager ms':>10} {args.backend + ' ms':>15} {'speedup':>8}")
+    for row in benchmark(model, graph, tokenizer, runs=args.runs):
+        print(f"{row['seq_length']:>5} {row['batch_size']:>5} {row['eager_ms']:>10.2f} "
+              f"{row['graph_ms']:>15.2f} {row['speedup']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    main()
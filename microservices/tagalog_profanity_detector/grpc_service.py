@@ -0,0 +1,204 @@
+import os
+import time
+import asyncio
+import logging
+
+import grpc
+from fastapi import HTTPException
+
+from admission import rate_limit_key
+from batching import Priority, deadline_after
+
+# Generated from protos/profanity.proto, see the Dockerfile:
+#   python -m grpc_tools.protoc -I protos --python_out=. --grpc_python_out=. protos/profanity.proto
+import profanity_pb2
+import profanity_pb2_grpc
+
+logger = logging.getLogger("tagalog-profanity-detector.grpc")
+
+GRPC_PORT = int(os.environ.get('GRPC_PORT', '50051'))
+
+# HTTP status codes raised by the shared scoring path, mapped to gRPC codes
+STATUS_CODES = {
+    400: grpc.StatusCode.INVALID_ARGUMENT,
+    413: grpc.StatusCode.INVALID_ARGUMENT,
+    429: grpc.StatusCode.RESOURCE_EXHAUSTED,
+    503: grpc.StatusCode.UNAVAILABLE,
+    504: grpc.StatusCode.DEADLINE_EXCEEDED
+}
+
+
+def _status_code(exc):
+    return STATUS_CODES.get(exc.status_code, grpc.StatusCode.INTERNAL)
+
+
+async def _abort(context, exc):
+    """Fail the call, passing Retry-After on as trailing metadata."""
+    retry_after = (exc.headers or {}).get("Retry-After")
+    if retry_after:
+        context.set_trailing_metadata((("retry-after", retry_after),))
+    await context.abort(_status_code(exc), str(exc.detail))
+
+
+def _client_id(context):
+    """Identify the caller for rate limiting: a known API key, else the peer address."""
+    api_key = None
+    for key, value in context.invocation_metadata() or ():
+        if key == "x-api-key":
+            api_key = value
+    peer = context.peer() or ""
+    # Drop the port so every connection from one host shares a bucket
+    return rate_limit_key(api_key, peer.rsplit(':', 1)[0] if peer else None)
+
+
+def _priority(context):
+    """Scheduling lane from the x-priority metadata; interactive unless it says bulk."""
+    for key, value in context.invocation_metadata() or ():
+        if key == "x-priority" and value == Priority.BULK.value:
+            return Priority.BULK
+    return Priority.INTERACTIVE
+
+
+def _deadline(context, timeout_ms=0):
+    """Engine deadline from the call deadline and an optional per-item timeout."""
+    budgets_ms = []
+    if timeout_ms:
+        budgets_ms.append(timeout_ms)
+    remaining = context.time_remaining()
+    if remaining is not None:
+        budgets_ms.append(remaining * 1000)
+    return deadline_after(min(budgets_ms)) if budgets_ms else None
+
+
+def _response(text, result, model_used, processing_time_ms, item_id=""):
+    if result["is_inappropriate"] is None:
+        # Dropped before the forward pass because its deadline passed
+        return profanity_pb2.PredictResponse(
+            id=item_id,
+            text=text,
+            processing_time_ms=processing_time_ms,
+            model_used=model_used,
+            error="Deadline exceeded before the text was scored",
+            deadline_missed=True
+        )
+    return profanity_pb2.PredictResponse(
+        id=item_id,
+        text=text,
+        is_inappropriate=result["is_inappropriate"],
+        confidence=result["confidence"],
+        processing_time_ms=processing_time_ms,
+        model_used=model_used,
+        deadline_missed=result["deadline_missed"],
+        model_version=result.get("model_version") or ""
+    )
+
+
+class ProfanityDetectorServicer(profanity_pb2_grpc.ProfanityDetectorServicer):
+    """
+    gRPC front-end over the same scoring path as the HTTP endpoints.
+
+    `score_texts(texts, model, client_id, deadline, priority)` is the app's
+    coroutine that validates the request, makes sure the model is loaded
+    and submits the texts to that model's batching engine. It returns
+    `(model_type, results)` and raises HTTPException on failure. Callers
+    send "x-priority: bulk" metadata for batch jobs.
+    """
+
+    def __init__(self, score_texts):
+        self.score_texts = score_texts
+
+    async def Predict(self, request, context):
+        started = time.perf_counter()
+        try:
+            model_type, results = await self.score_texts(
+                [request.text], request.model or None, _client_id(context),
+                _deadline(context, request.timeout_ms), _priority(context)
+            )
+        except HTTPException as e:
+            await _abort(context, e)
+
+        if results[0]["is_inappropriate"] is None:
+            await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, "Deadline exceeded before the text was scored")
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        return _response(request.text, results[0], model_type.value, elapsed_ms, request.id)
+
+    async def PredictBatch(self, request, context):
+        started = time.perf_counter()
+        texts = list(request.texts)
+        try:
+            model_type, results = await self.score_texts(
+                texts, request.model or None, _client_id(context),
+                _deadline(context, request.timeout_ms), _priority(context)
+            )
+        except HTTPException as e:
+            await _abort(context, e)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        return profanity_pb2.PredictBatchResponse(
+            results=[_response(text, result, model_type.value, elapsed_ms)
+                     for text, result in zip(texts, results)],
+            processing_time_ms=elapsed_ms,
+            model_used=model_type.value,
+            deadline_missed=any(result["deadline_missed"] for result in results)
+        )
+
+    async def PredictStream(self, request_iterator, context):
+        responses = asyncio.Queue()
+        pending = set()
+
+        client_id = _client_id(context)
+
+        async def score(request):
+            started = time.perf_counter()
+            try:
+                model_type, results = await self.score_texts(
+                    [request.text], request.model or None, client_id,
+                    _deadline(context, request.timeout_ms), _priority(context)
+                )
+            except HTTPException as e:
+                await responses.put(profanity_pb2.PredictResponse(
+                    id=request.id, text=request.text, error=str(e.detail)
+                ))
+                return
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            await responses.put(_response(request.text, results[0], model_type.value, elapsed_ms, request.id))
+
+        async def read_requests():
+            # Each item goes to the batching engine as soon as it arrives, so
+            # items sent close together share a forward pass
+            try:
+                async for request in request_iterator:
+                    task = asyncio.ensure_future(score(request))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                if pending:
+                    await asyncio.gather(*pending)
+            finally:
+                await responses.put(None)
+
+        reader = asyncio.ensure_future(read_requests())
+        try:
+            while True:
+                response = await responses.get()
+                if response is None:
+                    break
+                yield response
+            # Surface errors from reading the request stream
+            await reader
+        finally:
+            reader.cancel()
+            for task in list(pending):
+                task.cancel()
+
+
+async def serve_grpc(score_texts, port=GRPC_PORT):
+    """Start the gRPC server on the running event loop and return it."""
+    server = grpc.aio.server()
+    profanity_pb2_grpc.add_ProfanityDetectorServicer_to_server(
+        ProfanityDetectorServicer(score_texts), server
+    )
+    server.add_insecure_port(f"[::]:{port}")
+    await server.start()
+    logger.info(f"gRPC server listening on port {port}")
+    return server
@@ -0,0 +1,67 @@
+import os
+import sys
+import resource
+import threading
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_mb():
+    """Resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except OSError:
+        # No /proc (macOS): fall back to the peak, the best portable figure
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def tensors_mb(model):
+    """Memory held by a model's parameters and buffers in MB."""
+    total = sum(p.numel() * p.element_size() for p in model.parameters())
+    total += sum(b.numel() * b.element_size() for b in model.buffers())
+    return total / (1024 * 1024)
+
+
+class PeakRSSMonitor:
+    """
+    Sample RSS on a background thread while a block runs, to catch the
+    peak of a model load.
+
+        with PeakRSSMonitor() as memory:
+            load()
+        memory.snapshot()
+    """
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.baseline_mb = None
+        self.peak_mb = None
+        self.end_mb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, rss_mb())
+
+    def __enter__(self):
+        self.baseline_mb = self.peak_mb = rss_mb()
+        self._thread = threading.Thread(target=self._sample, name="rss-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end_mb = rss_mb()
+        self.peak_mb = max(self.peak_mb, self.end_mb)
+        return False
+
+    def snapshot(self):
+        return {
+            "rss_before_mb": self.baseline_mb,
+            "rss_added_mb": self.end_mb - self.baseline_mb,
+            "peak_load_mb": self.peak_mb - self.baseline_mb
+        }
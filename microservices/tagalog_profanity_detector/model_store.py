@@ -0,0 +1,169 @@
+import os
+import time
+import shutil
+import logging
+import argparse
+
+from artifacts import write_manifest, verify_bundle
+
+logger = logging.getLogger("tagalog-profanity-detector.model-store")
+
+# Versioned model store: <MODEL_STORE_DIR>/<model>/<version>/ holds one
+# bundle (weights, tokenizer, manifest.json with hashes) per version and
+# <MODEL_STORE_DIR>/<model>/CURRENT names the version to serve
+MODEL_STORE_DIR = os.environ.get('MODEL_STORE_DIR', './model_store')
+MODEL_STORE_POLL_SECONDS = float(os.environ.get('MODEL_STORE_POLL_SECONDS', '10'))
+MODEL_STORE_WATCH = os.environ.get('MODEL_STORE_WATCH', 'true').lower() in ('1', 'true', 'yes')
+POINTER_NAME = "CURRENT"
+
+
+class ModelStore:
+    """
+    Local directory of published model versions.
+
+    Versions are immutable once published: `publish` copies a model into a
+    staging directory, writes its manifest and renames it into place, and
+    only then moves the CURRENT pointer (itself replaced atomically), so a
+    reader never sees a half-written version.
+    """
+
+    def __init__(self, root=MODEL_STORE_DIR):
+        self.root = root
+
+    def model_dir(self, model_name):
+        return os.path.join(self.root, model_name)
+
+    def version_path(self, model_name, version):
+        return os.path.join(self.model_dir(model_name), version)
+
+    def versions(self, model_name):
+        """Published versions of a model, oldest first."""
+        model_dir = self.model_dir(model_name)
+        if not os.path.isdir(model_dir):
+            return []
+        found = [
+            name for name in os.listdir(model_dir)
+            if not name.endswith(".tmp") and verify_bundle(os.path.join(model_dir, name)) is not None
+        ]
+        return sorted(found, key=lambda name: os.path.getmtime(os.path.join(model_dir, name)))
+
+    def current_version(self, model_name):
+        """Version named by the CURRENT pointer, or None."""
+        try:
+            with open(os.path.join(self.model_dir(model_name), POINTER_NAME), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def current(self, model_name):
+        """(path, manifest) of the current version if it is complete, else (None, None)."""
+        version = self.current_version(model_name)
+        if version is None:
+            return None, None
+        path = self.version_path(model_name, version)
+        manifest = verify_bundle(path)
+        if manifest is None:
+            logger.warning(f"Current {model_name} version {version} in the model store is missing or incomplete")
+            return None, None
+        return path, manifest
+
+    def validate(self, model_name, version):
+        """Full check of a version, including file hashes. Returns its manifest or raises ValueError."""
+        manifest = verify_bundle(self.version_path(model_name, version), check_hashes=True)
+        if manifest is None:
+            raise ValueError(f"{model_name} version {version} failed validation")
+        return manifest
+
+    def set_current(self, model_name, version):
+        self.validate(model_name, version)
+        pointer = os.path.join(self.model_dir(model_name), POINTER_NAME)
+        with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+            f.write(version + "\n")
+        os.replace(f"{pointer}.tmp", pointer)
+        logger.info(f"{model_name} CURRENT -> {version}")
+
+    def publish(self, model_name, source_dir, version=None, make_current=True):
+        """Copy a saved model directory into the store as a new version."""
+        version = version or time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        target = self.version_path(model_name, version)
+        if os.path.exists(target):
+            raise ValueError(f"{model_name} version {version} already exists")
+
+        staging = f"{target}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for name in os.listdir(source_dir):
+            path = os.path.join(source_dir, name)
+            # The source may itself be a bundle; its manifest is rewritten below
+            if os.path.isfile(path) and name != "manifest.json":
+                shutil.copy2(path, os.path.join(staging, name))
+
+        write_manifest(staging, {
+            "model_name": model_name,
+            "version": version,
+            "source": os.path.abspath(source_dir),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        })
+        os.replace(staging, target)
+        logger.info(f"Published {model_name} version {version} from {source_dir}")
+
+        if make_current:
+            self.set_current(model_name, version)
+        return version
+
+    def prune(self, model_name, keep=3):
+        """Delete old versions, keeping the newest `keep` and the current one."""
+        current = self.current_version(model_name)
+        versions = self.versions(model_name)
+        removed = []
+        for version in versions[:-keep] if keep else versions:
+            if version != current:
+                shutil.rmtree(self.version_path(model_name, version))
+                removed.append(version)
+        return removed
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Manage the versioned model store")
+    parser.add_argument("--store", default=MODEL_STORE_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    publish = subparsers.add_parser("publish", help="Publish a saved model directory as a new version")
+    publish.add_argument("--model", choices=["roberta", "bert", "student"], required=True)
+    publish.add_argument("--source", required=True)
+    publish.add_argument("--version", default=None)
+    publish.add_argument("--no-activate", action="store_true", help="Don't move CURRENT to the new version")
+
+    listing = subparsers.add_parser("list", help="List versions of a model")
+    listing.add_argument("--model", choices=["roberta", "bert", "student"], required=True)
+
+    activate = subparsers.add_parser("activate", help="Point CURRENT at an existing version (e.g. roll back)")
+    activate.add_argument("--model", choices=["roberta", "bert", "student"], required=True)
+    activate.add_argument("--version", required=True)
+
+    prune = subparsers.add_parser("prune", help="Delete old versions")
+    prune.add_argument("--model", choices=["roberta", "bert", "student"], required=True)
+    prune.add_argument("--keep", type=int, default=3)
+
+    args = parser.parse_args()
+    store = ModelStore(args.store)
+
+    if args.command == "publish":
+        store.publish(args.model, args.source, args.version, make_current=not args.no_activate)
+    elif args.command == "list":
+        current = store.current_version(args.model)
+        for version in store.versions(args.model):
+            print(f"{'*' if version == current else ' '} {version}")
+    elif args.command == "activate":
+        store.set_current(args.model, args.version)
+    elif args.command == "prune":
+        for version in store.prune(args.model, args.keep):
+            print(f"removed {version}")
+
+
+if __name__ == "__main__":
+    main()
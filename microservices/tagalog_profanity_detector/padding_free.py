@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import random
+import logging
+import argparse
+
+import torch
+
+from graph_backend import CHECK_TEXTS
+
+logger = logging.getLogger("tagalog-profanity-detector.padding-free")
+
+# Split mixed-length batches into passes over similar lengths; PADDING_FREE_<MODEL> overrides it per model
+PADDING_FREE = os.environ.get('PADDING_FREE', 'false').lower()
+# Fixed cost of one extra forward pass, in tokens. Higher values merge more
+# lengths into one pass (more padding, fewer passes)
+PADDING_FREE_PASS_COST = int(os.environ.get('PADDING_FREE_PASS_COST', '96'))
+# Largest logit difference from the padded batch allowed at startup
+PADDING_FREE_ATOL = float(os.environ.get('PADDING_FREE_ATOL', '1e-4'))
+MAX_LENGTH = 512
+
+
+def padding_free_enabled(model_name):
+    return os.environ.get(f'PADDING_FREE_{model_name.upper()}', PADDING_FREE).lower() in ('1', 'true', 'yes')
+
+
+def plan_passes(lengths, pass_cost=PADDING_FREE_PASS_COST):
+    """
+    Split sequence indices into forward passes that minimise the padded
+    tokens computed plus `pass_cost` per pass. Sequences are taken in
+    length order and each pass is a contiguous run of them, padded to its
+    longest, so the best split is found exactly by dynamic programming.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    sorted_lengths = [lengths[i] for i in order]
+    n = len(order)
+    best = [0.0] + [float("inf")] * n
+    cut = [0] * (n + 1)
+    for end in range(1, n + 1):
+        for start in range(end):
+            cost = best[start] + pass_cost + (end - start) * sorted_lengths[end - 1]
+            if cost < best[end]:
+                best[end], cut[end] = cost, start
+    passes = []
+    end = n
+    while end > 0:
+        passes.append(order[cut[end]:end])
+        end = cut[end]
+    return passes[::-1]
+
+
+class PaddingFreeRunner:
+    """
+    Classifier forward pass that avoids computing padding.
+
+    One padded batch costs batch_size x longest_text tokens; for short,
+    mixed-length social media text most of those are padding. The batch is
+    tokenized without padding and split (see `plan_passes`) into passes of
+    similar length, each padded only to its own longest text. Each text is
+    computed exactly as in the padded batch minus the masked positions,
+    so logits agree to rounding.
+    """
+
+    def __init__(self, model, tokenizer, device, pass_cost=PADDING_FREE_PASS_COST):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.pass_cost = pass_cost
+        self.stats = {"batches": 0, "passes": 0, "tokens_run": 0, "tokens_padded": 0}
+
+    def __call__(self, texts):
+        encoded = self.tokenizer(texts, truncation=True, max_length=MAX_LENGTH)
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        passes = plan_passes(lengths, self.pass_cost)
+
+        logits = None
+        for indices in passes:
+            features = [{key: encoded[key][i] for key in encoded.keys()} for i in indices]
+            inputs = self.tokenizer.pad(features, padding=True, return_tensors="pt").to(self.device)
+            with torch.no_grad():
+                pass_logits = self.model(**inputs).logits
+            if logits is None:
+                logits = pass_logits.new_empty((len(texts), pass_logits.shape[-1]))
+            logits[torch.tensor(indices, device=pass_logits.device)] = pass_logits
+            self.stats["tokens_run"] += len(indices) * max(lengths[i] for i in indices)
+
+        self.stats["batches"] += 1
+        self.stats["passes"] += len(passes)
+        self.stats["tokens_padded"] += len(texts) * max(lengths)
+        return logits
+
+    def check(self, texts=None, atol=PADDING_FREE_ATOL):
+        """Compare against one padded batch; raises RuntimeError beyond `atol`."""
+        texts = texts or CHECK_TEXTS
+        inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True,
+                                max_length=MAX_LENGTH).to(self.device)
+        with torch.no_grad():
+            padded_logits = self.model(**inputs).logits
+        max_diff = (padded_logits.float() - self(texts).float()).abs().max().item()
+        self.stats = {key: 0 for key in self.stats}
+        if max_diff > atol:
+            raise RuntimeError(f"padding-free logits differ from the padded batch by {max_diff:.2e} "
+                               f"(tolerance {atol:.0e})")
+        logger.info(f"Padding-free logits match the padded batch within {max_diff:.2e}")
+        return max_diff
+
+    def snapshot(self):
+        padded = self.stats["tokens_padded"]
+        return {
+            **self.stats,
+            "avg_passes_per_batch": self.stats["passes"] / self.stats["batches"] if self.stats["batches"] else 0.0,
+            "tokens_saved": 1 - self.stats["tokens_run"] / padded if padded else 0.0
+        }
+
+
+def benchmark(runner, texts, batch_size, repeats=3):
+    """
+    Time padded batches against the padding-free path over the same
+    batches, drawn in arrival order so lengths are mixed as in production.
+    """
+    model, tokenizer, device = runner.model, runner.tokenizer, runner.device
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    def padded(batch):
+        inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True,
+                           max_length=MAX_LENGTH).to(device)
+        with torch.no_grad():
+            return model(**inputs).logits
+
+    max_diff = max((padded(batch).float() - runner(batch).float()).abs().max().item() for batch in batches)
+    runner.stats = {key: 0 for key in runner.stats}
+
+    timings = {}
+    for name, fn in (("padded", padded), ("padding_free", runner)):
+        best = float("inf")
+        for _ in range(repeats):
+            started = time.perf_counter()
+            for batch in batches:
+                fn(batch)
+            best = min(best, time.perf_counter() - started)
+        timings[name] = best
+
+    return {
+        "texts": len(texts),
+        "batch_size": batch_size,
+        "padded_seconds": timings["padded"],
+        "padding_free_seconds": timings["padding_free"],
+        "speedup": timings["padded"] / timings["padding_free"],
+        "max_logit_diff": max_diff,
+        **{key: value for key, value in runner.snapshot().items() if key != "batches"}
+    }
+
+
+def main():
+    from compile_artifacts import load_model
+    from prune_vocab import read_samples
+
+    parser = argparse.ArgumentParser(description="Check and benchmark padding-free batching for a classifier")
+    parser.add_argument("--model", choices=["roberta", "bert", "student"], required=True)
+    parser.add_argument("--samples", nargs="*", default=[],
+                        help="Production text samples (JSONL/text) giving the real length distribution")
+    parser.add_argument("--max-texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--pass-cost", type=int, default=PADDING_FREE_PASS_COST)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts = [text for path in args.samples for text in read_samples(path)]
+    if not texts:
+        from datasets import load_dataset
+        texts = [item["text"] for item in load_dataset("mginoben/tagalog-profanity-dataset")["validation"]]
+    random.Random(args.seed).shuffle(texts)
+    texts = texts[:args.max_texts]
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model, tokenizer, _ = load_model(args.model)
+    model.to(device)
+    runner = PaddingFreeRunner(model, tokenizer, device, args.pass_cost)
+    print(json.dumps(benchmark(runner, texts, args.batch_size), indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    main()
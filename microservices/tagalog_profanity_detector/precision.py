@@ -0,0 +1,104 @@
+import os
+import copy
+import logging
+
+import torch
+
+from graph_backend import CHECK_TEXTS
+
+logger = logging.getLogger("tagalog-profanity-detector.precision")
+
+# Inference dtype: 'float32' (default), 'bfloat16', or 'auto' (bfloat16 where
+# the hardware has native support). INFERENCE_DTYPE_<MODEL> overrides it per model
+INFERENCE_DTYPE = os.environ.get('INFERENCE_DTYPE', 'float32').lower()
+# Stream weights from disk instead of building a random model first
+LOW_MEMORY_LOADING = os.environ.get('LOW_MEMORY_LOADING', 'true').lower() in ('1', 'true', 'yes')
+# Logit tolerance for bfloat16 in startup checks that compare two forward
+# passes (graph vs eager, padding-free vs padded): it rounds per shape
+LOW_PRECISION_ATOL = float(os.environ.get('LOW_PRECISION_ATOL', '1e-2'))
+# Largest accuracy drop allowed for bfloat16 in the evaluation suite
+PARITY_MAX_ACCURACY_DROP = float(os.environ.get('PARITY_MAX_ACCURACY_DROP', '0.01'))
+# Run the bfloat16 parity check in the evaluation scripts (on by default when
+# any model may be served in bfloat16)
+PARITY_CHECK_ENABLED = os.environ.get(
+    'EVAL_PRECISION_PARITY',
+    'true' if INFERENCE_DTYPE != 'float32' or any(
+        key.startswith('INFERENCE_DTYPE_') and value.lower() != 'float32' for key, value in os.environ.items()
+    ) else 'false'
+).lower() in ('1', 'true', 'yes')
+
+
+def cpu_supports_bf16():
+    """Whether the CPU has native bfloat16 instructions (AVX512-BF16 or AMX)."""
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    flags = set(line.split(":", 1)[1].split())
+                    return bool(flags & {"avx512_bf16", "amx_bf16"})
+    except OSError:
+        pass
+    return False
+
+
+def bf16_supported(device):
+    if torch.device(device).type == "cuda":
+        return torch.cuda.is_bf16_supported()
+    return cpu_supports_bf16()
+
+
+def dtype_for(model_name, device):
+    """(dtype, reason) to load a model with, falling back to float32 where bfloat16 would be slow."""
+    requested = os.environ.get(f'INFERENCE_DTYPE_{model_name.upper()}', INFERENCE_DTYPE).lower()
+    if requested not in ("float32", "bfloat16", "auto"):
+        logger.warning(f"Unknown inference dtype '{requested}' for {model_name}, using float32")
+        return torch.float32, "unknown dtype requested"
+    if requested == "float32":
+        return torch.float32, "configured"
+    if bf16_supported(device):
+        return torch.bfloat16, "configured" if requested == "bfloat16" else "auto: hardware support"
+    # Without native support bfloat16 is emulated and slower than float32
+    return torch.float32, "bfloat16 not supported on this hardware"
+
+
+def logit_atol(dtype, atol):
+    """`atol` for float32 models, loosened to LOW_PRECISION_ATOL for reduced precision."""
+    return atol if dtype == torch.float32 else max(atol, LOW_PRECISION_ATOL)
+
+
+def low_precision_ok(model, tokenizer, device, texts=None):
+    """Run sample texts through a reduced-precision model; False if it fails or gives non-finite logits."""
+    texts = texts or CHECK_TEXTS
+    try:
+        inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True).to(device)
+        with torch.no_grad():
+            logits = model(**inputs).logits
+        return bool(torch.isfinite(logits.float()).all())
+    except Exception as e:
+        logger.warning(f"Reduced-precision check failed: {str(e)}")
+        return False
+
+
+def precision_parity(model, tokenizer, dataset, device, evaluate_fn):
+    """
+    Evaluate a float32 model and a bfloat16 copy of it on the same data.
+    Returns both sets of metrics, the accuracy drop and whether it is within
+    PARITY_MAX_ACCURACY_DROP.
+    """
+    reference = evaluate_fn(model, tokenizer, dataset, device)
+    reduced = copy.deepcopy(model).to(torch.bfloat16)
+    candidate = evaluate_fn(reduced, tokenizer, dataset, device)
+    del reduced
+
+    drop = reference["accuracy"] - candidate["accuracy"]
+    result = {
+        "float32": {"accuracy": reference["accuracy"], "f1_score": reference["f1_score"]},
+        "bfloat16": {"accuracy": candidate["accuracy"], "f1_score": candidate["f1_score"]},
+        "accuracy_drop": drop,
+        "max_accuracy_drop": PARITY_MAX_ACCURACY_DROP,
+        "hardware_bf16": bf16_supported(device),
+        "passed": drop <= PARITY_MAX_ACCURACY_DROP
+    }
+    logger.info(f"bfloat16 accuracy {candidate['accuracy']:.4f} vs float32 {reference['accuracy']:.4f} "
+                f"({'within' if result['passed'] else 'OUTSIDE'} tolerance {PARITY_MAX_ACCURACY_DROP})")
+    return result
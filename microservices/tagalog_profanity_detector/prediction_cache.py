@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("tagalog-profanity-detector.cache")
+
+# Shared prediction cache settings
+# Store: 'redis' (shared by all replicas), 'sqlite' (shared on one host),
+# 'memory' (this process only) or 'none'
+PREDICTION_CACHE = os.environ.get('PREDICTION_CACHE', 'memory').lower()
+# Redis URL for 'redis', database file for 'sqlite'
+PREDICTION_CACHE_URL = os.environ.get('PREDICTION_CACHE_URL', '')
+PREDICTION_CACHE_TTL = int(os.environ.get('PREDICTION_CACHE_TTL', '86400'))
+PREDICTION_CACHE_L1_SIZE = int(os.environ.get('PREDICTION_CACHE_L1_SIZE', '10000'))
+# After this many store errors in a row the shared store is bypassed for
+# PREDICTION_CACHE_COOLDOWN seconds, so an unreachable store can't add its
+# timeout to every request
+PREDICTION_CACHE_MAX_FAILURES = int(os.environ.get('PREDICTION_CACHE_MAX_FAILURES', '3'))
+PREDICTION_CACHE_COOLDOWN = float(os.environ.get('PREDICTION_CACHE_COOLDOWN', '30'))
+# Seconds between purges of expired rows from a SQLite store
+SQLITE_PURGE_INTERVAL = 300
+KEY_PREFIX = "murai:prediction:v1"
+
+
+class MemoryStore:
+    """
+    In-process store, for a single replica. PredictionCache uses only its
+    own L1 in front of it, since a second in-memory layer would add a
+    thread hop to every miss and hold the same verdicts twice.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.time()
+        with self._lock:
+            values = []
+            for key in keys:
+                item = self._items.get(key)
+                values.append(item[0] if item and item[1] > now else None)
+            return values
+
+    def set_many(self, items, ttl):
+        expires_at = time.time() + ttl
+        with self._lock:
+            for key, value in items.items():
+                self._items[key] = (value, expires_at)
+                self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+
+class SQLiteStore:
+    """Store in a SQLite file, shared by every process on the host."""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path or "./prediction_cache.sqlite3"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS predictions_expires_at ON predictions (expires_at)")
+        self._conn.commit()
+        self._purged_at = 0.0
+
+    def get_many(self, keys):
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, value FROM predictions WHERE key IN ({placeholders}) AND expires_at > ?",
+                (*keys, time.time())
+            ).fetchall()
+        found = dict(rows)
+        return [found.get(key) for key in keys]
+
+    def set_many(self, items, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO predictions (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, value, now + ttl) for key, value in items.items()]
+            )
+            # Expired rows are never read again; drop them now and then so
+            # the file doesn't grow without bound
+            if now - self._purged_at >= SQLITE_PURGE_INTERVAL:
+                self._conn.execute("DELETE FROM predictions WHERE expires_at <= ?", (now,))
+                self._purged_at = now
+            self._conn.commit()
+
+
+class RedisStore:
+    """Store in Redis (or anything speaking its protocol), shared by the fleet."""
+
+    name = "redis"
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url or "redis://localhost:6379/0",
+                                            socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def get_many(self, keys):
+        return [value.decode("utf-8") if value is not None else None for value in self._client.mget(keys)]
+
+    def set_many(self, items, ttl):
+        pipeline = self._client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipeline.set(key, value, ex=ttl)
+        pipeline.execute()
+
+
+STORES = {"memory": MemoryStore, "sqlite": SQLiteStore, "redis": RedisStore}
+
+
+def create_store(kind=PREDICTION_CACHE, url=PREDICTION_CACHE_URL):
+    """The configured store, or None when caching is off or the store is unavailable."""
+    if kind == "none":
+        return None
+    if kind not in STORES:
+        logger.warning(f"Unknown prediction cache '{kind}', using memory")
+        kind = "memory"
+    try:
+        return STORES[kind]() if kind == "memory" else STORES[kind](url)
+    except Exception as e:
+        logger.error(f"Prediction cache '{kind}' unavailable, caching in memory only: {str(e)}")
+        return MemoryStore()
+
+
+class PredictionCache:
+    """
+    Verdicts keyed by model, weights version and exact text, with a small
+    per-process LRU (L1) in front of a shared store.
+
+    Store calls run on a private thread pool so the event loop never
+    blocks on the network or disk. Writes are fire-and-forget; any store
+    error counts as a miss, so the cache can only ever make requests
+    faster, never fail them. After `max_failures` errors in a row the
+    store is skipped for `cooldown` seconds (only L1 is used), then tried
+    again. A MemoryStore is never called; L1 alone is the cache then.
+    """
+
+    def __init__(self, store, ttl=PREDICTION_CACHE_TTL, l1_size=PREDICTION_CACHE_L1_SIZE,
+                 max_failures=PREDICTION_CACHE_MAX_FAILURES, cooldown=PREDICTION_CACHE_COOLDOWN):
+        self.store = store
+        self.shared = not isinstance(store, MemoryStore)
+        self.ttl = ttl
+        self.l1_size = l1_size
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._l1 = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prediction-cache")
+        self._pending_writes = set()
+        self._failures = 0
+        self._bypass_until = 0.0
+        self.stats = {"lookups": 0, "l1_hits": 0, "shared_hits": 0, "misses": 0, "writes": 0, "errors": 0,
+                      "bypassed": 0}
+
+    @property
+    def store_bypassed(self):
+        return time.monotonic() < self._bypass_until
+
+    def _store_ok(self):
+        self._failures = 0
+
+    def _store_failed(self, e, action):
+        self.stats["errors"] += 1
+        self._failures += 1
+        logger.warning(f"Prediction cache {action} failed: {str(e)}")
+        if self._failures >= self.max_failures and not self.store_bypassed:
+            self._bypass_until = time.monotonic() + self.cooldown
+            logger.error(f"Prediction cache store failed {self._failures} times in a row; "
+                         f"bypassing it for {self.cooldown:.0f}s")
+
+    @staticmethod
+    def key_for(model_name, version, text):
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:{model_name}:{version}:{digest}"
+
+    def _remember(self, key, verdict):
+        self._l1[key] = verdict
+        self._l1.move_to_end(key)
+        if len(self._l1) > self.l1_size:
+            self._l1.popitem(last=False)
+
+    async def get_many(self, model_name, version, texts):
+        """Cached verdict (or None) for each text."""
+        keys = [self.key_for(model_name, version, text) for text in texts]
+        results = [None] * len(texts)
+        missing = []
+        self.stats["lookups"] += len(texts)
+        for i, key in enumerate(keys):
+            verdict = self._l1.get(key)
+            if verdict is not None:
+                self._l1.move_to_end(key)
+                results[i] = verdict
+                self.stats["l1_hits"] += 1
+            else:
+                missing.append(i)
+
+        if missing and not self.shared:
+            self.stats["misses"] += len(missing)
+        elif missing and self.store_bypassed:
+            self.stats["bypassed"] += len(missing)
+            values = [None] * len(missing)
+        elif missing:
+            try:
+                loop = asyncio.get_running_loop()
+                values = await loop.run_in_executor(
+                    self._executor, self.store.get_many, [keys[i] for i in missing]
+                )
+                self._store_ok()
+            except Exception as e:
+                self._store_failed(e, "read")
+                values = [None] * len(missing)
+            for i, value in zip(missing, values):
+                if value is None:
+                    self.stats["misses"] += 1
+                    continue
+                results[i] = json.loads(value)
+                self._remember(keys[i], results[i])
+                self.stats["shared_hits"] += 1
+        return results
+
+    def put_many(self, model_name, version, verdicts):
+        """Cache {text: verdict}; the shared store is written in the background."""
+        if not verdicts:
+            return
+        items = {}
+        for text, verdict in verdicts.items():
+            key = self.key_for(model_name, version, text)
+            self._remember(key, verdict)
+            items[key] = json.dumps(verdict)
+        if not self.shared or self.store_bypassed:
+            return
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self.store.set_many, items, self.ttl)
+        self._pending_writes.add(future)
+        future.add_done_callback(self._write_done)
+
+    def _write_done(self, future):
+        self._pending_writes.discard(future)
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self._store_failed(future.exception(), "write")
+        else:
+            self._store_ok()
+            self.stats["writes"] += 1
+
+    def snapshot(self):
+        hits = self.stats["l1_hits"] + self.stats["shared_hits"]
+        return {
+            **self.stats,
+            "store": self.store.name,
+            "store_bypassed": self.store_bypassed,
+            "l1_entries": len(self._l1),
+            "hit_rate": hits / self.stats["lookups"] if self.stats["lookups"] else 0.0
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,363 @@
+"""
+Python client for the Tagalog Profanity Detector API.
+
+    from profanity_client import ProfanityClient, AsyncProfanityClient
+
+    with ProfanityClient("http://localhost:8000") as client:
+        client.predict("Ang ganda ng araw ngayon")
+        client.predict_many(texts)
+
+    async with AsyncProfanityClient("http://localhost:8000") as client:
+        results = await asyncio.gather(*(client.predict(text) for text in texts))
+
+Both clients keep a pooled keep-alive connection. Single `predict` calls
+made close together (concurrent coroutines, or threads sharing one sync
+client) are gathered into one `/predict/batch` request. Calls are retried
+with exponential backoff on 503 (model loading), 429 (overloaded, honouring
+Retry-After) and connection errors. Pass `priority="bulk"` for batch jobs so
+they only use the service's idle capacity. `ProfanityClient.local()` and
+`AsyncProfanityClient.local()` run the service in-process for tests.
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+
+import httpx
+
+DEFAULT_URL = os.environ.get('PROFANITY_API_URL', 'http://localhost:8000')
+RETRY_STATUSES = (429, 503)
+
+
+class ProfanityAPIError(Exception):
+    """A request failed with a non-retryable status, or kept failing after all retries."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _backoff(attempt, response=None, base=0.25, cap=10.0):
+    """Seconds to wait before retry `attempt`: Retry-After if given, else jittered exponential."""
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), cap)
+            except ValueError:
+                pass
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _error(response):
+    try:
+        detail = response.json().get("detail", response.text)
+    except ValueError:
+        detail = response.text
+    return ProfanityAPIError(response.status_code, detail)
+
+
+def _is_client_error(error):
+    """True for a 4xx rejection, which a batch gets if any one of its texts is invalid."""
+    return isinstance(error, ProfanityAPIError) and 400 <= error.status_code < 500
+
+
+def _batch_body(texts, model, timeout_ms, priority=None):
+    body = {"texts": texts}
+    if model:
+        body["model"] = model
+    if priority:
+        body["priority"] = priority
+    if timeout_ms:
+        body["timeout_ms"] = timeout_ms
+    return body
+
+
+class AsyncProfanityClient:
+    """
+    asyncio client. Concurrent `predict` calls for the same model are
+    collected for up to `max_wait_ms` (or until `max_batch_size` texts)
+    and sent as one `/predict/batch` request. If the service rejects the
+    batch with a 4xx, its texts are resent one at a time so only the
+    caller with the bad text gets the error.
+    """
+
+    def __init__(self, base_url=DEFAULT_URL, model=None, api_key=None, timeout=30.0,
+                 max_connections=20, max_batch_size=32, max_wait_ms=5.0, max_retries=5,
+                 transport=None, priority=None):
+        self.model = model
+        self.priority = priority
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_retries = max_retries
+        headers = {"x-api-key": api_key} if api_key else {}
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=transport,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self._pending = {}
+        self._timers = {}
+        # Flushes started by a timer; referenced here so they aren't garbage collected mid-run
+        self._flush_tasks = set()
+        self._app = None
+
+    @classmethod
+    def local(cls, app=None, **kwargs):
+        """A client for the service running in this process (no network), for tests."""
+        if app is None:
+            from app import app
+        client = cls(base_url="http://local", transport=httpx.ASGITransport(app=app), **kwargs)
+        client._app = app
+        return client
+
+    async def __aenter__(self):
+        if self._app is not None:
+            # Run the app's startup (model loading, batching engines)
+            await self._app.router.startup()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        for model in list(self._pending):
+            await self._flush(model)
+        await self._http.aclose()
+        if self._app is not None:
+            await self._app.router.shutdown()
+            self._app = None
+
+    async def _request(self, method, path, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self._http.request(method, path, **kwargs)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(_backoff(attempt))
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                await asyncio.sleep(_backoff(attempt, response))
+                continue
+            if response.status_code >= 400:
+                raise _error(response)
+            return response.json()
+
+    async def predict(self, text, model=None):
+        """Verdict for one text; batched with other calls made at about the same time."""
+        model = model or self.model
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.setdefault(model, [])
+        pending.append((text, future))
+
+        if len(pending) >= self.max_batch_size:
+            await self._flush(model)
+        elif model not in self._timers:
+            self._timers[model] = asyncio.get_running_loop().call_later(
+                self.max_wait_ms / 1000, self._start_flush, model
+            )
+        return await future
+
+    def _start_flush(self, model):
+        task = asyncio.ensure_future(self._flush(model))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self, model):
+        timer = self._timers.pop(model, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._pending.pop(model, [])
+        if not items:
+            return
+        try:
+            results = await self.predict_batch([text for text, _ in items], model)
+        except Exception as e:
+            if len(items) > 1 and _is_client_error(e):
+                await asyncio.gather(*(self._send_one(text, future, model) for text, future in items))
+                return
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _send_one(self, text, future, model):
+        try:
+            result = (await self.predict_batch([text], model))[0]
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    async def predict_batch(self, texts, model=None, timeout_ms=None):
+        """Verdicts for a list of texts, sent in chunks of `max_batch_size` concurrently."""
+        model = model or self.model
+        chunks = [texts[i:i + self.max_batch_size] for i in range(0, len(texts), self.max_batch_size)]
+        responses = await asyncio.gather(*(
+            self._request("POST", "/predict/batch", json=_batch_body(chunk, model, timeout_ms, self.priority))
+            for chunk in chunks
+        ))
+        return [result for response in responses for result in response["results"]]
+
+    async def health(self):
+        return await self._request("GET", "/health")
+
+    async def switch_model(self, model):
+        return await self._request("POST", f"/switch-model/{model}")
+
+
+class ProfanityClient:
+    """
+    Blocking client. `predict` calls from different threads sharing the
+    client are batched by a background thread; `predict_many` sends a list
+    of texts in `max_batch_size` chunks. A batch rejected with a 4xx is
+    resent one text at a time, as in `AsyncProfanityClient`.
+    """
+
+    def __init__(self, base_url=DEFAULT_URL, model=None, api_key=None, timeout=30.0,
+                 max_connections=20, max_batch_size=32, max_wait_ms=5.0, max_retries=5,
+                 http_client=None, priority=None):
+        self.model = model
+        self.priority = priority
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_retries = max_retries
+        headers = {"x-api-key": api_key} if api_key else {}
+        self._http = http_client or httpx.Client(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self._local = False
+        self._pending = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._batcher = threading.Thread(target=self._run_batcher, name="profanity-client-batcher", daemon=True)
+        self._batcher.start()
+
+    @classmethod
+    def local(cls, app=None, **kwargs):
+        """A client for the service running in this process (no network), for tests."""
+        from fastapi.testclient import TestClient
+        if app is None:
+            from app import app
+        test_client = TestClient(app)
+        # Entering the TestClient runs the app's startup events
+        test_client.__enter__()
+        client = cls(http_client=test_client, **kwargs)
+        client._local = True
+        return client
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._batcher.join()
+        if self._local:
+            # Runs the app's shutdown events as well
+            self._http.__exit__(None, None, None)
+        else:
+            self._http.close()
+
+    def _request(self, method, path, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._http.request(method, path, **kwargs)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(_backoff(attempt))
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                time.sleep(_backoff(attempt, response))
+                continue
+            if response.status_code >= 400:
+                raise _error(response)
+            return response.json()
+
+    def predict(self, text, model=None):
+        """Verdict for one text; batched with calls from other threads made at about the same time."""
+        item = {"text": text, "model": model or self.model, "done": threading.Event()}
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Client is closed")
+            self._pending.append(item)
+            self._cond.notify_all()
+        item["done"].wait()
+        if "error" in item:
+            raise item["error"]
+        return item["result"]
+
+    def _run_batcher(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                # Give other threads max_wait_ms to add to the batch
+                deadline = time.monotonic() + self.max_wait_ms / 1000
+                while len(self._pending) < self.max_batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+
+            by_model = {}
+            for item in batch:
+                by_model.setdefault(item["model"], []).append(item)
+            for model, items in by_model.items():
+                try:
+                    results = self.predict_many([item["text"] for item in items], model)
+                    for item, result in zip(items, results):
+                        item["result"] = result
+                except Exception as e:
+                    if len(items) > 1 and _is_client_error(e):
+                        for item in items:
+                            self._send_one(item, model)
+                    else:
+                        for item in items:
+                            item["error"] = e
+                for item in items:
+                    item["done"].set()
+
+    def _send_one(self, item, model):
+        try:
+            item["result"] = self.predict_many([item["text"]], model)[0]
+        except Exception as e:
+            item["error"] = e
+
+    def predict_many(self, texts, model=None, timeout_ms=None):
+        """Verdicts for a list of texts, sent as `/predict/batch` requests of `max_batch_size`."""
+        model = model or self.model
+        results = []
+        for i in range(0, len(texts), self.max_batch_size):
+            response = self._request("POST", "/predict/batch",
+                                     json=_batch_body(texts[i:i + self.max_batch_size], model, timeout_ms,
+                                                     self.priority))
+            results.extend(response["results"])
+        return results
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def switch_model(self, model):
+        return self._request("POST", f"/switch-model/{model}")
@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import logging
+import argparse
+from collections import Counter
+
+import torch
+import transformers
+from datasets import load_dataset
+from transformers import BertTokenizer, BertForSequenceClassification
+
+from artifacts import write_manifest
+from compile_artifacts import load_model
+from evaluate_model import load_dataset_for_evaluation
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("vocab-pruner")
+
+DATASET_NAME = "mginoben/tagalog-profanity-dataset"
+PRUNED_MODEL_PATH = os.environ.get('PRUNED_BERT_MODEL_PATH', './models/bert-tagalog-profanity-pruned')
+REPORT_NAME = "pruning_report.json"
+# Largest allowed |pruned - original| logit difference on covered texts
+PARITY_ATOL = 1e-4
+
+
+def read_samples(path):
+    """Texts from a production sample file: JSONL with a "text" field, or one text per line."""
+    texts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                texts.append(json.loads(line)["text"])
+            else:
+                texts.append(line)
+    return texts
+
+
+def count_tokens(tokenizer, texts, batch_size=1000):
+    """How often each token id occurs when tokenizing `texts`."""
+    counts = Counter()
+    for i in range(0, len(texts), batch_size):
+        for ids in tokenizer(texts[i:i + batch_size], add_special_tokens=False)["input_ids"]:
+            counts.update(ids)
+    return counts
+
+
+def select_ids(tokenizer, counts, min_count=1, keep_chars=True):
+    """
+    Token ids to keep, in their original order: special tokens, tokens seen
+    at least `min_count` times and, with `keep_chars`, single Latin
+    characters and their "##" continuations, so unseen words still split
+    into characters instead of collapsing to [UNK].
+    """
+    keep = set(tokenizer.all_special_ids)
+    keep.update(token_id for token_id, count in counts.items() if count >= min_count)
+    if keep_chars:
+        for token, token_id in tokenizer.vocab.items():
+            char = token[2:] if token.startswith("##") else token
+            if len(char) == 1 and ord(char) < 0x250:
+                keep.add(token_id)
+    return sorted(keep)
+
+
+def prune_model(model, tokenizer, keep_ids, output_dir):
+    """
+    Write a copy of the model and tokenizer that only knows `keep_ids`.
+    Rows of the word embedding matrix are copied as-is, so any text made of
+    kept tokens gets exactly the original logits.
+    """
+    old_embeddings = model.get_input_embeddings()
+    index = torch.tensor(keep_ids, dtype=torch.long)
+    new_embeddings = torch.nn.Embedding(len(keep_ids), old_embeddings.embedding_dim,
+                                        padding_idx=keep_ids.index(tokenizer.pad_token_id))
+    new_embeddings.weight.data = old_embeddings.weight.data[index].clone()
+    model.set_input_embeddings(new_embeddings)
+    model.config.vocab_size = len(keep_ids)
+    model.config.pad_token_id = keep_ids.index(tokenizer.pad_token_id)
+
+    os.makedirs(output_dir, exist_ok=True)
+    model.save_pretrained(output_dir, safe_serialization=True)
+    tokenizer.save_pretrained(output_dir)
+
+    # Replace the saved vocabulary with the kept tokens, in new-id order
+    id_to_token = {token_id: token for token, token_id in tokenizer.vocab.items()}
+    with open(os.path.join(output_dir, "vocab.txt"), "w", encoding="utf-8") as f:
+        for token_id in keep_ids:
+            f.write(id_to_token[token_id] + "\n")
+
+    return BertTokenizer.from_pretrained(output_dir, local_files_only=True)
+
+
+def check_parity(original, original_tokenizer, pruned, pruned_tokenizer, texts, keep_ids, batch_size=32):
+    """
+    Compare the pruned model against the original on held-out texts.
+
+    Texts whose tokens were all kept must tokenize to the remapped original
+    ids and produce the same logits; for the rest, report how often the
+    prediction still agrees.
+    """
+    remap = {old_id: new_id for new_id, old_id in enumerate(keep_ids)}
+    unk_id = pruned_tokenizer.unk_token_id
+    covered, agree, max_diff = 0, 0, 0.0
+
+    for i in range(0, len(texts), batch_size):
+        batch = texts[i:i + batch_size]
+        old_inputs = original_tokenizer(batch, padding=True, truncation=True, max_length=512, return_tensors="pt")
+        new_inputs = pruned_tokenizer(batch, padding=True, truncation=True, max_length=512, return_tensors="pt")
+        with torch.no_grad():
+            old_logits = original(**old_inputs).logits
+            new_logits = pruned(**new_inputs).logits
+        agree += (old_logits.argmax(dim=-1) == new_logits.argmax(dim=-1)).sum().item()
+
+        for row, ids in enumerate(old_inputs["input_ids"].tolist()):
+            length = int(old_inputs["attention_mask"][row].sum())
+            expected = [remap.get(token_id, unk_id) for token_id in ids[:length]]
+            if any(token_id not in remap for token_id in ids[:length]):
+                continue
+            if new_inputs["input_ids"][row, :length].tolist() != expected:
+                raise RuntimeError(f"Pruned tokenizer disagrees with the original on: {batch[row]!r}")
+            covered += 1
+            max_diff = max(max_diff, (old_logits[row] - new_logits[row]).abs().max().item())
+
+    if max_diff > PARITY_ATOL:
+        raise RuntimeError(f"Pruned logits differ from the original by {max_diff:.2e} on covered texts")
+    return {
+        "texts": len(texts),
+        "covered_texts": covered,
+        "coverage": covered / len(texts) if texts else 0.0,
+        "prediction_agreement": agree / len(texts) if texts else 0.0,
+        "max_logit_diff_covered": max_diff
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune the BERT vocabulary to the tokens our traffic uses")
+    parser.add_argument("--samples", nargs="*", default=[],
+                        help="Production sample files (.jsonl with a text field, or one text per line)")
+    parser.add_argument("--min-count", type=int, default=1)
+    parser.add_argument("--no-keep-chars", action="store_true",
+                        help="Don't keep single-character tokens that were never seen")
+    parser.add_argument("--output", default=PRUNED_MODEL_PATH)
+    args = parser.parse_args()
+
+    model, tokenizer, source = load_model("bert")
+    texts = [item["text"] for item in load_dataset(DATASET_NAME)["train"].to_list()]
+    for path in args.samples:
+        texts.extend(read_samples(path))
+    logger.info(f"Counting tokens over {len(texts)} texts...")
+
+    counts = count_tokens(tokenizer, texts)
+    keep_ids = select_ids(tokenizer, counts, args.min_count, not args.no_keep_chars)
+    old_vocab = len(tokenizer.vocab)
+    old_params = sum(p.numel() for p in model.parameters())
+    logger.info(f"Keeping {len(keep_ids)} of {old_vocab} tokens")
+
+    original = BertForSequenceClassification.from_pretrained(source, num_labels=2)
+    original.eval()
+    pruned_tokenizer = prune_model(model, tokenizer, keep_ids, args.output)
+
+    start_time = time.time()
+    pruned = BertForSequenceClassification.from_pretrained(args.output, num_labels=2, local_files_only=True)
+    pruned.eval()
+    load_seconds = time.time() - start_time
+
+    held_out = [item["text"] for item in load_dataset_for_evaluation()]
+    parity = check_parity(original, tokenizer, pruned, pruned_tokenizer, held_out, keep_ids)
+
+    new_params = sum(p.numel() for p in pruned.parameters())
+    bytes_per_param = next(pruned.parameters()).element_size()
+    report = {
+        "source": source,
+        "vocab_size_before": old_vocab,
+        "vocab_size_after": len(keep_ids),
+        "parameters_before": old_params,
+        "parameters_after": new_params,
+        "embedding_mb_saved": (old_params - new_params) * bytes_per_param / (1024 * 1024),
+        "pruned_load_seconds": load_seconds,
+        "corpus_texts": len(texts),
+        "min_count": args.min_count,
+        "parity": parity
+    }
+    with open(os.path.join(args.output, REPORT_NAME), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    # The manifest makes the directory usable as an artifact bundle as well
+    write_manifest(args.output, {
+        "model_name": "bert",
+        "source": source,
+        "model_class": BertForSequenceClassification.__name__,
+        "tokenizer_class": BertTokenizer.__name__,
+        "num_parameters": new_params,
+        "dtype": str(next(pruned.parameters()).dtype),
+        "vocab_pruned": True,
+        "torch_version": torch.__version__,
+        "transformers_version": transformers.__version__,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    })
+
+    logger.info(f"Vocabulary {old_vocab} -> {len(keep_ids)} tokens, "
+                f"{report['embedding_mb_saved']:.1f} MB of embeddings removed")
+    logger.info(f"Held-out coverage {parity['coverage']:.1%}, "
+                f"prediction agreement {parity['prediction_agreement']:.1%}")
+    logger.info(f"Pruned model saved to {args.output}; set BERT_MODEL_PATH to serve it")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
-import requests
 import json
 import os
 import logging
@@ -6,6 +5,8 @@ from sklearn.metrics import accuracy_score, precision_recall_fscore_support, con
 import numpy as np
 import time
 
+from telemetry import get_shipper
+
 # Try to load environment variables from .env file
 try:
     from dotenv import load_dotenv
@@ -67,57 +68,17 @@ def save_metrics_to_db(metrics_data, training_info=None):
         "confusion_matrix": metrics_data["confusion_matrix"]
     }
 
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": API_KEY
-    }
-
-    try:
-        response = requests.post(
-            f"{API_URL}/api/model/metrics/microservice",
-            json=payload,
-            headers=headers
-        )
-
-        if response.status_code == 201:
-            logger.info(f"Metrics saved successfully: {response.json()}")
-            return True
-        else:
-            logger.error(f"Failed to save metrics: {response.status_code} - {response.text}")
-            return False
-    except Exception as e:
-        logger.error(f"Error saving metrics: {str(e)}")
-        return False
+    # Queue the metrics; the shipper sends them in the background and spools
+    # them locally if the server is unreachable
+    if get_shipper(API_URL, API_KEY).metrics(payload):
+        logger.info("Metrics queued for saving")
+    else:
+        logger.warning("Telemetry queue is full; metrics spooled locally and will be sent later")
+    return True
 
 def save_model_log(log_type, message):
     """Save a log message to the database."""
-    payload = {
-        "type": log_type,  # 'info', 'warning', or 'error'
-        "message": message,
-        "model_version": MODEL_VERSION
-    }
-
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": API_KEY
-    }
-
-    try:
-        response = requests.post(
-            f"{API_URL}/api/model/logs",
-            json=payload,
-            headers=headers
-        )
-
-        if response.status_code == 201:
-            logger.info(f"Log saved successfully: {response.json()}")
-            return True
-        else:
-            logger.error(f"Failed to save log: {response.status_code} - {response.text}")
-            return False
-    except Exception as e:
-        logger.error(f"Error saving log: {str(e)}")
-        return False
+    return get_shipper(API_URL, API_KEY).log(log_type, message, MODEL_VERSION)
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,125 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger("tagalog-profanity-detector.streaming")
+
+# Verdicts remembered per WebSocket session (one browser tab)
+WS_SESSION_CACHE_SIZE = int(os.environ.get('WS_SESSION_CACHE_SIZE', '5000'))
+# Texts a session may have waiting on the model at once; reading from the
+# socket pauses while the session is at the limit
+WS_MAX_IN_FLIGHT = int(os.environ.get('WS_MAX_IN_FLIGHT', '256'))
+
+
+class ScanSession:
+    """
+    Scoring state of one streaming connection.
+
+    `submit` returns as soon as a text is queued. Each distinct text is
+    scored once per session: repeats are answered from the session's
+    verdicts, or attached to the text already being scored. Verdicts are
+    sent as they complete, tagged with the client's id, in whatever order
+    they finish.
+
+    `score(text)` returns a verdict dict, or a dict with "error" that is
+    sent back but not remembered. `send(message)` writes to the socket.
+    """
+
+    def __init__(self, score, send, cache_size=WS_SESSION_CACHE_SIZE, max_in_flight=WS_MAX_IN_FLIGHT):
+        self._score = score
+        self._send = send
+        self._send_lock = asyncio.Lock()
+        self._verdicts = OrderedDict()
+        self._cache_size = cache_size
+        self._in_flight = {}
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._tasks = set()
+        self.received = 0
+        self.scored = 0
+        self.reused = 0
+
+    async def send(self, message):
+        async with self._send_lock:
+            try:
+                await self._send(message)
+            except Exception as e:
+                # The client went away; the receive loop will notice and close
+                logger.debug(f"Dropped streaming message: {str(e)}")
+
+    async def submit(self, item_id, text):
+        self.received += 1
+        verdict = self._verdicts.get(text)
+        if verdict is not None:
+            self._verdicts.move_to_end(text)
+            self.reused += 1
+            await self.send({"id": item_id, **verdict, "reused": True})
+            return
+        if text in self._in_flight:
+            self._in_flight[text].append(item_id)
+            self.reused += 1
+            return
+
+        self._in_flight[text] = [item_id]
+        await self._slots.acquire()
+        task = asyncio.create_task(self._run(text))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, text):
+        try:
+            try:
+                result = await self._score(text)
+            except Exception as e:
+                logger.error(f"Streaming prediction error: {str(e)}", exc_info=True)
+                result = {"error": str(e), "status": 500}
+            if "error" not in result and result.get("is_inappropriate") is not None:
+                self.scored += 1
+                self._remember(text, result)
+            ids = self._in_flight.pop(text)
+            for item_id in ids:
+                await self.send({"id": item_id, **result})
+        finally:
+            self._slots.release()
+
+    def _remember(self, text, verdict):
+        self._verdicts[text] = verdict
+        if len(self._verdicts) > self._cache_size:
+            self._verdicts.popitem(last=False)
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class StreamingStats:
+    """Open sessions and item counts across all streaming connections."""
+
+    def __init__(self):
+        self.active = set()
+        self.sessions = 0
+        self.received = 0
+        self.scored = 0
+        self.reused = 0
+
+    def opened(self, session):
+        self.active.add(session)
+        self.sessions += 1
+
+    def closed(self, session):
+        self.active.discard(session)
+        self.received += session.received
+        self.scored += session.scored
+        self.reused += session.reused
+
+    def snapshot(self):
+        received = self.received + sum(session.received for session in self.active)
+        reused = self.reused + sum(session.reused for session in self.active)
+        return {
+            "active_sessions": len(self.active),
+            "sessions": self.sessions,
+            "items": received,
+            "scored": self.scored + sum(session.scored for session in self.active),
+            "session_reuse_rate": reused / received if received else 0.0
+        }
@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger("telemetry-shipper")
+
+# Get environment variables
+API_URL = os.environ.get('API_URL', 'http://localhost:5001')
+API_KEY = os.environ.get('MICROSERVICE_API_KEY', 'your-api-key')
+
+# Shipper settings
+SPOOL_PATH = os.environ.get('TELEMETRY_SPOOL_PATH', './telemetry_spool.jsonl')
+BATCH_SIZE = int(os.environ.get('TELEMETRY_BATCH_SIZE', '20'))
+FLUSH_INTERVAL = float(os.environ.get('TELEMETRY_FLUSH_INTERVAL', '2.0'))
+MAX_QUEUE_SIZE = int(os.environ.get('TELEMETRY_MAX_QUEUE_SIZE', '10000'))
+REQUEST_TIMEOUT = float(os.environ.get('TELEMETRY_TIMEOUT', '5.0'))
+MAX_BACKOFF = float(os.environ.get('TELEMETRY_MAX_BACKOFF', '60.0'))
+
+# Server endpoints for each kind of record
+ENDPOINTS = {
+    "log": "/api/model/logs",
+    "metrics": "/api/model/metrics/microservice"
+}
+
+
+class TelemetryShipper:
+    """
+    Queue log and metric records and ship them to the MURAi server from a
+    background thread.
+
+    Records are sent in batches over a single keep-alive session. When the
+    server cannot be reached, or answers 429 or 5xx, records are appended
+    to a local JSONL spool and replayed once the server answers again.
+    Records the server rejects (other 4xx) are dropped.
+    """
+
+    def __init__(self, api_url=API_URL, api_key=API_KEY, spool_path=SPOOL_PATH,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_queue_size=MAX_QUEUE_SIZE, timeout=REQUEST_TIMEOUT):
+        self.api_url = api_url.rstrip("/")
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._spool_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._replay_path = f"{spool_path}.replaying"
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "x-api-key": api_key
+        })
+        retries = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=["POST"]
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retries)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.stats = {"sent": 0, "failed": 0, "spooled": 0, "replayed": 0}
+
+    def start(self):
+        """Start the background sender thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry-shipper", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind, payload):
+        """
+        Queue a record without blocking. Returns True if it was queued,
+        False if the queue was full and it went to the local spool instead.
+        """
+        if kind not in ENDPOINTS:
+            raise ValueError(f"Unknown telemetry record kind: {kind}")
+
+        record = {"kind": kind, "payload": payload, "created_at": time.time()}
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            # Never block the caller; keep the record on disk instead
+            self._spool([record])
+            return False
+
+    def log(self, log_type, message, model_version):
+        """Queue a model log message."""
+        return self.submit("log", {
+            "type": log_type,  # 'info', 'warning', or 'error'
+            "message": message,
+            "model_version": model_version
+        })
+
+    def metrics(self, payload):
+        """Queue a metrics payload."""
+        return self.submit("metrics", payload)
+
+    def flush(self, timeout=None):
+        """Wait until every queued record has been sent or spooled."""
+        deadline = None if timeout is None else time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def close(self, timeout=10.0):
+        """Flush pending records and stop the sender thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self.flush(timeout)
+            self._stop.set()
+            self._thread.join(timeout)
+        self._spool(self._drain(block=False))
+        self.session.close()
+
+    def replay_spool(self):
+        """
+        Send records from the local spool. Unsent records go back to the
+        spool; the file being replayed is only removed once every record
+        in it was sent or re-spooled, so a crash mid-replay loses nothing
+        (records sent just before it may be sent again).
+        """
+        replay_path = self._replay_path
+        with self._spool_lock:
+            # A replay file left by a crash is finished first
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spool_path):
+                    return 0
+                os.replace(self.spool_path, replay_path)
+
+        records = []
+        with open(replay_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning("Skipping corrupt telemetry spool line")
+
+        if records:
+            logger.info(f"Replaying {len(records)} spooled telemetry records")
+        sent = 0
+        for i in range(0, len(records), self.batch_size):
+            if time.time() < self._retry_at:
+                # Server went away mid-replay; put the remainder back
+                self._spool(records[i:])
+                break
+            sent += self._send_batch(records[i:i + self.batch_size])
+        os.remove(replay_path)
+        self.stats["replayed"] += sent
+        return sent
+
+    def _run(self):
+        # Replay anything left over from a previous run before new records
+        self._try_replay()
+
+        while not self._stop.is_set():
+            batch = self._drain(block=True)
+            try:
+                if not batch:
+                    self._try_replay()
+                elif time.time() < self._retry_at:
+                    # Server is known to be down; don't wait on it
+                    self._spool(batch)
+                else:
+                    self._send_batch(batch)
+                    self._try_replay()
+            except Exception:
+                # Keep the sender alive; the batch may be partly sent, so
+                # some records can be sent twice when the spool is replayed
+                logger.exception("Unexpected error sending telemetry, spooling the batch")
+                self._spool(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _drain(self, block):
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _try_replay(self):
+        if time.time() < self._retry_at or not (
+                os.path.exists(self.spool_path) or os.path.exists(self._replay_path)):
+            return
+        try:
+            self.replay_spool()
+        except OSError as e:
+            logger.warning(f"Error replaying telemetry spool: {str(e)}")
+        except Exception:
+            logger.exception("Unexpected error replaying telemetry spool")
+
+    def _send_batch(self, batch):
+        """Send a batch over the pooled session. Returns the number sent."""
+        sent = 0
+        for i, record in enumerate(batch):
+            url = f"{self.api_url}{ENDPOINTS[record['kind']]}"
+            try:
+                response = self.session.post(url, json=record["payload"], timeout=self.timeout)
+            except requests.RequestException as e:
+                # Server is unreachable; keep the rest of the batch for later
+                self._defer(batch[i:], f"unreachable ({str(e)})")
+                return sent
+
+            if response.status_code == 429 or response.status_code >= 500:
+                # Overloaded or failing, not a bad record; try again later
+                self._defer(batch[i:], f"answered {response.status_code}", response.headers.get("Retry-After"))
+                return sent
+
+            self._backoff = 0.0
+            self._retry_at = 0.0
+            if response.status_code in (200, 201):
+                sent += 1
+                self.stats["sent"] += 1
+            else:
+                # The server rejected the record; resending won't help
+                self.stats["failed"] += 1
+                logger.error(f"Failed to save {record['kind']}: {response.status_code} - {response.text}")
+        return sent
+
+    def _defer(self, records, reason, retry_after=None):
+        """Spool records and hold off sending, with exponential backoff or the server's Retry-After."""
+        self._backoff = min(max(self._backoff * 2, 1.0), MAX_BACKOFF)
+        delay = self._backoff
+        if retry_after:
+            try:
+                delay = min(max(float(retry_after), delay), MAX_BACKOFF)
+            except ValueError:
+                pass
+        self._retry_at = time.time() + delay
+        logger.warning(f"Telemetry API {reason}, spooling {len(records)} records, retrying in {delay:.0f}s")
+        self._spool(records)
+
+    def _spool(self, records):
+        if not records:
+            return
+        try:
+            with self._spool_lock:
+                with open(self.spool_path, "a", encoding="utf-8") as f:
+                    for record in records:
+                        f.write(json.dumps(record) + "\n")
+            self.stats["spooled"] += len(records)
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Error writing telemetry spool: {str(e)}")
+
+
+_shipper = None
+_shipper_lock = threading.Lock()
+
+
+def get_shipper(api_url=None, api_key=None):
+    """
+    Return the process-wide shipper, starting it on first use.
+
+    api_url and api_key only take effect on the first call; they default to
+    the API_URL and MICROSERVICE_API_KEY environment variables.
+    """
+    global _shipper
+    with _shipper_lock:
+        if _shipper is None:
+            _shipper = TelemetryShipper(
+                api_url=api_url or os.environ.get('API_URL', API_URL),
+                api_key=api_key or os.environ.get('MICROSERVICE_API_KEY', API_KEY)
+            )
+            _shipper.start()
+            atexit.register(_shipper.close)
+        return _shipper
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import admission
+from admission import Overloaded, TokenBucket, ClientRateLimiter, rate_limit_key
+from batching import BatchingEngine
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def test_token_bucket_burst_then_refill(clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    assert bucket.take(5) == 0
+    # Empty: one token is 0.1 s away
+    assert bucket.take(1) == pytest.approx(0.1)
+    clock.now += 0.35
+    assert bucket.take(3) == 0
+    assert bucket.take(1) > 0
+    # Refill stops at the burst size
+    clock.now += 60
+    assert bucket.take(5) == 0
+    assert bucket.take(1) > 0
+
+
+def test_rate_limiter_per_client_and_idle_eviction(clock):
+    limiter = ClientRateLimiter(rate=1, burst=2, max_clients=10)
+    limiter.check("ip:a", 2)
+    with pytest.raises(Overloaded) as excinfo:
+        limiter.check("ip:a")
+    assert excinfo.value.retry_after == pytest.approx(1.0)
+    # Another client has its own bucket
+    limiter.check("ip:b", 2)
+    assert limiter.rejected == 1
+
+    # Both buckets have refilled after burst / rate seconds and are dropped
+    clock.now += 2
+    limiter.check("ip:c")
+    assert limiter.snapshot()["tracked_clients"] == 1
+
+
+def test_rate_limit_key_trusts_known_keys_only():
+    assert rate_limit_key("secret", "10.0.0.1", known_keys={"secret"}) == "key:secret"
+    assert rate_limit_key("made-up", "10.0.0.1", known_keys={"secret"}) == "ip:10.0.0.1"
+    assert rate_limit_key(None, None, known_keys={"secret"}) is None
+
+
+def test_retry_after_header_rounds_up_to_whole_seconds():
+    assert Overloaded("full", 0.0).retry_after_header == "1"
+    assert Overloaded("full", 1.2).retry_after_header == "2"
+    assert Overloaded("full", 3.0).retry_after_header == "3"
+
+
+def test_full_lane_is_refused_with_retry_hint():
+    release = threading.Event()
+
+    def blocked_predict(texts):
+        release.wait(5)
+        return [{"text": text} for text in texts]
+
+    async def run():
+        engine = BatchingEngine("test", blocked_predict, max_batch_size=1, max_wait_ms=0, max_queue_size=4)
+        await engine.start()
+        try:
+            in_flight = asyncio.ensure_future(engine.submit(["first"]))
+            while not engine._in_flight:
+                await asyncio.sleep(0.001)
+            queued = asyncio.ensure_future(engine.submit(["a", "b", "c", "d"]))
+            await asyncio.sleep(0)
+            with pytest.raises(Overloaded) as excinfo:
+                await engine.submit(["e"])
+            release.set()
+            await asyncio.gather(in_flight, queued)
+            return engine, excinfo.value
+        finally:
+            release.set()
+            await engine.stop()
+
+    engine, error = asyncio.run(run())
+    assert "queue is full (4/4)" in str(error)
+    assert int(error.retry_after_header) >= 1
+    assert engine.stats["rejected"] == 1
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import pytest
+
+import batch_controller
+from batch_controller import BatchController, BATCH_SIZE_MIN, BATCH_SIZE_LIMIT, BATCH_WAIT_LIMIT_MS
+
+
+@pytest.fixture(autouse=True)
+def decide_every_batch(monkeypatch):
+    monkeypatch.setattr(batch_controller, "CONTROL_INTERVAL_SECONDS", 0)
+
+
+def engine(max_batch_size=32, max_wait_ms=10.0):
+    return SimpleNamespace(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+
+def observe(controller, engine, p95_ms, batch_ms, fill=1.0):
+    batch_size = max(1, int(engine.max_batch_size * fill))
+    controller.observe(engine, batch_size, [p95_ms] * batch_controller.CONTROL_MIN_SAMPLES, batch_ms)
+
+
+def test_shrinks_batch_when_forward_pass_breaks_the_slo():
+    controller, eng = BatchController("test", slo_ms=100), engine()
+    observe(controller, eng, p95_ms=200, batch_ms=60)
+    assert eng.max_batch_size == 24
+    assert controller.decisions == 1
+
+
+def test_shortens_wait_when_over_slo_with_sparse_batches():
+    controller, eng = BatchController("test", slo_ms=100), engine()
+    observe(controller, eng, p95_ms=200, batch_ms=10, fill=0.25)
+    assert (eng.max_batch_size, eng.max_wait_ms) == (32, 5.0)
+
+
+def test_grows_batch_when_under_slo_and_batches_are_full():
+    controller, eng = BatchController("test", slo_ms=100), engine()
+    observe(controller, eng, p95_ms=20, batch_ms=10)
+    assert eng.max_batch_size == 40
+
+
+def test_stays_within_bounds():
+    controller, eng = BatchController("test", slo_ms=100), engine()
+    for _ in range(50):
+        observe(controller, eng, p95_ms=200, batch_ms=60)
+    assert eng.max_batch_size == BATCH_SIZE_MIN
+
+    controller, eng = BatchController("test", slo_ms=1000), engine()
+    for _ in range(50):
+        observe(controller, eng, p95_ms=20, batch_ms=1)
+    assert eng.max_batch_size == BATCH_SIZE_LIMIT
+
+    controller, eng = BatchController("test", slo_ms=1000), engine(max_wait_ms=1.0)
+    for _ in range(50):
+        observe(controller, eng, p95_ms=20, batch_ms=1, fill=0.1)
+    assert eng.max_wait_ms == BATCH_WAIT_LIMIT_MS
+
+
+def test_override_pins_until_resumed():
+    controller, eng = BatchController("test", slo_ms=100), engine()
+    controller.override(eng, max_batch_size=16)
+    assert (controller.mode, eng.max_batch_size, eng.max_wait_ms) == ("manual", 16, 10.0)
+
+    observe(controller, eng, p95_ms=200, batch_ms=60)
+    assert eng.max_batch_size == 16
+    assert controller.last_p95_ms == 200
+
+    controller.resume()
+    observe(controller, eng, p95_ms=200, batch_ms=60)
+    assert (controller.mode, eng.max_batch_size) == ("auto", 12)
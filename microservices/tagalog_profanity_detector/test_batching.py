@@ -0,0 +1,112 @@
+import time
+import asyncio
+
+import pytest
+
+from admission import RequestTooLarge
+from batching import BatchingEngine, Priority
+
+
+def recording_predict(batches, delay=0.0):
+    def predict(texts):
+        if delay:
+            time.sleep(delay)
+        batches.append(list(texts))
+        return [{"text": text} for text in texts]
+    return predict
+
+
+def test_interactive_batched_before_waiting_bulk():
+    batches = []
+
+    async def run():
+        engine = BatchingEngine("test", recording_predict(batches), max_batch_size=4, max_wait_ms=0)
+        await engine.start()
+        try:
+            await asyncio.gather(
+                engine.submit(["bulk-1", "bulk-2"], priority=Priority.BULK),
+                engine.submit(["interactive-1", "interactive-2"])
+            )
+        finally:
+            await engine.stop()
+
+    asyncio.run(run())
+    assert batches == [["interactive-1", "interactive-2"], ["bulk-1", "bulk-2"]]
+
+
+def test_bulk_promoted_under_sustained_interactive_load():
+    batches = []
+
+    async def run():
+        engine = BatchingEngine("test", recording_predict(batches, delay=0.005), max_batch_size=4,
+                                max_wait_ms=0, bulk_max_delay_ms=50)
+        await engine.start()
+        stop = asyncio.Event()
+
+        async def interactive_load(worker):
+            i = 0
+            while not stop.is_set():
+                await engine.submit([f"interactive-{worker}-{i + j}" for j in range(4)])
+                i += 4
+
+        load = [asyncio.ensure_future(interactive_load(worker)) for worker in range(4)]
+        try:
+            await asyncio.sleep(0.02)
+            started = time.perf_counter()
+            results = await asyncio.wait_for(engine.submit(["bulk"], priority=Priority.BULK), 2.0)
+            waited_ms = (time.perf_counter() - started) * 1000
+        finally:
+            stop.set()
+            await asyncio.gather(*load)
+            await engine.stop()
+        return engine, results, waited_ms
+
+    engine, results, waited_ms = asyncio.run(run())
+    assert results == [{"text": "bulk"}]
+    assert engine.stats["bulk_promotions"] == 1
+    # Promoted after its 50 ms delay, not once the interactive load stopped
+    assert 50 <= waited_ms < 500
+    bulk_batch = batches.index(["bulk"])
+    assert any(text.startswith("interactive") for batch in batches[bulk_batch + 1:] for text in batch)
+
+
+def test_submission_larger_than_the_lane_is_refused():
+    async def run():
+        engine = BatchingEngine("test", recording_predict([]), max_queue_size=8, bulk_max_queue_size=16)
+        await engine.start()
+        try:
+            with pytest.raises(RequestTooLarge):
+                await engine.submit([str(i) for i in range(9)])
+            # The bulk lane is larger and takes the same texts
+            return engine, await engine.submit([str(i) for i in range(9)], priority=Priority.BULK)
+        finally:
+            await engine.stop()
+
+    engine, results = asyncio.run(run())
+    assert len(results) == 9
+    # Too large is not overload; it isn't counted as a rejection
+    assert engine.stats["rejected"] == 0
+
+
+def test_expired_items_skip_the_forward_pass():
+    batches = []
+
+    async def run():
+        engine = BatchingEngine("test", recording_predict(batches), max_batch_size=8, max_wait_ms=20)
+        await engine.start()
+        try:
+            expired = time.perf_counter() - 1
+            return engine, await asyncio.gather(
+                engine.submit(["late-1", "late-2"], deadline=expired),
+                engine.submit(["on-time"], deadline=time.perf_counter() + 10)
+            )
+        finally:
+            await engine.stop()
+
+    engine, (late, on_time) = asyncio.run(run())
+    assert late == [None, None]
+    assert on_time == [{"text": "on-time"}]
+    assert batches == [["on-time"]]
+    assert engine.stats["expired"] == 2
+    assert engine.lane_stats[Priority.INTERACTIVE]["expired"] == 2
+    assert engine.stats["items"] == 1
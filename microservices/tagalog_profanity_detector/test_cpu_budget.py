@@ -0,0 +1,37 @@
+import pytest
+
+from cpu_budget import parse_shares, cpu_shares, budgeted_executor
+
+MODELS = ["roberta", "bert", "student"]
+
+
+def test_parse_shares_rejects_out_of_range():
+    assert parse_shares("RoBERTa=0.5, bert=0.25") == {"roberta": 0.5, "bert": 0.25}
+    with pytest.raises(ValueError):
+        parse_shares("roberta=1.5")
+
+
+def test_unconfigured_models_split_the_rest():
+    shares = cpu_shares(MODELS, "roberta=0.5")
+    assert shares == {"roberta": 0.5, "bert": 0.25, "student": 0.25}
+    assert cpu_shares(MODELS, "") == pytest.approx({name: 1 / 3 for name in MODELS})
+
+
+def test_overcommitted_shares_are_scaled_to_one():
+    shares = cpu_shares(MODELS, "roberta=0.8,bert=0.6,student=0.6")
+    assert sum(shares.values()) == pytest.approx(1.0)
+    assert shares == pytest.approx({"roberta": 0.4, "bert": 0.3, "student": 0.3})
+
+
+def test_invalid_spec_falls_back_to_equal_shares():
+    assert cpu_shares(MODELS, "roberta=abc") == pytest.approx({name: 1 / 3 for name in MODELS})
+
+
+@pytest.mark.parametrize("share, cpus, threads", [(0.01, 4, 1), (0.25, 8, 2), (0.5, 3, 2), (1.0, 16, 16)])
+def test_budgeted_executor_gets_at_least_one_thread(share, cpus, threads):
+    executor = budgeted_executor("test", share, cpus)
+    try:
+        assert executor.threads == threads
+        assert executor.share == share
+    finally:
+        executor.shutdown()
@@ -0,0 +1,42 @@
+from dedup import normalize, NearDuplicateIndex
+
+
+BASE = "Ang ganda ng araw ngayon sa Maynila talaga"
+
+
+def test_normalize_folds_obfuscation():
+    assert normalize("P U T A") == "puta"
+    assert normalize("Tlga bang p-u-t-a?") == "talaga bang puta"
+    assert normalize("g@g0 ka") == "gago ka"
+    assert normalize("bobo!") == "bobo"
+    # Real Tagalog double vowels survive, longer runs are cut to two
+    assert normalize("maaga") == "maaga"
+    assert normalize("gaaaago") == "gaago"
+
+
+def test_normalize_only_joins_three_or_more_single_letters():
+    assert normalize("bilang 1 2 3") == "bilang 1 2 3"
+    assert normalize("si a") == "si a"
+    assert normalize("a b") == "a b"
+    assert normalize("a b c") == "abc"
+
+
+def test_near_duplicate_reused_only_above_threshold():
+    index = NearDuplicateIndex(threshold=0.9)
+    verdict = {"is_inappropriate": False, "confidence": 0.95}
+    index.add(normalize(BASE), verdict)
+
+    assert index.lookup(normalize(BASE + "!!")) is verdict
+    # One extra letter is above the threshold, an extra word is not
+    assert index.lookup(normalize(BASE + "a")) is verdict
+    assert index.lookup(normalize(BASE + " naman")) is None
+    assert index.lookup(normalize("putangina mo gago ka")) is None
+    assert index.stats["exact_hits"] == 1
+    assert index.stats["near_hits"] == 1
+
+
+def test_unconfident_verdicts_are_not_stored():
+    index = NearDuplicateIndex()
+    index.add(normalize(BASE), {"is_inappropriate": False, "confidence": 0.6})
+    assert index.lookup(normalize(BASE)) is None
+    assert index.snapshot()["entries"] == 0
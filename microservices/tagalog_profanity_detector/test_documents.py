@@ -0,0 +1,45 @@
+import asyncio
+
+from admission import RequestTooLarge
+from batching import BatchingEngine
+from documents import extract_text, segment, group_segments, score_in_chunks
+
+
+def fake_predict(texts):
+    return [{"is_inappropriate": "gago" in text, "confidence": 0.99} for text in texts]
+
+
+def page(sentences):
+    return "".join(f"<p>Pangungusap bilang {i} {'gago ka' if i % 50 == 0 else 'ayos lang'}.</p>"
+                   for i in range(sentences))
+
+
+def test_document_larger_than_the_queue_is_scored_in_chunks():
+    groups = group_segments(segment(extract_text(page(300), "html")))
+    texts = [text for text, _ in groups]
+    # More distinct segments than the 256-text interactive queue holds
+    assert len(texts) > 256
+
+    async def run():
+        engine = BatchingEngine("test", fake_predict, max_queue_size=256, max_wait_ms=0)
+        await engine.start()
+        try:
+            try:
+                await engine.submit(texts)
+            except RequestTooLarge:
+                pass
+            else:
+                raise AssertionError("a submission larger than the lane should be refused")
+
+            async def score(chunk):
+                return "test", await engine.submit(chunk)
+
+            return await score_in_chunks(score, texts, engine.max_queue_size // 2)
+        finally:
+            await engine.stop()
+
+    model_type, results = asyncio.run(run())
+    assert model_type == "test"
+    assert len(results) == len(texts)
+    assert [result["is_inappropriate"] for result in results] == ["gago" in text for text in texts]
+    assert sum(result["is_inappropriate"] for result in results) == 6
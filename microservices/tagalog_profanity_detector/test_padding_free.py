@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from padding_free import PaddingFreeRunner, plan_passes
+
+
+class Encoding(dict):
+    def to(self, device):
+        return Encoding({key: value.to(device) for key, value in self.items()})
+
+
+class WordTokenizer:
+    """One token per word, its id the word's length."""
+
+    def __call__(self, texts, truncation=True, max_length=512, padding=False, return_tensors=None):
+        ids = [[len(word) for word in text.split()][:max_length] for text in texts]
+        features = [{"input_ids": row, "attention_mask": [1] * len(row)} for row in ids]
+        if padding:
+            return self.pad(features)
+        return {"input_ids": ids, "attention_mask": [f["attention_mask"] for f in features]}
+
+    def pad(self, features, padding=True, return_tensors="pt"):
+        longest = max(len(f["input_ids"]) for f in features)
+        return Encoding({
+            key: torch.tensor([f[key] + [0] * (longest - len(f[key])) for f in features])
+            for key in ("input_ids", "attention_mask")
+        })
+
+
+def masked_model(input_ids, attention_mask):
+    # Depends only on the unmasked tokens of each row, like a real classifier
+    ids = (input_ids * attention_mask).float()
+    return SimpleNamespace(logits=torch.stack([ids.sum(1), attention_mask.sum(1).float()], dim=-1))
+
+
+def test_plan_passes_splits_off_the_long_text():
+    assert plan_passes([5, 5, 5, 200], pass_cost=96) == [[0, 1, 2], [3]]
+    # Without a big length gap one pass is cheaper
+    assert plan_passes([5, 6, 7, 8], pass_cost=96) == [[0, 1, 2, 3]]
+
+
+def test_runner_restores_order_and_matches_padded_batch():
+    texts = ["maikli", "ang haba " * 100, "gago ka", "ayos lang naman"]
+    runner = PaddingFreeRunner(masked_model, WordTokenizer(), "cpu")
+
+    logits = runner(texts)
+    assert runner.stats["passes"] == 2
+    assert logits[:, 1].tolist() == [1, 200, 2, 3]
+    assert runner.check(texts, atol=1e-4) <= 1e-4
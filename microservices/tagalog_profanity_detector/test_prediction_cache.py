@@ -0,0 +1,86 @@
+import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import prediction_cache
+from prediction_cache import PredictionCache, MemoryStore
+
+
+class FlakyStore:
+    name = "flaky"
+
+    def __init__(self):
+        self.failing = True
+        self.calls = 0
+        self.items = {}
+
+    def get_many(self, keys):
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError("store unreachable")
+        return [self.items.get(key) for key in keys]
+
+    def set_many(self, items, ttl):
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError("store unreachable")
+        self.items.update(items)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(prediction_cache, "time",
+                        SimpleNamespace(monotonic=lambda: clock.now, time=time.time))
+    return clock
+
+
+def test_breaker_bypasses_failing_store_until_cooldown(clock):
+    store = FlakyStore()
+    cache = PredictionCache(store, max_failures=2, cooldown=30)
+
+    async def run():
+        for _ in range(2):
+            assert await cache.get_many("bert", "v1", ["gago"]) == [None]
+        assert cache.store_bypassed
+        # While bypassed, the store isn't called at all
+        assert await cache.get_many("bert", "v1", ["gago"]) == [None]
+        cache.put_many("bert", "v1", {"gago": {"is_inappropriate": True}})
+        assert store.calls == 2
+        assert cache.stats["bypassed"] == 1
+
+        # After the cooldown the store is tried again and a success resets it
+        clock.now += 31
+        store.failing = False
+        assert await cache.get_many("bert", "v1", ["ayos"]) == [None]
+        cache.put_many("bert", "v1", {"ayos": {"is_inappropriate": False}})
+        await asyncio.gather(*cache._pending_writes)
+
+    try:
+        asyncio.run(run())
+    finally:
+        cache.close()
+    assert not cache.store_bypassed
+    assert cache.stats["errors"] == 2
+    assert cache.stats["writes"] == 1
+    assert len(store.items) == 1
+
+
+def test_memory_store_uses_l1_only():
+    store = MemoryStore()
+    cache = PredictionCache(store)
+
+    async def run():
+        assert await cache.get_many("bert", "v1", ["gago"]) == [None]
+        cache.put_many("bert", "v1", {"gago": {"is_inappropriate": True}})
+        return await cache.get_many("bert", "v1", ["gago"])
+
+    try:
+        assert asyncio.run(run()) == [{"is_inappropriate": True}]
+    finally:
+        cache.close()
+    assert store.get_many([PredictionCache.key_for("bert", "v1", "gago")]) == [None]
+    assert cache.stats["l1_hits"] == 1
+    assert cache.stats["misses"] == 1